@@ -13,6 +13,9 @@ from routes.export_routes import export_bp
 from routes.historico_routes import historico_bp
 from routes.vinculo_routes import vinculo_bp
 from routes.gestor_routes import gestor_bp
+from services.titular_service import aquecer_indice_titulares
+from services.auth_service import init_auth
+from services.upload_service import recuperar_uploads_pendentes
 
 def create_app():
     app = Flask(__name__)
@@ -20,6 +23,9 @@ def create_app():
     # CORS mais leve e igualmente funcional
     CORS(app, resources={r"/*": {"origins": "*"}})
 
+    # Usuário do token resolvido uma vez por requisição (flask.g.user)
+    init_auth(app)
+
     # Registrar rotas
     app.register_blueprint(auth_bp)
     app.register_blueprint(obras_bp)
@@ -33,6 +39,12 @@ def create_app():
     app.register_blueprint(vinculo_bp)
     app.register_blueprint(gestor_bp)
 
+    # Índices em memória carregados em segundo plano
+    aquecer_indice_titulares()
+
+    # Uploads que ficaram no staging quando o processo anterior parou
+    recuperar_uploads_pendentes()
+
     return app
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Backfill: converter grupos legados (formulario.grupo_id) para formulario_obras
+
+No formato antigo, um lançamento múltiplo era gravado como N linhas em
+`formulario` ligadas pelo mesmo grupo_id. No formato novo ele é 1 linha em
+`formulario` (obra principal) + as demais obras em `formulario_obras`.
+
+Só são convertidos grupos em que os registros diferem apenas em obra e valor
+(formulario_obras não guarda referente, datas, status, anexos...) e cujos
+irmãos não aparecem em formulario_vinculos. Os demais são listados e ficam no
+formato legado, que GET /formulario continua exibindo pelo grupo_id.
+
+Para cada grupo convertido:
+  - o registro de menor id vira o principal;
+  - cada irmão vira uma linha em formulario_obras (obra, valor) do principal;
+  - itens de historico_exportacoes_itens dos irmãos passam para o principal
+    (um item por exportação, sem duplicar);
+  - os irmãos são removidos e o grupo_id do principal é limpo.
+
+Depois disso GET /formulario carrega as obras relacionadas só pela consulta
+principal (sem o fallback por grupo_id).
+
+FAÇA BACKUP DO BANCO ANTES (python backup_database.py).
+
+Uso:
+    python backfill_formulario_obras.py
+
+"""
+
+from db import get_connection
+import sys
+
+# Campos que precisam ser iguais em todo o grupo: formulario_obras só guarda obra e valor
+CAMPOS_DO_LANCAMENTO = (
+    "data_lancamento", "solicitante", "titular", "referente", "data_pagamento",
+    "forma_pagamento", "lancado", "cpf_cnpj", "chave_pix", "data_competencia",
+    "observacao", "conta", "categoria", "link_anexo", "uuid", "id_solicitante",
+)
+
+
+def listar_grupos_legados():
+    """Retorna {grupo_id: [registros ordenados por id]} dos grupos ainda não convertidos."""
+    
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute(f"""
+            SELECT id, obra, valor, grupo_id, {", ".join(CAMPOS_DO_LANCAMENTO)}
+            FROM formulario
+            WHERE grupo_id IS NOT NULL
+            ORDER BY grupo_id ASC, id ASC
+        """)
+        grupos = {}
+        for row in cursor.fetchall():
+            grupos.setdefault(row["grupo_id"], []).append(row)
+        return grupos
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def campos_divergentes(registros):
+    """Campos de CAMPOS_DO_LANCAMENTO que não são iguais em todos os registros do grupo."""
+    
+    principal = registros[0]
+    return [
+        campo for campo in CAMPOS_DO_LANCAMENTO
+        if any(r.get(campo) != principal.get(campo) for r in registros[1:])
+    ]
+
+
+def motivo_para_manter(cursor, registros):
+    """Por que o grupo não pode ser convertido sem perder dados (None = pode)."""
+    
+    divergentes = campos_divergentes(registros)
+    if divergentes:
+        return f"registros diferem em {', '.join(divergentes)}"
+    
+    ids_irmaos = [r["id"] for r in registros[1:]]
+    if ids_irmaos:
+        # Apagar um irmão apagaria em cascata os vínculos dele
+        ph = ",".join(["%s"] * len(ids_irmaos))
+        cursor.execute(f"""
+            SELECT COUNT(*) AS total FROM formulario_vinculos
+            WHERE formulario_id_principal IN ({ph}) OR formulario_id_vinculado IN ({ph})
+        """, (*ids_irmaos, *ids_irmaos))
+        if cursor.fetchone()["total"] > 0:
+            return "irmãos com registros em formulario_vinculos"
+    
+    # Principal que já tem formulario_obras: não mistura os dois formatos
+    cursor.execute(
+        "SELECT COUNT(*) AS total FROM formulario_obras WHERE formulario_id = %s",
+        (registros[0]["id"],)
+    )
+    if cursor.fetchone()["total"] > 0:
+        return f"formulário {registros[0]['id']} já possui formulario_obras"
+    return None
+
+
+def mover_historico(cursor, principal_id, ids_irmaos):
+    """Passa os itens de exportação dos irmãos para o principal, um item por exportação."""
+    
+    ph = ",".join(["%s"] * len(ids_irmaos))
+    cursor.execute(f"""
+        SELECT DISTINCT exportacao_id, formulario_id = %s AS do_principal
+        FROM historico_exportacoes_itens
+        WHERE formulario_id = %s OR formulario_id IN ({ph})
+    """, (principal_id, principal_id, *ids_irmaos))
+    exportacoes = {}
+    for row in cursor.fetchall():
+        exportacoes[row["exportacao_id"]] = exportacoes.get(row["exportacao_id"]) or bool(row["do_principal"])
+    
+    cursor.execute(
+        f"DELETE FROM historico_exportacoes_itens WHERE formulario_id IN ({ph})",
+        tuple(ids_irmaos)
+    )
+    for exportacao_id, tem_principal in exportacoes.items():
+        if not tem_principal:
+            cursor.execute("""
+                INSERT INTO historico_exportacoes_itens (exportacao_id, formulario_id)
+                VALUES (%s, %s)
+            """, (exportacao_id, principal_id))
+
+
+def converter_grupo(cursor, registros):
+    """
+    Converte um grupo (na transação do cursor). Retorna quantas obras foram
+    criadas. Lança ValueError se o grupo não puder ser convertido.
+    """
+    
+    motivo = motivo_para_manter(cursor, registros)
+    if motivo:
+        raise ValueError(motivo)
+    
+    principal = registros[0]
+    irmaos = registros[1:]
+    
+    for irmao in irmaos:
+        cursor.execute("""
+            INSERT INTO formulario_obras (formulario_id, obra_id, valor)
+            VALUES (%s, %s, %s)
+        """, (principal["id"], irmao["obra"], irmao["valor"]))
+    
+    if irmaos:
+        ids_irmaos = [r["id"] for r in irmaos]
+        ph = ",".join(["%s"] * len(ids_irmaos))
+        mover_historico(cursor, principal["id"], ids_irmaos)
+        cursor.execute(f"DELETE FROM formulario WHERE id IN ({ph})", tuple(ids_irmaos))
+    
+    cursor.execute("UPDATE formulario SET grupo_id = NULL WHERE id = %s", (principal["id"],))
+    return len(irmaos)
+
+
+def executar_backfill(grupos, simular=True):
+    """
+    Converte os grupos, um por transação.
+    Retorna (convertidos, obras_criadas, mantidos, erros).
+    """
+    
+    convertidos = 0
+    obras_criadas = 0
+    mantidos = 0
+    erros = 0
+    
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        for grupo_id, registros in grupos.items():
+            try:
+                motivo = motivo_para_manter(cursor, registros)
+                if motivo:
+                    mantidos += 1
+                    print(f"   ⏭️  grupo {grupo_id} mantido no formato legado: {motivo}")
+                    continue
+                if simular:
+                    print(f"   • grupo {grupo_id}: principal={registros[0]['id']}, "
+                          f"obras adicionais={[r['obra'] for r in registros[1:]]}")
+                    obras_criadas += len(registros) - 1
+                else:
+                    obras_criadas += converter_grupo(cursor, registros)
+                    conn.commit()
+                convertidos += 1
+            except Exception as e:
+                conn.rollback()
+                erros += 1
+                print(f"   ❌ grupo {grupo_id}: {e}")
+        return convertidos, obras_criadas, mantidos, erros
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    """Função principal"""
+    
+    print("\n" + "="*70)
+    print("🔄 BACKFILL: formulario.grupo_id (legado) → formulario_obras")
+    print("="*70)
+    
+    try:
+        grupos = listar_grupos_legados()
+        
+        if not grupos:
+            print("\nℹ️  Nenhum grupo legado para converter.")
+            return
+        
+        total_registros = sum(len(r) for r in grupos.values())
+        print(f"\n📋 {len(grupos)} grupos legados ({total_registros} registros em formulario)")
+        
+        print("\n" + "-"*70)
+        print("Etapa 1/2: Simulando (sem alterações)...")
+        print("-"*70)
+        convertidos, obras, mantidos, _ = executar_backfill(grupos, simular=True)
+        
+        if mantidos:
+            print(f"\n⚠️  {mantidos} grupos ficam no formato legado (ver motivos acima)")
+        if not convertidos:
+            print("\nℹ️  Nenhum grupo pode ser convertido sem perda de dados.")
+            return
+        
+        resposta = input(
+            f"\n❓ Converter {convertidos} grupos, criando {obras} linhas em formulario_obras "
+            f"e removendo {obras} registros irmãos? (s/n): "
+        ).lower()
+        
+        if resposta != 's':
+            print("\n⏭️  Backfill cancelado pelo usuário.")
+            return
+        
+        print("\n" + "-"*70)
+        print("Etapa 2/2: Executando...")
+        print("-"*70)
+        convertidos, obras, mantidos, erros = executar_backfill(grupos, simular=False)
+        
+        print("\n" + "="*70)
+        print(f"✅ {convertidos} grupos convertidos, {obras} obras em formulario_obras, "
+              f"{mantidos} mantidos no formato legado, {erros} erros")
+        print("="*70)
+    
+    except KeyboardInterrupt:
+        print("\n\n⏸️  Operação cancelada pelo usuário.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Erro inesperado: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,58 @@
+import os
+
 DB_CONFIG = {
     "host": "localhost",
     "user": "root",
     "password": "12345678gR$",
     "database": "gerenciaobra"
 }
+
+# Pool de conexões (ver db.py)
+DB_POOL_CONFIG = {
+    "size": 10,               # Máximo de conexões abertas por processo
+    "timeout": 10,            # Segundos aguardando uma conexão livre antes de falhar
+    "recycle": 1800,          # Segundos de vida de uma conexão antes de ser reaberta
+    "pre_ping": True,         # Testa a conexão (ping) antes de entregá-la
+    "ping_idle_seconds": 30,  # Só faz o ping se a conexão ficou ociosa por mais que isso
+}
+
+# Exportação de planilhas (ver services/export_service.py)
+EXPORT_CONFIG = {
+    "max_rows": 200000,                   # Limite de linhas por exportação (None = sem limite)
+    "spool_max_memory": 8 * 1024 * 1024,  # Bytes do arquivo final mantidos em RAM antes de ir para disco
+    "chunk_size": 64 * 1024,              # Tamanho dos blocos enviados na resposta
+    "tmpdir": None,                       # Diretório dos temporários (None = padrão do sistema)
+    "job_workers": 2,                     # Exportações assíncronas simultâneas por processo
+    "job_retention": 3600,                # Segundos que o arquivo de um job fica disponível para download
+    "cache_dir": None,                    # Arquivos já gerados, por conteúdo (None = <tmp>/gerenciaobra_export_cache)
+    "cache_max_bytes": 512 * 1024 * 1024, # Tamanho total do cache em disco (descarte LRU acima disso)
+}
+
+# Uploads de anexos para o Google Drive (ver services/upload_service.py)
+UPLOAD_CONFIG = {
+    "staging_dir": None,                   # Arquivos recebidos aguardando envio (None = <tmp>/gerenciaobra_uploads)
+    "workers": 2,                          # Uploads em segundo plano simultâneos por processo
+    "max_tentativas": 5,                   # Tentativas por operação no Drive (erros temporários)
+    "backoff_base": 2,                     # Segundos de espera na 1ª nova tentativa (dobra a cada falha)
+    "backoff_max": 60,                     # Espera máxima entre tentativas
+    "job_retention": 3600,                 # Segundos que o status do job fica disponível
+}
+
+# Sessões de login (ver services/session_service.py)
+SESSION_CONFIG = {
+    "backend": "mysql",                    # "mysql" (tabela user_sessions, compartilhada entre workers) ou "memory"
+    "ttl": 12 * 3600,                      # Segundos de validade do token sem uso
+    "local_ttl": 30,                       # Segundos que um token validado fica no cache do processo
+    "local_max_items": 10000,              # Tokens no cache do processo (LRU)
+}
+
+# Tokens assinados (HMAC-SHA256) — ver services/token_service.py
+TOKEN_CONFIG = {
+    # "assinado" (sem consulta ao banco) ou "sessao" (SESSION_CONFIG). Sem
+    # TOKEN_SECRET no ambiente não há chave (nunca há valor padrão): "sessao"
+    "formato": "assinado" if os.environ.get("TOKEN_SECRET") else "sessao",
+    "secret": os.environ.get("TOKEN_SECRET"),
+    "ttl": 12 * 3600,                      # Segundos de validade do token assinado
+    "versao_ttl": 30,                      # Segundos de cache da users.token_version por usuário
+    "revogados_ttl": 30,                   # Segundos entre releituras da lista de tokens revogados
+}
@@ -1,10 +1,275 @@
+"""
+Camada de conexão com o MySQL.
+
+Mantém um pool de conexões por processo: `get_connection()` entrega uma
+conexão já aberta (sem novo handshake TCP + autenticação) e `conn.close()`
+devolve a conexão ao pool em vez de fechá-la. Assim todo o código existente
+(`conn = get_connection()` ... `conn.close()`) reaproveita conexões sem mudança.
+
+Uso com context manager:
+
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        ...
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
-from config import DB_CONFIG
+from config import DB_CONFIG, DB_POOL_CONFIG
 
-def get_connection():
+
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo limite do pool."""
+
+
+def _connect():
     return mysql.connector.connect(
         host=DB_CONFIG["host"],
         user=DB_CONFIG["user"],
         password=DB_CONFIG["password"],
         database=DB_CONFIG["database"]
     )
+
+
+class PooledConnection:
+    """
+    Proxy para a conexão real do mysql.connector.
+    Repassa tudo para a conexão, exceto close(), que devolve ao pool.
+
+    Depois do close() a conexão real pode já estar com outra requisição, então
+    o proxy deixa de alcançá-la: qualquer uso levanta InterfaceError e
+    rollback() vira no-op (blocos except costumam fazer rollback após close()).
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    def _conexao(self):
+        if self._released:
+            raise mysql.connector.errors.InterfaceError("Conexão já devolvida ao pool")
+        return self._raw
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._conexao(), name)
+
+    def rollback(self):
+        # A transação já foi encerrada pelo pool na devolução (_release)
+        if not self._released:
+            self._raw.rollback()
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                pass
+        self.close()
+        return False
+
+    def __del__(self):
+        # Conexão esquecida sem close(): libera a vaga no pool (descartando a
+        # conexão, pois o estado dela é desconhecido).
+        if not getattr(self, "_released", True):
+            self._released = True
+            self._pool._discard(self._raw)
+
+
+class ConnectionPool:
+    """Pool de conexões thread-safe com health check, reciclagem e timeout."""
+
+    def __init__(self, size=10, timeout=10, recycle=1800, pre_ping=True, ping_idle_seconds=30):
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.ping_idle_seconds = ping_idle_seconds
+
+        self._idle = []          # [(raw, created_at, last_used)]
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "reused": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "discarded": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+        }
+
+    # -------------------------------------------
+    # Checkout / devolução
+    # -------------------------------------------
+    def get(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+        waited = False
+
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Nenhuma conexão livre após {timeout}s "
+                        f"(pool com {self.size} conexões em uso)"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - started
+            self._stats["checkouts"] += 1
+            self._in_use += 1
+            entry = self._idle.pop() if self._idle else None
+
+        # Validação/abertura fora do lock (envolve rede)
+        try:
+            raw, created_at = self._checkout(entry)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, raw, created_at)
+
+    def _checkout(self, entry):
+        now = time.monotonic()
+        if entry is not None:
+            raw, created_at, last_used = entry
+
+            if self.recycle and now - created_at > self.recycle:
+                self._close_quietly(raw)
+                self._count("recycled")
+            elif self.pre_ping and now - last_used >= self.ping_idle_seconds and not self._ping(raw):
+                self._close_quietly(raw)
+                self._count("ping_failures")
+            else:
+                self._count("reused")
+                return raw, created_at
+
+        raw = _connect()
+        self._count("created")
+        return raw, time.monotonic()
+
+    def _release(self, raw, created_at):
+        healthy = True
+        try:
+            # Descarta resultados pendentes e encerra transação aberta (inclusive
+            # a iniciada por SELECT com autocommit desligado), para que o próximo
+            # usuário da conexão veja um snapshot novo.
+            raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw, created_at, time.monotonic()))
+            else:
+                self._stats["discarded"] += 1
+            self._cond.notify()
+
+        if not healthy:
+            self._close_quietly(raw)
+
+    def _discard(self, raw):
+        with self._cond:
+            self._in_use -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+        self._close_quietly(raw)
+
+    # -------------------------------------------
+    # Auxiliares
+    # -------------------------------------------
+    def _ping(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _count(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    def stats(self):
+        """Retorna um snapshot das métricas do pool."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["size"] = self.size
+            snapshot["in_use"] = self._in_use
+            snapshot["idle"] = len(self._idle)
+        return snapshot
+
+    def dispose(self):
+        """Fecha todas as conexões ociosas."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for raw, _, _ in idle:
+            self._close_quietly(raw)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool do processo atual (recriado após fork, ex.: workers do gunicorn)."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(**DB_POOL_CONFIG)
+                _pool_pid = pid
+    return _pool
+
+
+def get_connection():
+    return get_pool().get()
+
+
+@contextmanager
+def connection():
+    """Context manager: entrega uma conexão do pool e a devolve ao final."""
+    conn = get_connection()
+    with conn:
+        yield conn
+
+
+def pool_stats():
+    return get_pool().stats()
@@ -0,0 +1,12 @@
+-- Migration: add_formulario_drive_pastas.sql
+-- Pasta do Google Drive de cada lançamento (Lançamento_{id}_Obra_{obra}).
+-- Criada no primeiro upload de anexos e reaproveitada nos seguintes,
+-- em vez de uma pasta nova por upload.
+-- Executar uma vez no banco de dados (MySQL)
+
+CREATE TABLE IF NOT EXISTS `formulario_drive_pastas` (
+  `formulario_id` INT NOT NULL PRIMARY KEY,
+  `obra_id` INT NULL,
+  `folder_id` VARCHAR(128) NOT NULL,
+  `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
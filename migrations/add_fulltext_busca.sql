@@ -0,0 +1,10 @@
+-- Migration: add_fulltext_busca.sql
+-- Índice FULLTEXT usado pelo filtro ?busca= de GET /formulario com busca_modo=indexada
+-- (MATCH ... AGAINST em modo booleano, com ?ordenacao=relevancia).
+-- Buscas por valor ("R$ 1.234,56", "100..200") usam o índice (valor, id)
+-- de add_indices_paginacao_cursor.sql.
+-- Palavras com menos de innodb_ft_min_token_size (3) caracteres caem no LIKE.
+-- Executar uma vez no banco de dados (MySQL)
+
+ALTER TABLE formulario
+ADD FULLTEXT INDEX ft_formulario_busca (titular, referente, observacao, cpf_cnpj);
@@ -0,0 +1,6 @@
+-- Migration: add_indice_formulario_obra_id.sql
+-- Índice (obra, id) usado por GET /formulario para usuários comuns, que só veem
+-- os lançamentos das suas obras (f.obra IN (...) ORDER BY f.id DESC).
+-- Executar uma vez no banco de dados (MySQL)
+
+CREATE INDEX idx_formulario_obra_id ON formulario (obra, id);
@@ -0,0 +1,10 @@
+-- Migration: add_indices_paginacao_cursor.sql
+-- Índices (coluna, id) usados pela paginação por cursor de GET /formulario (?after=)
+-- Cada ordenação do ORDER_MAP vira uma busca direta no índice, sem OFFSET.
+-- Executar uma vez no banco de dados (MySQL)
+
+CREATE INDEX idx_formulario_valor_id ON formulario (valor, id);
+CREATE INDEX idx_formulario_titular_id ON formulario (titular, id);
+-- referente pode ser TEXT: se for VARCHAR, crie também (referente, id)
+CREATE INDEX idx_formulario_data_lancamento_id ON formulario (data_lancamento, id);
+CREATE INDEX idx_formulario_data_pagamento_id ON formulario (data_pagamento, id);
@@ -0,0 +1,21 @@
+-- Migration: add_titular_normalizado.sql
+-- Coluna titular_normalizado (titular sem espaços nas pontas, minúsculo) em formulario e fornecedor.
+-- Mantida pelo backend em toda escrita (POST/PUT /formulario e /fornecedor).
+-- Torna o filtro ?titular= de GET /formulario sargable e permite comparar
+-- formulario x fornecedor (fornecedor_novo) pela coluna indexada.
+-- Executar uma vez no banco de dados (MySQL)
+
+ALTER TABLE formulario
+ADD COLUMN titular_normalizado VARCHAR(255) NULL COMMENT 'normalizar_titular(titular), mantido pelo backend';
+
+ALTER TABLE fornecedor
+ADD COLUMN titular_normalizado VARCHAR(255) NULL COMMENT 'normalizar_titular(titular), mantido pelo backend';
+
+-- Backfill dos registros existentes, com a mesma regra de normalizar_titular
+-- (espaços [[:space:]] nas pontas, não só ' ' como TRIM). Requer MySQL 8.0+.
+UPDATE formulario SET titular_normalizado = LOWER(REGEXP_REPLACE(titular, '^[[:space:]]+|[[:space:]]+$', '')) WHERE titular IS NOT NULL;
+UPDATE fornecedor SET titular_normalizado = LOWER(REGEXP_REPLACE(titular, '^[[:space:]]+|[[:space:]]+$', '')) WHERE titular IS NOT NULL;
+
+-- Índices
+CREATE INDEX idx_formulario_titular_normalizado ON formulario (titular_normalizado, id);
+CREATE INDEX idx_fornecedor_titular_normalizado ON fornecedor (titular_normalizado);
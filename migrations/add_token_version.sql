@@ -0,0 +1,15 @@
+-- Migration: add_token_version.sql
+-- Tokens assinados (services/token_service.py):
+--   users.token_version — incrementada quando o usuário é alterado; tokens
+--                          emitidos com versão anterior deixam de valer
+--   revoked_tokens      — tokens revogados antes de expirar (logout)
+-- Executar uma vez no banco de dados (MySQL)
+
+ALTER TABLE users
+ADD COLUMN token_version INT NOT NULL DEFAULT 0 COMMENT 'Incrementada a cada alteração do usuário (invalida tokens)';
+
+CREATE TABLE IF NOT EXISTS `revoked_tokens` (
+  `jti` CHAR(32) NOT NULL PRIMARY KEY,
+  `expires_at` DATETIME NOT NULL,
+  INDEX `idx_revoked_tokens_expires` (`expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
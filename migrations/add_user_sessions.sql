@@ -0,0 +1,13 @@
+-- Migration: add_user_sessions.sql
+-- Sessões de login compartilhadas entre workers (substitui o dicionário
+-- active_tokens em memória de cada processo). Guarda só o SHA-256 do token.
+-- Executar uma vez no banco de dados (MySQL)
+
+CREATE TABLE IF NOT EXISTS `user_sessions` (
+  `token_hash` CHAR(64) NOT NULL PRIMARY KEY,
+  `user_id` INT NOT NULL,
+  `created_at` DATETIME NOT NULL,
+  `expires_at` DATETIME NOT NULL,
+  INDEX `idx_user_sessions_user` (`user_id`),
+  INDEX `idx_user_sessions_expires` (`expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,16 @@
+-- Migration: fix_titular_normalizado_espacos.sql
+-- O backfill de add_titular_normalizado.sql usava LOWER(TRIM(titular)), mas TRIM
+-- só remove o caractere de espaço, enquanto o backend (normalizar_titular)
+-- remove também tab, quebra de linha, NBSP etc. Linhas antigas com esses
+-- caracteres nas pontas nunca casavam com ?titular=.
+-- Regrava a coluna com a mesma regra do backend: [[:space:]] nas pontas + LOWER.
+-- Requer MySQL 8.0+ (REGEXP_REPLACE).
+-- Executar uma vez no banco de dados (MySQL)
+
+UPDATE formulario
+SET titular_normalizado = LOWER(REGEXP_REPLACE(titular, '^[[:space:]]+|[[:space:]]+$', ''))
+WHERE titular REGEXP '^[[:space:]]|[[:space:]]$';
+
+UPDATE fornecedor
+SET titular_normalizado = LOWER(REGEXP_REPLACE(titular, '^[[:space:]]+|[[:space:]]+$', ''))
+WHERE titular REGEXP '^[[:space:]]|[[:space:]]$';
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
-from services.user_service import authenticate, register_user
+from services.user_service import authenticate, register_user, logout
 from flask_cors import cross_origin
+from services.auth_service import extrair_token, invalidar_usuarios
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -68,4 +69,21 @@ def login():
         "nome": user.get("nome", ""),
         "role": user["role"],
         "token": user["token"]
-    }), 200
\ No newline at end of file
+    }), 200
+
+# ---------------------------
+# LOGOUT
+# ---------------------------
+@auth_bp.route("/logout", methods=["POST", "OPTIONS"])
+@cross_origin()
+def logout_route():
+    if request.method == "OPTIONS":
+        return jsonify({"status": "OK"}), 200
+
+    token = extrair_token()
+    if not token:
+        return jsonify({"error": "Token faltando"}), 401
+
+    logout(token)
+    invalidar_usuarios(token)
+    return jsonify({"message": "Sessão encerrada"}), 200
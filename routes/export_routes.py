@@ -1,205 +1,360 @@
-from flask import Blueprint, request, send_file, jsonify
-import xlsxwriter
-from io import BytesIO
-from datetime import datetime, timedelta
-from db import get_connection
+import itertools
+from flask import Blueprint, request, jsonify, Response, send_file, url_for
+from flask_cors import cross_origin
+from datetime import datetime
+from services.categoria_service import buscar_nomes_categorias
+from services.formulario_service import tem_filtro
+from services.auth_service import usuario_atual
+from services.job_service import ERRO
+from services.export_cache_service import chave_conteudo, chave_selecao, export_cache
+from services.export_service import (
+    XLSX_MIMETYPE,
+    CSV_MIMETYPE,
+    COLUNAR_FORMATOS,
+    LimiteExportacaoError,
+    FormatoIndisponivelError,
+    HistoricoIndisponivelError,
+    gerar_xlsx,
+    gerar_csv,
+    gerar_colunar,
+    ler_em_blocos,
+    tamanho_arquivo,
+    contar_registros,
+    ids_da_exportacao,
+    export_jobs,
+    executar_exportacao_job,
+    SelecaoBanco,
+    linha_exportacao,
+)
 
 export_bp = Blueprint('export', __name__)
 
-def normalize_forma_pagamento(forma_pagamento):
+
+def _origem_registros(data):
+    """
+    Define de onde vêm as linhas da planilha:
+      - exportacao_id: reexporta uma exportação do histórico (direto do MySQL)
+      - filtros / query string: mesmos filtros de GET /formulario (direto do MySQL)
+      - registros: lista enviada pelo frontend (modo legado)
+    Retorna (modo, valor).
+    """
+    if data.get('exportacao_id'):
+        return 'exportacao', int(data['exportacao_id'])
+    if data.get('registros'):
+        return 'registros', data['registros']
+    if isinstance(data.get('filtros'), dict):
+        return 'filtros', data['filtros']
+    return 'filtros', data
+
+
+def _preparador(modo, valor, contar_total=False):
+    """
+    Retorna preparar(stats) -> (registros, categorias_nomes, total), que lê os
+    registros da origem escolhida. É chamado na requisição (modo síncrono) ou
+    dentro do job (modo assíncrono).
+    """
+    def preparar(stats):
+        categorias_nomes = {}
+        if modo == 'registros':
+            registros = valor
+            # Nomes das categorias resolvidos de uma vez (em vez de 1 consulta por linha)
+            categoria_ids = {registro.get('categoria') for registro in registros if registro.get('categoria')}
+            if categoria_ids:
+                try:
+                    categorias_nomes = buscar_nomes_categorias(categoria_ids, stats)
+                except Exception:
+                    categorias_nomes = {}
+            return registros, categorias_nomes, len(registros)
+        if modo == 'exportacao':
+            ids = ids_da_exportacao(valor)
+            stats['consultas'] += 1
+            if not ids:
+                return [], categorias_nomes, 0
+            filtros = {'ids': ','.join(str(i) for i in ids), 'ordenacao': 'id_asc'}
+            return SelecaoBanco(filtros, stats), categorias_nomes, len(ids)
+        # Nome da categoria já vem do JOIN (categoriaNome); total só é usado no progresso do job
+        total = contar_registros(valor) if contar_total else None
+        return SelecaoBanco(valor, stats), categorias_nomes, total
+
+    return preparar
+
+
+def _cacheavel(modo, valor):
+    """Seleções explícitas (ids, exportação do histórico, registros) passam pelo cache em disco."""
+    return modo in ('exportacao', 'registros') or (modo == 'filtros' and bool(valor.get('ids')))
+
+
+def _consultar_cache(formato, extensao, registros, categorias_nomes):
     """
-    Normaliza a forma de pagamento para Título Case.
-    PIX -> Pix, BOLETO -> Boleto, CHEQUE -> Cheque
+    Chave do cache sem ler a seleção do banco: seleções do MySQL usam a
+    assinatura agregada (uma consulta de uma linha); registros enviados pelo
+    frontend já estão em memória e são hasheados direto.
+    Retorna (chave, linhas, arquivo) — arquivo (já aberto) é None quando não está em cache.
     """
-    if not forma_pagamento:
-        return ''
-    
-    # Converter para maiúsculas e remover espaços
-    forma_upper = str(forma_pagamento).strip().upper()
-    
-    if forma_upper == 'PIX':
-        return 'Pix'
-    elif forma_upper == 'BOLETO':
-        return 'Boleto'
-    elif forma_upper == 'CHEQUE':
-        return 'Cheque'
+    if isinstance(registros, SelecaoBanco):
+        chave, linhas = chave_selecao(formato, *registros.assinatura())
     else:
-        # Se não reconhecer, retornar com primeira letra maiúscula
-        return str(forma_pagamento).strip().capitalize() if forma_pagamento else ''
+        chave, linhas = chave_conteudo(
+            formato, (linha_exportacao(registro, categorias_nomes) for registro in registros)
+        )
+    return chave, linhas, export_cache.get(chave, extensao)
+
+
+def _resposta_cache(arquivo, nome_arquivo, mimetype, stats, linhas):
+    response = _resposta_download(
+        ler_em_blocos(arquivo), nome_arquivo, mimetype, stats,
+        linhas=linhas, tamanho=tamanho_arquivo(arquivo),
+    )
+    response.headers['X-Export-Cache'] = 'HIT'
+    return response
+
+
+def _sim(valor):
+    return str(valor or '').lower() in ('1', 'true', 'sim', 'yes')
 
-def normalize_text_field(text):
+
+def _quer_assincrono(data):
+    return _sim(data.get('async'))
+
+
+def _ler_pedido():
     """
-    Normaliza um texto para Título Case (primeira letra maiúscula).
+    Lê os parâmetros da exportação (query string no GET, JSON no POST).
+    Retorna (data, modo, valor, erro) — erro é uma resposta pronta ou None.
     """
-    if not text:
-        return ''
-    
-    text = str(text).strip()
-    return text[0].upper() + text[1:].lower() if len(text) > 0 else ''
+    if request.method == 'GET':
+        data = request.args.to_dict()
+    else:
+        data = request.get_json(silent=True) or {}
 
-@export_bp.route('/api/export/xls', methods=['POST'])
-def export_xls():
-    data = request.get_json()
-    registros = data.get('registros', [])
-
-    if not registros:
-        return jsonify({'error': 'Nenhum registro selecionado'}), 400
-
-    # Criar arquivo Excel em memória com XlsxWriter
-    output = BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-    worksheet = workbook.add_worksheet("Planilha de Importação")
-
-    # Definir cabeçalhos
-    headers = [
-        'ID',
-        'Data Pagamento',
-        'Valor',
-        'Forma de Pagamento',
-        'Quem Paga',
-        'Centro de Custo',
-        'Titular',
-        'CPF/CNPJ',
-        'Chave Pix',
-        'Obra',
-        'Categoria',
-        'Status Lançamento',
-        'Observação'
-    ]
-
-    # Formatos SEM problemas de caracteres especiais
-    header_format = workbook.add_format({
-        'bold': True,
-        'bg_color': '#4472C4',
-        'font_color': 'white',
-        'border': 1,
-        'align': 'center',
-        'valign': 'vcenter'
-    })
-
-    text_format = workbook.add_format({
-        'border': 1,
-        'align': 'left'
-    })
-    
-    # ✅ NOVO: Formato para data (previne problemas de CSV)
-    date_format = workbook.add_format({
-        'border': 1,
-        'align': 'center',
-        'num_format': 'yyyy-mm-dd'
-    })
-
-    # Adicionar cabeçalhos
-    for col_num, header in enumerate(headers):
-        worksheet.write(0, col_num, header, header_format)
-
-    # Adicionar dados
-    row_num = 1
-    for registro in registros:
-        # ID vem como número do frontend
-        id_final = int(registro.get('id', 0)) if registro.get('id') else 0
-
-        # Data vem como string ISO (YYYY-MM-DD) do frontend
-        data_pagamento_raw = registro.get('dataPagamento', '')
-        data_pagamento_final = None
-        if data_pagamento_raw:
-            try:
-                from datetime import datetime as dt
-                data_obj = dt.strptime(data_pagamento_raw, '%Y-%m-%d')
-                data_pagamento_final = data_obj + timedelta(days=1)
-            except Exception:
-                data_pagamento_final = None
-
-        # Valor vem em CENTAVOS do frontend (já convertido pelo adapter)
-        valor_raw = registro.get('valor', 0)
+    try:
+        modo, valor = _origem_registros(data)
+    except (TypeError, ValueError):
+        return data, None, None, (jsonify({'error': 'exportacao_id inválido'}), 400)
+
+    if request.method == 'POST' and modo == 'filtros' and 'filtros' not in data:
+        # POST sem registros, filtros nem exportacao_id: mesmo erro de antes
+        return data, None, None, (jsonify({'error': 'Nenhum registro selecionado'}), 400)
+
+    if modo == 'filtros':
+        # Filtros validados aqui: erros depois disso são do servidor (500), não do pedido
         try:
-            if not valor_raw:
-                valor_final = 0.0
-            else:
-                valor_num = float(valor_raw)
-                # ✅ CORREÇÃO: Valor vem em CENTAVOS, dividir por 100 para reais
-                valor_final = valor_num / 100
-        except Exception:
-            valor_final = 0.0
-
-        forma_pagamento = registro.get('formaDePagamento', '')
-        forma_pagamento_normalizada = normalize_forma_pagamento(forma_pagamento)
-        quem_paga_normalizado = 'Empresa'
-        obra_raw = registro.get('obra', '')
-        obra_normalizada = normalize_text_field(str(obra_raw)) if obra_raw else ''
-
-        categoria_nome = ''
-        categoria_raw = registro.get('categoria')
-        if categoria_raw:
-            try:
-                conn = get_connection()
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute("SELECT nome FROM categoria WHERE id = %s", (categoria_raw,))
-                resultado = cursor.fetchone()
-                cursor.close()
-                conn.close()
-                categoria_nome = resultado['nome'] if resultado else ''
-            except:
-                categoria_nome = ''
-
-        # Status lançamento
-        status = "Lançado" if registro.get('lancado') == 'Y' else "Pendente"
-
-        # ✅ CORREÇÃO: Escrever dados SEM aspas no começo
-        # ID como número puro (sem ')
-        worksheet.write_number(row_num, 0, id_final)
-        
-        # Data como string formatada DD/MM/YYYY (sem ')
-        if data_pagamento_final:
-            data_str = data_pagamento_final.strftime('%d/%m/%Y')
-            worksheet.write(row_num, 1, data_str, text_format)
-        else:
-            worksheet.write(row_num, 1, '', text_format)
-        
-        # Valor como número (sem ')
-        worksheet.write_number(row_num, 2, valor_final)
-        
-        worksheet.write(row_num, 3, str(forma_pagamento_normalizada or ''))  # Forma de Pagamento
-        worksheet.write(row_num, 4, str(quem_paga_normalizado or ''))  # Quem Paga
-        worksheet.write(row_num, 5, str(obra_normalizada or ''))  # Centro de Custo
-        worksheet.write(row_num, 6, str(registro.get('titular', '') or ''))  # Titular
-        worksheet.write(row_num, 7, str(registro.get('cpfCnpjTitularConta', '') or ''))  # CPF/CNPJ
-        worksheet.write(row_num, 8, str(registro.get('chavePix', '') or ''))  # Chave Pix
-        worksheet.write(row_num, 9, str(registro.get('obra', '') or ''))  # Obra
-        worksheet.write(row_num, 10, str(categoria_nome or ''))  # Categoria
-        worksheet.write(row_num, 11, str(status or ''))  # Status Lançamento
-        worksheet.write(row_num, 12, str(registro.get('observacao', '') or ''))  # Observação
-
-        row_num += 1
-
-    # Ajustar largura das colunas
-    worksheet.set_column(0, 0, 10)   # ID
-    worksheet.set_column(1, 1, 15)   # Data Pagamento
-    worksheet.set_column(2, 2, 12)   # Valor
-    worksheet.set_column(3, 3, 18)   # Forma de Pagamento
-    worksheet.set_column(4, 4, 12)   # Quem Paga
-    worksheet.set_column(5, 5, 15)   # Centro de Custo
-    worksheet.set_column(6, 6, 20)   # Titular
-    worksheet.set_column(7, 7, 15)   # CPF/CNPJ
-    worksheet.set_column(8, 8, 15)   # Chave Pix
-    worksheet.set_column(9, 9, 15)   # Obra
-    worksheet.set_column(10, 10, 18) # Categoria
-    worksheet.set_column(11, 11, 18) # Status Lançamento
-    worksheet.set_column(12, 12, 25) # Observação
-
-    workbook.close()
-    output.seek(0)
-
-    # Enviar arquivo como download
-    return send_file(
-        output,
+            filtrado = tem_filtro(valor)
+        except (TypeError, ValueError):
+            return data, None, None, (jsonify({'error': 'Filtros inválidos'}), 400)
+        # Sem nenhum filtro a exportação leria a tabela inteira: só com todos=1
+        if not filtrado and not (_sim(data.get('todos')) or _sim(valor.get('todos'))):
+            return data, None, None, (jsonify({
+                'error': 'Informe ao menos um filtro (ou todos=1 para exportar todos os lançamentos)'
+            }), 400)
+
+    return data, modo, valor, None
+
+
+def _usuario_id():
+    user = usuario_atual()
+    return user["id"] if user else None
+
+
+def _job_do_usuario(job_id):
+    """Job de exportação do usuário atual (None se não existe ou é de outro usuário)."""
+    job = export_jobs.get(job_id)
+    if job is None or not job.acessivel_por(_usuario_id()):
+        return None
+    return job
+
+
+def _nome_arquivo(extensao):
+    return f"lancamentos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extensao}"
+
+
+def _resposta_download(corpo, nome_arquivo, mimetype, stats, linhas=None, tamanho=None):
+    """Resposta de download sem cache, com as métricas da exportação nos cabeçalhos."""
+    response = Response(corpo, mimetype=mimetype, direct_passthrough=True)
+    response.headers['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    if tamanho is not None:
+        response.headers['Content-Length'] = str(tamanho)
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    response.headers['Pragma'] = 'no-cache'
+    response.headers['Expires'] = '0'
+    response.headers['X-Export-Queries'] = str(stats['consultas'])
+    if linhas is not None:
+        response.headers['X-Export-Rows'] = str(linhas)
+    return response
+
+
+@export_bp.route('/api/export/xls', methods=['GET', 'POST'])
+def export_xls():
+    data, modo, valor, erro = _ler_pedido()
+    if erro:
+        return erro
+
+    nome_arquivo = _nome_arquivo('xlsx')
+    assincrono = _quer_assincrono(data)
+    preparar = _preparador(modo, valor, contar_total=assincrono)
+
+    # Modo assíncrono: gera o arquivo em segundo plano e devolve o id do job
+    if assincrono:
+        job = export_jobs.submit(
+            'export_xls', executar_exportacao_job, preparar, nome_arquivo,
+            usuario=data.get('usuario'), dono=_usuario_id(),
+        )
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('export.status_job', job_id=job.id),
+            'download_url': url_for('export.download_job', job_id=job.id),
+        }), 202
+
+    stats = {'consultas': 0}
+    chave = None
+    try:
+        registros, categorias_nomes, _ = preparar(stats)
+        if _cacheavel(modo, valor):
+            chave, linhas, em_cache = _consultar_cache('xlsx', 'xlsx', registros, categorias_nomes)
+            if em_cache:
+                return _resposta_cache(em_cache, nome_arquivo, XLSX_MIMETYPE, stats, linhas)
+    except HistoricoIndisponivelError as e:
+        return jsonify({'error': str(e)}), 500
+
+    # Planilha em modo constant_memory, gravada em arquivo temporário
+    try:
+        arquivo, ids = gerar_xlsx(registros, categorias_nomes)
+    except LimiteExportacaoError as e:
+        return jsonify({'error': str(e)}), 413
+
+    if not ids:
+        arquivo.close()
+        return jsonify({'error': 'Nenhum registro encontrado'}), 404
+
+    if chave:
+        export_cache.put(chave, 'xlsx', arquivo)
+
+    # Enviar arquivo como download, em blocos
+    response = _resposta_download(
+        ler_em_blocos(arquivo), nome_arquivo, XLSX_MIMETYPE, stats,
+        linhas=len(ids), tamanho=tamanho_arquivo(arquivo),
+    )
+    if chave:
+        response.headers['X-Export-Cache'] = 'MISS'
+    return response
+
+
+# ===========================
+# CSV / PARQUET
+# ===========================
+@export_bp.route('/api/export/csv', methods=['GET', 'POST'])
+def export_csv():
+    """
+    Mesmas colunas da planilha, em CSV gerado à medida que as linhas são lidas.
+    Parâmetros extras: separador (padrão ';') e bom (BOM UTF-8 para o Excel).
+    """
+    data, modo, valor, erro = _ler_pedido()
+    if erro:
+        return erro
+
+    separador = str(data.get('separador') or ';')
+    if len(separador) != 1:
+        return jsonify({'error': 'separador deve ter um caractere'}), 400
+    bom = _sim(data.get('bom'))
+
+    stats = {'consultas': 0}
+    try:
+        registros, categorias_nomes, _ = _preparador(modo, valor)(stats)
+        # Lê a primeira linha antes de responder: erro de banco ainda vira 500
+        registros = iter(registros)
+        primeiro = next(registros, None)
+    except HistoricoIndisponivelError as e:
+        return jsonify({'error': str(e)}), 500
+    if primeiro is not None:
+        registros = itertools.chain([primeiro], registros)
+
+    return _resposta_download(
+        gerar_csv(registros, categorias_nomes, separador=separador, bom=bom),
+        _nome_arquivo('csv'), CSV_MIMETYPE, stats,
+    )
+
+
+@export_bp.route('/api/export/parquet', methods=['GET', 'POST'])
+def export_parquet():
+    """Mesmas colunas da planilha em Parquet (padrão) ou Arrow IPC (formato=arrow)."""
+    data, modo, valor, erro = _ler_pedido()
+    if erro:
+        return erro
+
+    formato = str(data.get('formato') or 'parquet').lower()
+    if formato not in COLUNAR_FORMATOS:
+        return jsonify({'error': f"formato deve ser um de: {', '.join(COLUNAR_FORMATOS)}"}), 400
+    extensao, mimetype = COLUNAR_FORMATOS[formato]
+
+    stats = {'consultas': 0}
+    preparar = _preparador(modo, valor)
+    chave = None
+    try:
+        registros, categorias_nomes, _ = preparar(stats)
+        if _cacheavel(modo, valor):
+            chave, linhas, em_cache = _consultar_cache(formato, extensao, registros, categorias_nomes)
+            if em_cache:
+                return _resposta_cache(em_cache, _nome_arquivo(extensao), mimetype, stats, linhas)
+        arquivo, linhas = gerar_colunar(registros, categorias_nomes, formato=formato)
+    except FormatoIndisponivelError as e:
+        return jsonify({'error': str(e)}), 501
+    except LimiteExportacaoError as e:
+        return jsonify({'error': str(e)}), 413
+    except HistoricoIndisponivelError as e:
+        return jsonify({'error': str(e)}), 500
+
+    if chave:
+        export_cache.put(chave, extensao, arquivo)
+
+    response = _resposta_download(
+        ler_em_blocos(arquivo), _nome_arquivo(extensao), mimetype, stats,
+        linhas=linhas, tamanho=tamanho_arquivo(arquivo),
+    )
+    if chave:
+        response.headers['X-Export-Cache'] = 'MISS'
+    return response
+
+
+# ===========================
+# JOBS DE EXPORTAÇÃO
+# ===========================
+@export_bp.route('/api/export/jobs/<job_id>', methods=['GET', 'OPTIONS'])
+@cross_origin()
+def status_job(job_id):
+    if request.method == 'OPTIONS':
+        return jsonify({'status': 'OK'}), 200
+
+    job = _job_do_usuario(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@export_bp.route('/api/export/jobs/<job_id>/download', methods=['GET', 'OPTIONS'])
+@cross_origin()
+def download_job(job_id):
+    if request.method == 'OPTIONS':
+        return jsonify({'status': 'OK'}), 200
+
+    job = _job_do_usuario(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    if job.status == ERRO:
+        return jsonify({'error': job.erro}), 500
+    if not job.terminado:
+        return jsonify({'error': 'Exportação ainda em andamento', 'progresso': job.progresso}), 409
+    if not job.resultado.get('linhas'):
+        return jsonify({'error': 'Nenhum registro encontrado'}), 404
+
+    response = send_file(
+        job.arquivo,
         as_attachment=True,
-        download_name=f"lancamentos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            'Content-Disposition': f'attachment; filename="lancamentos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"',
-            'Cache-Control': 'no-cache, no-store, must-revalidate',
-            'Pragma': 'no-cache',
-            'Expires': '0'
-        }
-    )
\ No newline at end of file
+        download_name=job.nome_arquivo,
+        mimetype=job.mimetype,
+    )
+    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+    response.headers['X-Export-Rows'] = str(job.resultado.get('linhas', 0))
+    if job.resultado.get('exportacao_id'):
+        response.headers['X-Exportacao-Id'] = str(job.resultado['exportacao_id'])
+    return response
@@ -1,10 +1,26 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context, url_for
 from flask_cors import cross_origin
 from db import get_connection
-from services.google_drive_service import upload_files_batch, create_folder
+from services.upload_service import agendar_upload, upload_jobs
+from services.formulario_service import (
+    ORDER_MAP,
+    COUNT_MODOS,
+    order_parts,
+    order_clause,
+    montar_filtros,
+    contar_formularios,
+    invalidar_contagens,
+    ordem_relevancia,
+)
+from services.fornecedor_service import nomes_fornecedores, normalizar_titular
+from services.titular_service import indice_titulares, catalogo_titulares
+from services.obra_service import obras_visiveis
+from services.auth_service import usuario_atual
 import json
 import sys
-from datetime import datetime, timedelta, timezone
+import base64
+from decimal import Decimal
+from datetime import date, datetime, timedelta, timezone
 
 # ✅ Timezone ajustado: servidor MySQL está em UTC+1, Brasília é UTC-3
 # Diferença total = -4 horas em relação ao horário do servidor
@@ -24,30 +40,13 @@ def buscar_titulares():
     if not query:
         return jsonify([]), 200
 
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    # Consulta a tabela 'fornecedor' em vez de 'formulario'
-    sql_query = """
-        SELECT id, titular, cpf_cnpj 
-        FROM fornecedor 
-        WHERE titular LIKE %s 
-        ORDER BY titular ASC
-        LIMIT 10
-    """
-    
-    search_term = f"%{query}%"
-    
+    # Índice em memória da tabela 'fornecedor' (prefixo → palavra → substring)
     try:
-        cursor.execute(sql_query, (search_term,))
-        fornecedores = cursor.fetchall()
+        fornecedores = indice_titulares.buscar(query, limite=10)
         return jsonify(fornecedores), 200
     except Exception as e:
         print(f"Erro ao buscar fornecedores: {e}")
         return jsonify({"error": "Erro interno do servidor"}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 # ===========================
 # ENDPOINT DE TESTE - Confirma que o código novo está rodando
@@ -58,22 +57,64 @@ def version_check():
     return jsonify({"version": "2026-03-11-stderr", "fornecedor_novo_ativo": True}), 200
 
 # ===========================
-# MAPEAMENTO DE ORDENAÇÃO (frontend → SQL)
+# PAGINAÇÃO POR CURSOR (keyset)
 # ===========================
-ORDER_MAP = {
-    "id_asc": "id ASC",
-    "id_desc": "id DESC",
-    "valor_asc": "valor ASC",
-    "valor_desc": "valor DESC",
-    "titular_asc": "titular ASC",
-    "titular_desc": "titular DESC",
-    "referente_asc": "referente ASC",
-    "referente_desc": "referente DESC",
-    "dataLancamento_asc": "data_lancamento ASC",
-    "dataLancamento_desc": "data_lancamento DESC",
-    "dataPagamento_asc": "data_pagamento ASC",
-    "dataPagamento_desc": "data_pagamento DESC",
-}
+def _cursor_value(valor):
+    """Converte o valor da chave de ordenação para algo serializável em JSON."""
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.strftime('%Y-%m-%d')
+    return valor
+
+
+def _encode_cursor(ordenacao, form_raw):
+    """Gera o token opaco 'after' a partir do último registro da página."""
+    coluna, _ = order_parts(ordenacao)
+    payload = {
+        "o": ordenacao if ordenacao in ORDER_MAP else "id_desc",
+        "v": _cursor_value(form_raw.get(coluna)),
+        "id": form_raw["id"],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token):
+    """Decodifica o token 'after'. Lança ValueError se for inválido."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return payload["o"], payload.get("v"), int(payload["id"])
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def _keyset_condition(ordenacao, valor, ultimo_id):
+    """
+    Predicado que posiciona a consulta logo após o último registro visto,
+    usando o índice (coluna, id) em vez de OFFSET.
+    No MySQL, NULL vem primeiro em ASC e por último em DESC.
+    """
+    coluna, direcao = order_parts(ordenacao)
+    op = ">" if direcao == "ASC" else "<"
+
+    if coluna == "id":
+        return f"f.id {op} %s", [ultimo_id]
+
+    col = f"f.{coluna}"
+    if valor is None:
+        if direcao == "ASC":
+            return f"(({col} IS NULL AND f.id > %s) OR {col} IS NOT NULL)", [ultimo_id]
+        return f"({col} IS NULL AND f.id < %s)", [ultimo_id]
+
+    sql = f"({col} {op} %s OR ({col} = %s AND f.id {op} %s)"
+    if direcao == "DESC":
+        sql += f" OR {col} IS NULL"
+    sql += ")"
+    return sql, [valor, valor, ultimo_id]
 
 # ===========================
 # FUNÇÕES AUXILIARES (pós-processamento)
@@ -119,125 +160,89 @@ def _postprocess_formulario(form, brasilia_tz):
     return form
 
 
-def _batch_load_obras_relacionadas(cursor, formularios):
-    """Carrega obras relacionadas em batch usando formulario_obras (novo formato)
-       + fallback para grupo_id (formato antigo/legado)."""
-    
-    form_ids = [f["id"] for f in formularios if f.get("id")]
-    
-    if not form_ids:
-        return
+# Obras adicionais (formulario_obras) carregadas na própria consulta principal,
+# agregadas em JSON por formulário (índice idx_formulario_obras_formulario).
+OBRAS_RELACIONADAS_SQL = """(
+    SELECT JSON_ARRAYAGG(JSON_OBJECT('id', fo.id, 'obra', fo.obra_id, 'valor', fo.valor))
+    FROM formulario_obras fo
+    WHERE fo.formulario_id = f.id
+) AS obras_relacionadas_json"""
+
+SELECT_FORMULARIO = f"SELECT f.*, {OBRAS_RELACIONADAS_SQL} FROM formulario f"
+
+
+def _aplicar_obras_relacionadas(cursor, formularios):
+    """Monta obras_relacionadas a partir da coluna JSON da consulta principal
+       + fallback para grupo_id (formato legado, antes do backfill)."""
     
     # =========================================================
-    # 1) NOVO FORMATO: buscar de formulario_obras
+    # 1) NOVO FORMATO: coluna obras_relacionadas_json (formulario_obras)
     # =========================================================
-    obras_by_form = {}
-    placeholders = ",".join(["%s"] * len(form_ids))
-    try:
-        cursor.execute(f"""
-            SELECT fo.formulario_id, fo.obra_id AS obra, fo.valor, fo.id AS fo_id
-            FROM formulario_obras fo
-            WHERE fo.formulario_id IN ({placeholders})
-            ORDER BY fo.id ASC
-        """, tuple(form_ids))
-        rows = cursor.fetchall()
-        
-        for r in rows:
-            fid = r["formulario_id"]
-            if fid not in obras_by_form:
-                obras_by_form[fid] = []
-            if "valor" in r and r["valor"] is not None:
-                r["valor"] = float(r["valor"])
-            obras_by_form[fid].append({
-                "id": r.get("fo_id"),
-                "obra": r.get("obra"),
-                "valor": r.get("valor", 0),
-            })
-        
-        print(f"[BATCH_LOAD] formulario_obras: {len(rows)} registros para {len(obras_by_form)} formulários", file=sys.stderr, flush=True)
-    except Exception as e:
-        print(f"[BATCH_LOAD] ⚠️ Erro ao buscar formulario_obras: {e}", file=sys.stderr, flush=True)
+    legados = []
+    for form in formularios:
+        bruto = form.pop("obras_relacionadas_json", None)
+        obras = []
+        if bruto:
+            if isinstance(bruto, (bytes, bytearray)):
+                bruto = bruto.decode("utf-8")
+            obras = sorted(json.loads(bruto), key=lambda o: o.get("id") or 0)
+            for obra in obras:
+                obra["valor"] = float(obra.get("valor") or 0)
+        
+        if obras:
+            form["grupo_lancamento"] = str(form["id"])  # Frontend usa isso para detectar múltiplo
+            _definir_obras_relacionadas(form, obras)
+        elif form.get("grupo_id"):
+            legados.append(form)
     
     # =========================================================
-    # 2) FALLBACK LEGADO: buscar irmãos pelo grupo_id (antigo)
+    # 2) FALLBACK LEGADO: irmãos pelo grupo_id (só se ainda houver
+    #    registros não convertidos por backfill_formulario_obras.py)
     # =========================================================
-    grupo_ids = set()
-    forms_sem_obras = []
-    for form in formularios:
-        fid = form.get("id")
-        if fid not in obras_by_form:
-            gid = form.get("grupo_id")
-            if gid:
-                grupo_ids.add(gid)
-                forms_sem_obras.append(form)
+    if not legados:
+        return
+    
+    grupo_ids = {form["grupo_id"] for form in legados}
+    ph = ",".join(["%s"] * len(grupo_ids))
+    cursor.execute(f"""
+        SELECT id, obra, valor, referente, data_pagamento, forma_pagamento, grupo_id
+        FROM formulario
+        WHERE grupo_id IN ({ph})
+        ORDER BY id ASC
+    """, tuple(grupo_ids))
     
     related_by_grupo = {}
-    if grupo_ids:
-        ph = ",".join(["%s"] * len(grupo_ids))
-        cursor.execute(f"""
-            SELECT id, obra, valor, referente, data_pagamento, forma_pagamento, grupo_id
-            FROM formulario
-            WHERE grupo_id IN ({ph})
-            ORDER BY id ASC
-        """, tuple(grupo_ids))
-        all_related = cursor.fetchall()
-        
-        for r in all_related:
-            gid = r.get("grupo_id")
-            if gid not in related_by_grupo:
-                related_by_grupo[gid] = []
-            if "valor" in r and r["valor"] is not None:
-                r["valor"] = float(r["valor"])
-            related_by_grupo[gid].append(r)
-        
-        print(f"[BATCH_LOAD] LEGADO grupo_id: {len(all_related)} registros para {len(grupo_ids)} grupos", file=sys.stderr, flush=True)
+    for r in cursor.fetchall():
+        if r.get("valor") is not None:
+            r["valor"] = float(r["valor"])
+        related_by_grupo.setdefault(r.pop("grupo_id"), []).append(r)
     
-    # =========================================================
-    # 3) Atribuir obras_relacionadas a cada formulário
-    # =========================================================
-    for form in formularios:
-        fid = form.get("id")
-        obras_relacionadas = []
-        
-        # Prioridade 1: formulario_obras (novo formato)
-        if fid in obras_by_form:
-            obras_relacionadas = obras_by_form[fid]
-            form["grupo_lancamento"] = str(fid)  # Frontend usa isso para detectar múltiplo
-        else:
-            # Prioridade 2: grupo_id legado
-            gid = form.get("grupo_id")
-            if gid:
-                all_in_group = related_by_grupo.get(gid, [])
-                obras_relacionadas = [r for r in all_in_group if r["id"] != fid]
-                for obra in obras_relacionadas:
-                    obra.pop('grupo_id', None)
-                if obras_relacionadas:
-                    form["grupo_lancamento"] = str(gid)  # Compatibilidade frontend
-        
-        if obras_relacionadas:
-            form["obras_relacionadas"] = obras_relacionadas
-            
-            # Calcular valor total
-            valor_total = float(form.get("valor") or 0)
-            for obra in obras_relacionadas:
-                valor_total += float(obra.get("valor") or 0)
-            form["valor_total"] = valor_total
-            form["valor_principal"] = float(form.get("valor") or 0)
+    for form in legados:
+        gid = form["grupo_id"]
+        obras = [dict(r) for r in related_by_grupo.get(gid, []) if r["id"] != form["id"]]
+        if obras:
+            form["grupo_lancamento"] = str(gid)  # Compatibilidade frontend
+            _definir_obras_relacionadas(form, obras)
 
 
-def _check_fornecedores_novos(cursor, formularios):
-    """Verifica se os titulares existem na tabela fornecedor (batch)."""
-    fornecedores_nomes = set()
-    try:
-        cursor.execute("SELECT LOWER(TRIM(titular)) AS nome FROM fornecedor")
-        rows = cursor.fetchall()
-        fornecedores_nomes = set(row["nome"] for row in rows if row.get("nome"))
-    except Exception as e_forn:
-        print(f"⚠️ Erro ao buscar fornecedores: {e_forn}", file=sys.stderr, flush=True)
+def _definir_obras_relacionadas(form, obras_relacionadas):
+    form["obras_relacionadas"] = obras_relacionadas
+    
+    # Calcular valor total
+    valor_total = float(form.get("valor") or 0)
+    for obra in obras_relacionadas:
+        valor_total += float(obra.get("valor") or 0)
+    form["valor_total"] = valor_total
+    form["valor_principal"] = float(form.get("valor") or 0)
+
+
+def _check_fornecedores_novos(formularios):
+    """Verifica se os titulares existem na tabela fornecedor (índice em memória)."""
+    fornecedores_nomes = nomes_fornecedores()
     
     for form in formularios:
-        titular_raw = form.get("titular") or ""
-        titular = titular_raw.strip().lower()
+        # Usa a coluna persistida; registros sem ela (antes da migração) normalizam aqui
+        titular = form.pop("titular_normalizado", None) or normalizar_titular(form.get("titular"))
         if titular and titular in fornecedores_nomes:
             form["fornecedor_novo"] = False
         elif titular:
@@ -246,6 +251,57 @@ def _check_fornecedores_novos(cursor, formularios):
             form["fornecedor_novo"] = False
 
 
+# ===========================
+# STREAMING DA LISTAGEM (JSON em array ou NDJSON)
+# ===========================
+STREAM_FORMATOS = ("json", "ndjson")
+STREAM_BATCH_SIZE = 500
+
+
+def _stream_formularios(data_sql, params, formato):
+    """
+    Resposta em chunks: lê o resultado com fetchmany() e faz o pós-processamento,
+    obras relacionadas e checagem de fornecedor por lote, sem montar a lista toda.
+    """
+    def gerar():
+        # Cursor sem buffer: as linhas vêm do servidor conforme são lidas.
+        # Consultas auxiliares usam outra conexão, pois esta fica ocupada.
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        conn_aux = get_connection()
+        cursor_aux = conn_aux.cursor(dictionary=True)
+        try:
+            cursor.execute(data_sql, params)
+            primeiro = True
+            if formato == "json":
+                yield "["
+            while True:
+                lote = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not lote:
+                    break
+                for form in lote:
+                    _postprocess_formulario(form, BRASILIA_TZ)
+                _aplicar_obras_relacionadas(cursor_aux, lote)
+                _check_fornecedores_novos(lote)
+
+                itens = [current_app.json.dumps(form) for form in lote]
+                if formato == "ndjson":
+                    yield "\n".join(itens) + "\n"
+                else:
+                    yield ("" if primeiro else ",") + ",".join(itens)
+                primeiro = False
+            if formato == "json":
+                yield "]"
+        finally:
+            cursor_aux.close()
+            conn_aux.close()
+            cursor.close()
+            conn.close()
+
+    mimetype = "application/x-ndjson" if formato == "ndjson" else "application/json"
+    return Response(stream_with_context(gerar()), mimetype=mimetype)
+
+
 # ===========================
 # LISTAR FORMULÁRIOS (GET) — com filtros server-side e paginação
 # ===========================
@@ -258,186 +314,120 @@ def listar_formularios():
     # --- Parâmetros de paginação ---
     page = request.args.get("page", type=int)  # Se ausente, retorna tudo (backward compat)
     per_page = request.args.get("per_page", 100, type=int)
-    per_page = min(per_page, 500)  # Limite de segurança
-    
-    # --- Parâmetros de filtro ---
-    status = request.args.get("status", "")
-    forma_pagamento = request.args.get("forma_pagamento", "")
-    data_exata = request.args.get("data", "")
-    data_inicio = request.args.get("data_inicio", "")
-    data_fim = request.args.get("data_fim", "")
-    obra = request.args.get("obra", "")
-    titular = request.args.get("titular", "")
-    solicitante = request.args.get("solicitante", "")
-    referente = request.args.get("referente", "")
-    busca = request.args.get("busca", "")
-    multiplos = request.args.get("multiplos", "todos")
-    codigo_barra_status = request.args.get("codigo_barra_status", "todos")
-    ids_filter = request.args.get("ids", "")  # IDs separados por vírgula (histórico)
+    per_page = max(1, min(per_page, 500))  # Limite de segurança (1..500)
+    # Paginação por cursor: presença de ?after= ativa o modo (vazio = primeira página)
+    after = request.args.get("after")
+    keyset = after is not None
+    
     ordenacao = request.args.get("ordenacao", "id_desc")
+    # Contagem: exact (padrão, em cache), estimate (EXPLAIN) ou none
+    count_modo = request.args.get("count", "none" if keyset else "exact")
+    if count_modo not in COUNT_MODOS:
+        return jsonify({"error": f"Parâmetro 'count' inválido (use {', '.join(COUNT_MODOS)})"}), 400
+    
+    # --- Construir WHERE dinâmico (limitado às obras do usuário autenticado) ---
+    where_parts, params, chave_filtros = montar_filtros(
+        request.args, obras_visiveis(usuario_atual())
+    )
     
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     
-    # --- Construir WHERE dinâmico ---
-    where_parts = ["1=1"]
-    params = []
-    
-    # Filtro: Status (lancado)
-    if status:
-        status_map = {
-            "PENDENTE": ("f.lancado = %s", "N"),
-            "LANCADO": ("f.lancado IN ('Y', 'S', '1')", None),
-            "NAO_AUTORIZADO": ("f.lancado = %s", "X"),
-            "APROVADO": ("f.lancado = %s", "A"),
-            "PAGO": ("f.lancado = %s", "P"),
-        }
-        if status in status_map:
-            sql_part, param = status_map[status]
-            where_parts.append(sql_part)
-            if param is not None:
-                params.append(param)
-    
-    # Filtro: Forma de pagamento
-    if forma_pagamento:
-        where_parts.append("UPPER(TRIM(f.forma_pagamento)) = UPPER(TRIM(%s))")
-        params.append(forma_pagamento)
-    
-    # Filtro: Data exata
-    if data_exata:
-        where_parts.append("f.data_pagamento = %s")
-        params.append(data_exata)
-    
-    # Filtro: Data intervalo
-    if data_inicio:
-        where_parts.append("f.data_pagamento >= %s")
-        params.append(data_inicio)
-    if data_fim:
-        where_parts.append("f.data_pagamento <= %s")
-        params.append(data_fim)
-    
-    # Filtro: Obra
-    if obra:
-        where_parts.append("f.obra = %s")
-        params.append(int(obra))
-    
-    # Filtro: Titular (match exato case-insensitive)
-    if titular:
-        where_parts.append("UPPER(TRIM(f.titular)) = UPPER(TRIM(%s))")
-        params.append(titular)
-    
-    # Filtro: Solicitante (busca parcial)
-    if solicitante:
-        where_parts.append("UPPER(f.solicitante) LIKE %s")
-        params.append(f"%{solicitante.upper()}%")
-    
-    # Filtro: Referente/Descrição (busca parcial)
-    if referente:
-        where_parts.append("UPPER(f.referente) LIKE %s")
-        params.append(f"%{referente.upper()}%")
-    
-    # Filtro: Busca mista (valor, titular, referente)
-    if busca:
-        busca_like = f"%{busca.strip()}%"
-        # Tenta converter para centavos para busca numérica
-        busca_centavos = None
-        try:
-            busca_clean = busca.strip().replace(".", "").replace(",", ".").replace("R$", "").replace(" ", "")
-            busca_float = float(busca_clean)
-            busca_centavos = int(round(busca_float * 100))
-        except (ValueError, TypeError):
-            pass
-        
-        if busca_centavos is not None:
-            where_parts.append("""
-                (f.titular LIKE %s OR f.referente LIKE %s 
-                 OR f.valor = %s OR CAST(f.valor AS CHAR) LIKE %s)
-            """)
-            params.extend([busca_like, busca_like, busca_centavos, busca_like])
-        else:
-            where_parts.append("(f.titular LIKE %s OR f.referente LIKE %s)")
-            params.extend([busca_like, busca_like])
-    
-    # Filtro: Múltiplos lançamentos (novo: formulario_obras, legado: grupo_id)
-    if multiplos == "sim":
-        where_parts.append("""
-            (f.id IN (SELECT DISTINCT formulario_id FROM formulario_obras)
-             OR f.grupo_id IS NOT NULL)
-        """)
-    elif multiplos == "nao":
-        where_parts.append("""
-            (f.id NOT IN (SELECT DISTINCT formulario_id FROM formulario_obras)
-             AND f.grupo_id IS NULL)
-        """)
-    
-    # Filtro: Código de barras (boleto)
-    if codigo_barra_status == "vazio":
-        where_parts.append("""
-            (LOWER(TRIM(f.forma_pagamento)) = 'boleto' 
-             AND (f.chave_pix IS NULL OR TRIM(f.chave_pix) = ''))
-        """)
-    elif codigo_barra_status == "preenchido":
-        where_parts.append("""
-            (LOWER(TRIM(f.forma_pagamento)) = 'boleto' 
-             AND f.chave_pix IS NOT NULL AND TRIM(f.chave_pix) != '')
-        """)
-    
-    # Filtro: IDs específicos (histórico de exportação)
-    if ids_filter:
+    # --- Count total (para paginação) — antes do predicado do cursor ---
+    total = None
+    total_estimado = False
+    if page or keyset:
+        total, total_estimado = contar_formularios(
+            cursor, " AND ".join(where_parts), params, chave_filtros, count_modo
+        )
+    
+    # --- Ordenação ---
+    order_sql = order_clause(ordenacao)
+    order_params = []
+    # Relevância da busca textual (não combina com cursor, que precisa de chave estável)
+    if ordenacao == "relevancia" and not keyset:
+        relevancia = ordem_relevancia(request.args)
+        if relevancia:
+            order_sql, order_params = relevancia
+    
+    # --- Cursor (keyset): posiciona logo após o último registro da página anterior ---
+    if keyset and after:
         try:
-            id_list = [int(x.strip()) for x in ids_filter.split(",") if x.strip()]
-            if id_list:
-                placeholders = ",".join(["%s"] * len(id_list))
-                where_parts.append(f"f.id IN ({placeholders})")
-                params.extend(id_list)
-        except ValueError:
-            pass
+            cursor_ordenacao, cursor_valor, cursor_id = _decode_cursor(after)
+        except ValueError as e:
+            cursor.close()
+            conn.close()
+            return jsonify({"error": str(e)}), 400
+        if cursor_ordenacao != (ordenacao if ordenacao in ORDER_MAP else "id_desc"):
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Cursor não corresponde à ordenação informada"}), 400
+        sql_part, cursor_params = _keyset_condition(ordenacao, cursor_valor, cursor_id)
+        where_parts.append(sql_part)
+        params.extend(cursor_params)
     
     where_sql = " AND ".join(where_parts)
     
-    # --- Ordenação ---
-    order_sql = ORDER_MAP.get(ordenacao, "id DESC")
-    
-    # --- Count total (para paginação) ---
-    total = 0
-    if page:
-        count_sql = f"SELECT COUNT(*) as total FROM formulario f WHERE {where_sql}"
-        cursor.execute(count_sql, tuple(params))
-        total = cursor.fetchone()["total"]
+    # --- Streaming (sem paginação): lê o cursor em lotes, memória constante ---
+    stream = request.args.get("stream", "")
+    if stream and not page and not keyset:
+        cursor.close()
+        conn.close()
+        if stream not in STREAM_FORMATOS:
+            return jsonify({"error": f"Parâmetro 'stream' inválido (use {', '.join(STREAM_FORMATOS)})"}), 400
+        data_sql = f"{SELECT_FORMULARIO} WHERE {where_sql} ORDER BY {order_sql}"
+        return _stream_formularios(data_sql, tuple(params + order_params), stream)
     
     # --- Buscar dados ---
-    if page:
+    if keyset:
+        # Busca 1 registro a mais para saber se existe próxima página
+        data_sql = f"{SELECT_FORMULARIO} WHERE {where_sql} ORDER BY {order_sql} LIMIT %s"
+        cursor.execute(data_sql, tuple(params) + (per_page + 1,))
+    elif page:
         offset = (page - 1) * per_page
-        data_sql = f"SELECT f.* FROM formulario f WHERE {where_sql} ORDER BY {order_sql} LIMIT %s OFFSET %s"
-        cursor.execute(data_sql, tuple(params) + (per_page, offset))
+        data_sql = f"{SELECT_FORMULARIO} WHERE {where_sql} ORDER BY {order_sql} LIMIT %s OFFSET %s"
+        cursor.execute(data_sql, tuple(params + order_params) + (per_page, offset))
     else:
-        data_sql = f"SELECT f.* FROM formulario f WHERE {where_sql} ORDER BY {order_sql}"
-        cursor.execute(data_sql, tuple(params))
+        data_sql = f"{SELECT_FORMULARIO} WHERE {where_sql} ORDER BY {order_sql}"
+        cursor.execute(data_sql, tuple(params + order_params))
     
     formularios = cursor.fetchall()
     
+    next_cursor = None
+    if keyset:
+        if len(formularios) > per_page:
+            formularios = formularios[:per_page]
+            # Cursor gerado antes do pós-processamento (valores crus do banco)
+            next_cursor = _encode_cursor(ordenacao, formularios[-1])
+    
     # --- Pós-processamento ---
     for form in formularios:
         _postprocess_formulario(form, BRASILIA_TZ)
     
-    # --- Carregar obras relacionadas em batch ---
-    cursor2 = conn.cursor(dictionary=True)
-    _batch_load_obras_relacionadas(cursor2, formularios)
-    cursor2.close()
+    # --- Obras relacionadas (já vieram na consulta principal) ---
+    _aplicar_obras_relacionadas(cursor, formularios)
     
     # --- Verificar fornecedores novos ---
-    cursor3 = conn.cursor(dictionary=True)
-    _check_fornecedores_novos(cursor3, formularios)
-    cursor3.close()
+    _check_fornecedores_novos(formularios)
     
     cursor.close()
     conn.close()
     
     # --- Resposta ---
-    if page:
+    if keyset:
+        return jsonify({
+            "data": formularios,
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "total": total,
+            "total_estimado": total_estimado,
+        }), 200
+    elif page:
         return jsonify({
             "data": formularios,
             "total": total,
+            "total_estimado": total_estimado,
             "page": page,
             "per_page": per_page,
         }), 200
@@ -458,7 +448,7 @@ def buscar_formulario(form_id):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     
-    cursor.execute("SELECT * FROM formulario WHERE id = %s", (form_id,))
+    cursor.execute(f"{SELECT_FORMULARIO} WHERE f.id = %s", (form_id,))
     form = cursor.fetchone()
     
     if not form:
@@ -469,11 +459,11 @@ def buscar_formulario(form_id):
     # Pós-processamento
     _postprocess_formulario(form, BRASILIA_TZ)
     
-    # Carregar obras relacionadas
-    _batch_load_obras_relacionadas(cursor, [form])
+    # Obras relacionadas (já vieram na consulta)
+    _aplicar_obras_relacionadas(cursor, [form])
     
     # Verificar fornecedor novo
-    _check_fornecedores_novos(cursor, [form])
+    _check_fornecedores_novos([form])
     
     cursor.close()
     conn.close()
@@ -603,8 +593,8 @@ def criar_formulario():
                 data_lancamento, solicitante, titular, referente, valor, obra, 
                 data_pagamento, forma_pagamento, lancado, cpf_cnpj, chave_pix, 
                 data_competencia, carimbo, observacao, conta, categoria, 
-                fornecedor_novo, uuid, id_solicitante
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s)
+                fornecedor_novo, uuid, id_solicitante, titular_normalizado
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s, %s)
         """, (
             data["data_lancamento"], 
             data["solicitante"], 
@@ -623,7 +613,8 @@ def criar_formulario():
             data.get("categoria"),
             data.get("fornecedor_novo", 0),
             solicitante_uuid,
-            solicitante_id
+            solicitante_id,
+            normalizar_titular(data["titular"])
         ))
         formulario_id = cursor.lastrowid
         print(f"✅ Formulário criado — ID {formulario_id}, obra={obra_id_principal}, valor={valor_centavos}", file=sys.stderr, flush=True)
@@ -656,6 +647,8 @@ def criar_formulario():
         
         # COMMIT atômico — tudo ou nada
         conn.commit()
+        invalidar_contagens()
+        catalogo_titulares.adicionar(data["titular"])
         
     except Exception as e:
         conn.rollback()
@@ -694,6 +687,11 @@ def atualizar_formulario(form_id):
         if campo in data:
             set_clauses.append(f"{campo} = %s")
             valores.append(data[campo])
+    
+    # Mantém a coluna normalizada (filtro por titular / fornecedor_novo)
+    if "titular" in data:
+        set_clauses.append("titular_normalizado = %s")
+        valores.append(normalizar_titular(data["titular"]))
 
     if not set_clauses and "obras_adicionais" not in data:
         return jsonify({"error": "Nenhum campo para atualizar"}), 400
@@ -737,6 +735,9 @@ def atualizar_formulario(form_id):
                         print(f"   [{idx}] formulario_obras: obra={obra_id}, valor={valor_centavos}", file=sys.stderr, flush=True)
         
         conn.commit()
+        invalidar_contagens()
+        if "titular" in data:
+            catalogo_titulares.adicionar(data["titular"])
     except Exception as e:
         conn.rollback()
         print(f"❌ Erro ao atualizar formulário {form_id}: {e}", file=sys.stderr, flush=True)
@@ -789,6 +790,8 @@ def deletar_formulario(form_id):
             print(f"🗑️ DELETE ID={form_id}: {total_deletados} registro removido (formulario_obras limpo por CASCADE)", file=sys.stderr, flush=True)
         
         conn.commit()
+        invalidar_contagens()
+        catalogo_titulares.invalidar()
         
     except Exception as e:
         print(f"❌ ERRO na exclusão: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
@@ -815,37 +818,18 @@ def listar_titulares_distinct():
     if request.method == "OPTIONS":
         return jsonify({"status": "OK"}), 200
 
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    # Busca titulares da tabela 'fornecedor' (cadastros) + titulares usados em formulários
-    sql_query = """
-        SELECT DISTINCT titular
-        FROM (
-            SELECT TRIM(titular) AS titular FROM fornecedor WHERE TRIM(titular) != ''
-            UNION
-            SELECT TRIM(titular) AS titular FROM formulario WHERE titular IS NOT NULL AND TRIM(titular) != ''
-        ) AS todos
-        ORDER BY titular ASC
-    """
-    
+    # Catálogo em memória (fornecedor + formulario), já serializado.
+    # Com If-None-Match igual ao ETag atual, responde 304 sem corpo.
     try:
-        cursor.execute(sql_query)
-        registros = cursor.fetchall()
-        
-        # Formata a resposta para { id: NOME, nome: NOME }
-        titulares_formatados = [{
-            "id": t['titular'], 
-            "nome": t['titular']
-        } for t in registros]
-        
-        return jsonify(titulares_formatados), 200
+        corpo, etag = catalogo_titulares.snapshot()
     except Exception as e:
         print(f"Erro ao buscar lista de titulares: {e}")
         return jsonify({"error": "Erro interno ao buscar titulares"}), 500
-    finally:
-        cursor.close()
-        conn.close()
+    
+    resposta = Response(corpo, mimetype="application/json")
+    resposta.set_etag(etag)
+    resposta.headers["Cache-Control"] = "no-cache"
+    return resposta.make_conditional(request)
 
 # ===========================
 # UPLOAD DE ARQUIVOS PARA GOOGLE DRIVE (POST)
@@ -854,11 +838,13 @@ def listar_titulares_distinct():
 @cross_origin()
 def upload_anexos(form_id):
     """
-    Realiza upload de múltiplos arquivos para Google Drive
-    e salva os links no banco de dados
-    
+    Recebe os arquivos e agenda o upload para o Google Drive em segundo plano.
+    Os links são salvos em formulario.link_anexo quando o job termina.
+
     Espera:
     - files: Múltiplos arquivos via form-data
+
+    Retorna 202 com o id do job (acompanhar em GET /formulario/uploads/<job_id>).
     """
     if request.method == "OPTIONS":
         return jsonify({"status": "OK"}), 200
@@ -890,42 +876,37 @@ def upload_anexos(form_id):
         
         obra_id = formulario.get('obra', 'sem-obra')
         
-        # Fazer upload para Google Drive
-        print(f"[INFO] Iniciando upload dos arquivos para Google Drive")
-        upload_results = upload_files_batch(files, form_id, obra_id)
-        
-        if not upload_results:
-            print(f"[ERRO] Falha ao fazer upload dos arquivos")
-            return jsonify({"error": "Falha ao fazer upload dos arquivos"}), 500
-        
-        print(f"[INFO] Arquivos upados com sucesso: {len(upload_results)}")
-        
-        # Salvar links no banco de dados (JSON)
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Converter lista de links para JSON
-        links_json = json.dumps(upload_results)
-        print(f"[INFO] Salvando links no banco de dados")
-        
-        cursor.execute(
-            "UPDATE formulario SET link_anexo = %s WHERE id = %s",
-            (links_json, form_id)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        print(f"[INFO] Upload completado com sucesso para formulário {form_id}")
+        # Gravar em disco e agendar o envio ao Google Drive
+        job = agendar_upload(form_id, obra_id, files)
+        if job is None:
+            return jsonify({"error": "Nenhum arquivo foi enviado"}), 400
+
+        print(f"[INFO] Upload do formulário {form_id} agendado (job {job.id})")
         
         return jsonify({
-            "message": "Arquivos enviados com sucesso",
+            "message": "Arquivos recebidos; upload em andamento",
             "form_id": form_id,
-            "files": upload_results
-        }), 200
+            "job_id": job.id,
+            "status_url": url_for("formulario.status_upload", job_id=job.id),
+        }), 202
     
     except Exception as e:
-        print(f"[ERRO] Erro ao fazer upload: {str(e)}")
+        print(f"[ERRO] Erro ao receber arquivos: {str(e)}")
         import traceback
         traceback.print_exc()
-        return jsonify({"error": f"Erro ao fazer upload: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Erro ao fazer upload: {str(e)}"}), 500
+
+
+# ===========================
+# STATUS DO UPLOAD EM SEGUNDO PLANO (GET)
+# ===========================
+@formulario_bp.route("/formulario/uploads/<job_id>", methods=["GET", "OPTIONS"])
+@cross_origin()
+def status_upload(job_id):
+    if request.method == "OPTIONS":
+        return jsonify({"status": "OK"}), 200
+
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado ou expirado"}), 404
+    return jsonify(job.to_dict()), 200
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 from db import get_connection
+from services.fornecedor_service import invalidar_indice_fornecedores, normalizar_titular
+from services.titular_service import indice_titulares, catalogo_titulares
 
 fornecedor_bp = Blueprint("fornecedor", __name__)
 
@@ -99,16 +101,24 @@ def criar_fornecedor():
     
     try:
         cursor.execute("""
-            INSERT INTO fornecedor (titular, cpf_cnpj, chave_pix, banco_padrao)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO fornecedor (titular, cpf_cnpj, chave_pix, banco_padrao, titular_normalizado)
+            VALUES (%s, %s, %s, %s, %s)
         """, (
             data["titular"].strip(),
             cpf_cnpj,
             data.get("chave_pix", "").strip(),
-            data.get("banco_padrao") if data.get("banco_padrao") else None
+            data.get("banco_padrao") if data.get("banco_padrao") else None,
+            normalizar_titular(data["titular"])
         ))
         conn.commit()
         fornecedor_id = cursor.lastrowid
+        invalidar_indice_fornecedores()
+        indice_titulares.adicionar({
+            "id": fornecedor_id,
+            "titular": data["titular"].strip(),
+            "cpf_cnpj": cpf_cnpj
+        })
+        catalogo_titulares.adicionar(data["titular"])
         
         cursor.close()
         conn.close()
@@ -152,6 +162,11 @@ def atualizar_fornecedor(fornecedor_id):
             set_clauses.append(f"{campo} = %s")
             valores.append(data[campo])
 
+    # Mantém a coluna normalizada usada pelo índice de fornecedores
+    if "titular" in data:
+        set_clauses.append("titular_normalizado = %s")
+        valores.append(normalizar_titular(data["titular"]))
+
     if not set_clauses:
         return jsonify({"error": "Nenhum campo para atualizar"}), 400
 
@@ -164,8 +179,12 @@ def atualizar_fornecedor(fornecedor_id):
     try:
         cursor.execute(query, tuple(valores))
         conn.commit()
+        invalidar_indice_fornecedores()
         cursor.close()
         conn.close()
+        indice_titulares.atualizar(fornecedor_id)
+        if "titular" in data:
+            catalogo_titulares.adicionar(data["titular"])
         return jsonify({"message": "Fornecedor atualizado com sucesso"}), 200
     except Exception as e:
         conn.rollback()
@@ -194,6 +213,9 @@ def deletar_fornecedor(fornecedor_id):
     try:
         cursor.execute("DELETE FROM fornecedor WHERE id = %s", (fornecedor_id,))
         conn.commit()
+        invalidar_indice_fornecedores()
+        indice_titulares.remover(fornecedor_id)
+        catalogo_titulares.invalidar()
         cursor.close()
         conn.close()
         return jsonify({"message": "Fornecedor deletado com sucesso"}), 200
@@ -1,37 +1,12 @@
 from flask import Blueprint, jsonify, request
 from flask_cors import cross_origin
 from db import get_connection
-from services.user_service import get_user_by_token, update_user_service
+from services.user_service import update_user_service, revoke_user_sessions
+from services.auth_service import requires_role, invalidar_usuarios
+from services.obra_service import invalidar_catalogo_obras
 
 usuarios_bp = Blueprint("usuarios", __name__)
 
-# ======================================================
-# HELPERS
-# ======================================================
-def extract_token():
-    auth = request.headers.get("Authorization")
-    if not auth:
-        return None
-    if auth.startswith("Bearer "):
-        return auth.split(" ")[1]
-    return auth
-
-def require_admin():
-    token = extract_token()
-    if not token:
-        return None, jsonify({"error": "Token faltando"}), 401
-
-    user = get_user_by_token(token)
-    if not user:
-        return None, jsonify({"error": "Token inválido"}), 401
-
-    if user["role"] != "admin":
-        return None, jsonify({"error": "Apenas administradores podem acessar"}), 403
-
-    return user, None, None
-
-
-# ======================================================
 # ======================================================
 # LISTAR USUÁRIOS SIMPLIFICADO (GET) - Apenas id e nome
 # ======================================================
@@ -55,15 +30,11 @@ def listar_usuarios_simples():
 # ======================================================
 @usuarios_bp.route("/usuarios", methods=["GET", "OPTIONS"])
 @cross_origin()
+@requires_role("admin")
 def listar_usuarios():
     if request.method == "OPTIONS":
         return jsonify({"status": "OK"}), 200
 
-    # Verifica se é admin
-    _, err, code = require_admin()
-    if err:
-        return err, code
-
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
 
@@ -126,14 +97,11 @@ def listar_usuarios():
 # ======================================================
 @usuarios_bp.route("/usuarios/<int:user_id>", methods=["PUT", "OPTIONS"])
 @cross_origin()
+@requires_role("admin")
 def atualizar_usuario(user_id):
     if request.method == "OPTIONS":
         return jsonify({"status": "OK"}), 200
 
-    _, err, code = require_admin()
-    if err:
-        return err, code
-
     data = request.get_json()
     usuario = data.get("usuario")
     nome = data.get("nome", "")
@@ -147,6 +115,9 @@ def atualizar_usuario(user_id):
     if not success:
         return jsonify({"error": msg}), 500
 
+    # Usuários em cache por token podem estar com role/nome antigos
+    invalidar_usuarios()
+
     return jsonify({"message": "Usuário atualizado com sucesso"}), 200
 
 
@@ -155,14 +126,11 @@ def atualizar_usuario(user_id):
 # ======================================================
 @usuarios_bp.route("/usuarios/<int:user_id>", methods=["DELETE", "OPTIONS"])
 @cross_origin()
+@requires_role("admin")
 def deletar_usuario(user_id):
     if request.method == "OPTIONS":
         return jsonify({"status": "OK"}), 200
         
-    _, err, code = require_admin()
-    if err:
-        return err, code
-
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -179,6 +147,10 @@ def deletar_usuario(user_id):
         cursor.close()
         conn.close()
 
+    # Encerra as sessões abertas do usuário removido
+    revoke_user_sessions(user_id)
+    invalidar_usuarios()
+
     return jsonify({"message": "Usuário removido"}), 200
 
 
@@ -226,6 +198,7 @@ def adicionar_obra_usuario(user_id):
         (user_id, obra_id)
     )
     conn.commit()
+    invalidar_catalogo_obras()
 
     cursor.close()
     conn.close()
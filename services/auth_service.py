@@ -0,0 +1,119 @@
+"""
+Autenticação por requisição.
+
+init_auth(app) registra um before_request que resolve o usuário do header
+Authorization uma única vez e o guarda em flask.g:
+
+    g.token      — token recebido (ou None)
+    g.user       — {id, username, role, nome} ou None (sem token / token inválido)
+    g.auth_falha — True se não foi possível validar o token (ex.: banco fora)
+
+O middleware não bloqueia nada sozinho: as rotas que exigem login usam
+@requires_auth ou @requires_role(...), que respondem 503 (e não 401) quando a
+validação falhou — o frontend não desloga ninguém por uma queda do banco.
+Usuários resolvidos ficam num cache curto por token, para tokens opacos não
+custarem uma consulta por requisição.
+"""
+
+import sys
+from functools import wraps
+from flask import g, jsonify, request
+from services.cache_service import TTLCache
+from services.user_service import get_user_by_token
+
+USER_CACHE_TTL = 30  # segundos
+
+_usuarios_cache = TTLCache(ttl=USER_CACHE_TTL, max_items=5000)  # token -> user (ou None)
+
+
+def extrair_token():
+    """Token do header Authorization ('Bearer <token>' ou o token puro)."""
+    auth = request.headers.get("Authorization")
+    if not auth:
+        return None
+    if auth.startswith("Bearer "):
+        return auth.split(" ")[1]
+    return auth
+
+
+def resolver_usuario(token):
+    """Usuário do token, consultando o cache antes de get_user_by_token."""
+    if not token:
+        return None
+    user = _usuarios_cache.get_or_load(token, lambda: get_user_by_token(token))
+    # Cópia: handlers podem alterar o dict sem afetar o cache
+    return dict(user) if user else None
+
+
+def invalidar_usuarios(token=None):
+    """
+    Descarta usuários em cache (um token, ou todos após alterar/remover usuários).
+    Vale só para este processo: nos outros workers a mudança aparece em até
+    USER_CACHE_TTL segundos.
+    """
+    if token is None:
+        _usuarios_cache.invalidate()
+    else:
+        _usuarios_cache.invalidate(token)
+
+
+def _carregar_usuario():
+    if request.method == "OPTIONS":
+        return
+    g.token = extrair_token()
+    g.auth_falha = False
+    try:
+        g.user = resolver_usuario(g.token)
+    except Exception as e:
+        # Falha ao validar (ex.: banco fora) não derruba rotas que não exigem login
+        print(f"⚠️ Erro ao resolver usuário do token: {e}", file=sys.stderr, flush=True)
+        g.user = None
+        g.auth_falha = True
+
+
+def init_auth(app):
+    """Registra o middleware de autenticação no app."""
+    app.before_request(_carregar_usuario)
+
+
+def usuario_atual():
+    return g.get("user")
+
+
+# ===========================
+# DECORATORS
+# ===========================
+def _negar_sem_usuario():
+    if g.get("auth_falha"):
+        return jsonify({"error": "Não foi possível validar o login agora, tente novamente"}), 503
+    if not g.get("token"):
+        return jsonify({"error": "Token faltando"}), 401
+    return jsonify({"error": "Token inválido"}), 401
+
+
+def requires_auth(view):
+    """Exige um usuário autenticado (preflight OPTIONS passa direto)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != "OPTIONS" and usuario_atual() is None:
+            return _negar_sem_usuario()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def requires_role(*roles):
+    """Exige um usuário autenticado com um dos perfis informados: @requires_role('admin', 'financeiro')."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "OPTIONS":
+                user = usuario_atual()
+                if user is None:
+                    return _negar_sem_usuario()
+                if user.get("role") not in roles:
+                    if roles == ("admin",):
+                        return jsonify({"error": "Apenas administradores podem acessar"}), 403
+                    return jsonify({"error": "Acesso não permitido para este perfil"}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
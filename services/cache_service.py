@@ -0,0 +1,73 @@
+"""
+Cache em memória (por processo) com expiração e invalidação explícita.
+
+Cada processo/worker tem a sua cópia; o TTL funciona como rede de segurança
+para alterações feitas por outro worker, e invalidate() é chamado nas rotas
+de escrita do próprio processo.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_TODOS = object()
+
+
+class TTLCache:
+    """Dicionário thread-safe com TTL por item e descarte LRU acima de max_items."""
+
+    def __init__(self, ttl=60, max_items=1024):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.version = 0
+        self._data = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return valor
+
+    def set(self, key, value, ttl=None, version=None):
+        """
+        Grava o valor. Se `version` for informado e o cache tiver sido
+        invalidado desde então, o valor (possivelmente obsoleto) é ignorado.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while self.max_items and len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Retorna o valor em cache ou chama loader() e guarda o resultado."""
+        valor = self.get(key, _TODOS)
+        if valor is not _TODOS:
+            return valor
+        version = self.version
+        valor = loader()
+        self.set(key, valor, ttl=ttl, version=version)
+        return valor
+
+    def invalidate(self, key=_TODOS):
+        """Remove uma chave (ou tudo, se nenhuma for informada)."""
+        with self._lock:
+            self.version += 1
+            if key is _TODOS:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -59,6 +59,35 @@ def buscar_categoria_por_id(categoria_id):
     return categoria
 
 
+# ===========================
+# BUSCAR NOMES DE VÁRIAS CATEGORIAS (1 consulta)
+# ===========================
+def buscar_nomes_categorias(categoria_ids, stats=None):
+    """
+    Retorna {id: nome} para os ids informados, em uma única consulta.
+    stats["consultas"] só é incrementado se a consulta for de fato executada.
+    """
+    ids = set()
+    for categoria_id in categoria_ids:
+        try:
+            ids.add(int(categoria_id))
+        except (TypeError, ValueError):
+            continue
+    if not ids:
+        return {}
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    placeholders = ",".join(["%s"] * len(ids))
+    cursor.execute(f"SELECT id, nome FROM categoria WHERE id IN ({placeholders})", tuple(ids))
+    if stats is not None:
+        stats["consultas"] = stats.get("consultas", 0) + 1
+    nomes = {row["id"]: row["nome"] for row in cursor.fetchall()}
+    cursor.close()
+    conn.close()
+    return nomes
+
+
 # ===========================
 # CRIAR CATEGORIA
 # ===========================
@@ -0,0 +1,130 @@
+"""
+Cache em disco de arquivos de exportação, endereçado pelo conteúdo.
+
+A chave depende só do conteúdo: a mesma seleção, sem alterações nos
+lançamentos (nem em nomes de obra ou categoria), gera a mesma chave e o
+arquivo é servido direto do disco. Qualquer alteração muda a chave, então
+não há invalidação explícita.
+  - registros enviados pelo frontend: SHA-256 das linhas já mapeadas
+    (chave_conteudo), calculado em memória;
+  - seleções do banco: SHA-256 da assinatura agregada da seleção
+    (chave_selecao, ver export_service.assinatura_selecao) — um acerto custa
+    uma consulta de uma linha, sem ler os registros.
+
+O diretório é compartilhado entre processos; o descarte é LRU pela data de
+modificação (atualizada a cada acerto) quando o total passa de max_bytes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from config import EXPORT_CONFIG
+
+# Incrementar quando o layout dos arquivos mudar (colunas, formatos de célula...)
+LAYOUT_VERSAO = 1
+
+
+def chave_conteudo(formato, linhas):
+    """
+    SHA-256 de (formato, linhas). `linhas` é um iterável de listas de valores.
+    Retorna (chave, quantidade_de_linhas).
+    """
+    h = hashlib.sha256(f"{LAYOUT_VERSAO}:{formato}\n".encode("utf-8"))
+    quantidade = 0
+    for linha in linhas:
+        h.update(json.dumps(linha, ensure_ascii=False, default=str).encode("utf-8"))
+        h.update(b"\n")
+        quantidade += 1
+    return h.hexdigest(), quantidade
+
+
+def chave_selecao(formato, linhas, assinatura):
+    """SHA-256 de (formato, assinatura da seleção no banco). Retorna (chave, linhas)."""
+    texto = f"{LAYOUT_VERSAO}:{formato}:selecao:{linhas}:{assinatura}"
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest(), linhas
+
+
+class CacheArquivos:
+    """Arquivos <chave>.<extensao> num diretório, com limite de tamanho total."""
+
+    def __init__(self, diretorio, max_bytes):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _caminho(self, chave, extensao):
+        return os.path.join(self.diretorio, f"{chave}.{extensao}")
+
+    def get(self, chave, extensao):
+        """
+        Arquivo em cache já aberto (binário, marcado como usado agora) ou None.
+        Abre aqui para que um descarte em outro processo entre a consulta e a
+        leitura não derrube a resposta: o arquivo aberto continua legível.
+        """
+        caminho = self._caminho(chave, extensao)
+        try:
+            arquivo = open(caminho, "rb")
+        except OSError:
+            return None
+        try:
+            os.utime(caminho, None)
+        except OSError:
+            pass
+        return arquivo
+
+    def put(self, chave, extensao, arquivo):
+        """Copia o conteúdo de `arquivo` (aberto, binário) para o cache. Best-effort."""
+        posicao = arquivo.tell()
+        temporario = None
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+            with os.fdopen(fd, "wb") as destino:
+                arquivo.seek(0)
+                shutil.copyfileobj(arquivo, destino)
+            # os.replace é atômico: leitores nunca veem arquivo pela metade
+            os.replace(temporario, self._caminho(chave, extensao))
+            temporario = None
+        except OSError as e:
+            print(f"⚠️ Erro ao gravar exportação no cache: {e}", file=sys.stderr, flush=True)
+        finally:
+            arquivo.seek(posicao)
+            # .tmp que sobrou de uma gravação falha não entra na conta do descarte
+            if temporario is not None:
+                try:
+                    os.remove(temporario)
+                except OSError:
+                    pass
+        self._descartar_excesso()
+
+    def _descartar_excesso(self):
+        with self._lock:
+            try:
+                entradas = []
+                for nome in os.listdir(self.diretorio):
+                    if nome.endswith(".tmp"):
+                        continue
+                    caminho = os.path.join(self.diretorio, nome)
+                    st = os.stat(caminho)
+                    entradas.append((st.st_mtime, st.st_size, caminho))
+            except OSError:
+                return
+            total = sum(tamanho for _, tamanho, _ in entradas)
+            for _, tamanho, caminho in sorted(entradas):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(caminho)
+                    total -= tamanho
+                except OSError:
+                    pass
+
+
+export_cache = CacheArquivos(
+    EXPORT_CONFIG["cache_dir"] or os.path.join(tempfile.gettempdir(), "gerenciaobra_export_cache"),
+    EXPORT_CONFIG["cache_max_bytes"],
+)
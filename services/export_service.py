@@ -0,0 +1,565 @@
+"""
+Exportação de lançamentos para planilha (Planilha de Importação).
+
+Os registros podem vir:
+  - do frontend (lista `registros` já no formato do adapter, camelCase);
+  - direto do MySQL, pelos mesmos filtros de GET /formulario;
+  - de uma exportação anterior (historico_exportacoes).
+
+Todos passam pelo mesmo mapeamento de colunas (linha_exportacao).
+"""
+
+import csv
+import io
+import os
+import tempfile
+import xlsxwriter
+from datetime import datetime, timedelta
+from config import EXPORT_CONFIG
+from db import get_connection
+from services.formulario_service import montar_filtros, order_clause, contar_formularios
+from services.historico_service import buscar_itens_exportacao, registrar_exportacao
+from services.job_service import JobManager
+
+# Lote lido do cursor por vez na exportação direto do banco
+EXPORT_BATCH_SIZE = 1000
+
+HEADERS = [
+    'ID',
+    'Data Pagamento',
+    'Valor',
+    'Forma de Pagamento',
+    'Quem Paga',
+    'Centro de Custo',
+    'Titular',
+    'CPF/CNPJ',
+    'Chave Pix',
+    'Obra',
+    'Categoria',
+    'Status Lançamento',
+    'Observação'
+]
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIMETYPE = "text/csv; charset=utf-8"
+COLUNAR_FORMATOS = {
+    # formato -> (extensão, mimetype)
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+class LimiteExportacaoError(Exception):
+    """A exportação passou do limite de linhas configurado (EXPORT_CONFIG['max_rows'])."""
+
+
+class FormatoIndisponivelError(Exception):
+    """Formato de exportação que depende de um pacote não instalado (ex.: pyarrow)."""
+
+
+class HistoricoIndisponivelError(Exception):
+    """Falha ao ler os itens de uma exportação do histórico (erro de banco)."""
+
+
+# Largura de cada coluna, na ordem de HEADERS
+LARGURAS = [10, 15, 12, 18, 12, 15, 20, 15, 15, 15, 18, 18, 25]
+
+
+def normalize_forma_pagamento(forma_pagamento):
+    """
+    Normaliza a forma de pagamento para Título Case.
+    PIX -> Pix, BOLETO -> Boleto, CHEQUE -> Cheque
+    """
+    if not forma_pagamento:
+        return ''
+
+    # Converter para maiúsculas e remover espaços
+    forma_upper = str(forma_pagamento).strip().upper()
+
+    if forma_upper == 'PIX':
+        return 'Pix'
+    elif forma_upper == 'BOLETO':
+        return 'Boleto'
+    elif forma_upper == 'CHEQUE':
+        return 'Cheque'
+    else:
+        # Se não reconhecer, retornar com primeira letra maiúscula
+        return str(forma_pagamento).strip().capitalize() if forma_pagamento else ''
+
+
+def normalize_text_field(text):
+    """
+    Normaliza um texto para Título Case (primeira letra maiúscula).
+    """
+    if not text:
+        return ''
+
+    text = str(text).strip()
+    return text[0].upper() + text[1:].lower() if len(text) > 0 else ''
+
+
+def linha_exportacao(registro, categorias_nomes=None):
+    """
+    Converte um registro (formato do frontend) nos valores das colunas de HEADERS.
+    Data Pagamento vai como texto DD/MM/YYYY e Valor como número (reais).
+    """
+    # ID vem como número do frontend
+    id_final = int(registro.get('id', 0)) if registro.get('id') else 0
+
+    # Data vem como string ISO (YYYY-MM-DD) do frontend
+    data_pagamento_raw = registro.get('dataPagamento', '')
+    data_pagamento_final = None
+    if data_pagamento_raw:
+        try:
+            data_obj = datetime.strptime(data_pagamento_raw, '%Y-%m-%d')
+            data_pagamento_final = data_obj + timedelta(days=1)
+        except Exception:
+            data_pagamento_final = None
+
+    # Valor vem em CENTAVOS do frontend (já convertido pelo adapter)
+    valor_raw = registro.get('valor', 0)
+    try:
+        if not valor_raw:
+            valor_final = 0.0
+        else:
+            valor_num = float(valor_raw)
+            # ✅ CORREÇÃO: Valor vem em CENTAVOS, dividir por 100 para reais
+            valor_final = valor_num / 100
+    except Exception:
+        valor_final = 0.0
+
+    forma_pagamento_normalizada = normalize_forma_pagamento(registro.get('formaDePagamento', ''))
+    quem_paga_normalizado = 'Empresa'
+    obra_raw = registro.get('obra', '')
+    obra_normalizada = normalize_text_field(str(obra_raw)) if obra_raw else ''
+
+    # Categoria: nome já resolvido (exportação do banco) ou pelo mapa id → nome
+    categoria_nome = registro.get('categoriaNome') or ''
+    categoria_raw = registro.get('categoria')
+    if not categoria_nome and categoria_raw and categorias_nomes:
+        try:
+            categoria_nome = categorias_nomes.get(int(categoria_raw), '')
+        except (TypeError, ValueError):
+            categoria_nome = ''
+
+    # Status lançamento
+    status = "Lançado" if registro.get('lancado') == 'Y' else "Pendente"
+
+    return [
+        id_final,
+        data_pagamento_final.strftime('%d/%m/%Y') if data_pagamento_final else '',
+        valor_final,
+        str(forma_pagamento_normalizada or ''),                # Forma de Pagamento
+        str(quem_paga_normalizado or ''),                      # Quem Paga
+        str(obra_normalizada or ''),                           # Centro de Custo
+        str(registro.get('titular', '') or ''),                # Titular
+        str(registro.get('cpfCnpjTitularConta', '') or ''),    # CPF/CNPJ
+        str(registro.get('chavePix', '') or ''),               # Chave Pix
+        str(registro.get('obra', '') or ''),                   # Obra
+        str(categoria_nome or ''),                             # Categoria
+        str(status or ''),                                     # Status Lançamento
+        str(registro.get('observacao', '') or ''),             # Observação
+    ]
+
+
+# ===========================
+# REGISTROS DIRETO DO BANCO
+# ===========================
+EXPORT_SELECT = """
+    SELECT f.id, f.data_pagamento, f.valor, f.forma_pagamento, f.titular,
+           f.cpf_cnpj, f.chave_pix, f.categoria, f.lancado, f.observacao,
+           o.nome AS obra_nome, c.nome AS categoria_nome
+    FROM formulario f
+    LEFT JOIN obras o ON o.id = f.obra
+    LEFT JOIN categoria c ON c.id = f.categoria
+"""
+
+
+def _registro_do_banco(row):
+    """Linha do MySQL → formato de registro do frontend (o mesmo que o POST envia)."""
+    data_pagamento = row.get('data_pagamento')
+    if hasattr(data_pagamento, 'strftime'):
+        data_pagamento = data_pagamento.strftime('%Y-%m-%d')
+    return {
+        'id': row.get('id'),
+        'dataPagamento': str(data_pagamento) if data_pagamento else '',
+        'valor': row.get('valor'),
+        'formaDePagamento': row.get('forma_pagamento'),
+        'obra': row.get('obra_nome') or '',
+        'titular': row.get('titular'),
+        'cpfCnpjTitularConta': row.get('cpf_cnpj'),
+        'chavePix': row.get('chave_pix'),
+        'categoria': row.get('categoria'),
+        'categoriaNome': row.get('categoria_nome') or '',
+        'lancado': row.get('lancado'),
+        'observacao': row.get('observacao'),
+    }
+
+
+def registros_por_filtro(filtros, stats=None):
+    """
+    Gera registros direto do MySQL com os filtros de GET /formulario
+    (status, obra, data_inicio, busca, ids, ordenacao...), lendo em lotes.
+    """
+    where_parts, params, _ = montar_filtros(filtros)
+    ordenacao = filtros.get("ordenacao", "id_desc") or "id_desc"
+    sql = f"{EXPORT_SELECT} WHERE {' AND '.join(where_parts)} ORDER BY {order_clause(ordenacao)}"
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(sql, tuple(params))
+        if stats is not None:
+            stats["consultas"] = stats.get("consultas", 0) + 1
+        while True:
+            lote = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not lote:
+                break
+            for row in lote:
+                yield _registro_do_banco(row)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# Colunas de EXPORT_SELECT que entram no arquivo. NULL vira '' na assinatura,
+# como no arquivo (linha_exportacao), e não desloca as colunas seguintes.
+ASSINATURA_COLUNAS = [
+    "f.id", "f.data_pagamento", "f.valor", "f.forma_pagamento", "f.titular",
+    "f.cpf_cnpj", "f.chave_pix", "f.categoria", "f.lancado", "f.observacao",
+    "o.nome", "c.nome",
+]
+
+
+def assinatura_selecao(filtros, stats=None):
+    """
+    Resume a seleção numa consulta agregada de uma linha, sem trazer os
+    registros para o Python: (linhas, assinatura), com a assinatura = ordenação
+    + XOR dos primeiros 64 bits do MD5 de cada linha. Qualquer alteração num
+    lançamento selecionado (ou no nome da obra/categoria) muda a assinatura.
+    """
+    where_parts, params, _ = montar_filtros(filtros)
+    ordenacao = filtros.get("ordenacao", "id_desc") or "id_desc"
+    linha = ", ".join(f"COALESCE({coluna}, '')" for coluna in ASSINATURA_COLUNAS)
+    sql = f"""
+        SELECT COUNT(*) AS linhas,
+               BIT_XOR(CAST(CONV(LEFT(MD5(CONCAT_WS('|', {linha})), 16), 16, 10) AS UNSIGNED)) AS assinatura
+        FROM formulario f
+        LEFT JOIN obras o ON o.id = f.obra
+        LEFT JOIN categoria c ON c.id = f.categoria
+        WHERE {' AND '.join(where_parts)}
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(sql, tuple(params))
+        if stats is not None:
+            stats["consultas"] = stats.get("consultas", 0) + 1
+        row = cursor.fetchone() or {}
+        return int(row.get("linhas") or 0), f"{ordenacao}:{row.get('assinatura') or 0}"
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class SelecaoBanco:
+    """
+    Registros selecionados por filtros, lidos do MySQL só quando iterados
+    (registros_por_filtro). assinatura() serve para a chave do cache em disco
+    sem ler a seleção inteira.
+    """
+
+    def __init__(self, filtros, stats=None):
+        self.filtros = filtros
+        self.stats = stats
+
+    def __iter__(self):
+        return registros_por_filtro(self.filtros, self.stats)
+
+    def assinatura(self):
+        return assinatura_selecao(self.filtros, self.stats)
+
+
+def contar_registros(filtros):
+    """Total de linhas que registros_por_filtro vai gerar (contagem em cache de GET /formulario)."""
+    where_parts, params, chave = montar_filtros(filtros)
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        total, _ = contar_formularios(cursor, " AND ".join(where_parts), params, chave)
+        return total
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def ids_da_exportacao(exportacao_id):
+    """
+    IDs de uma exportação registrada em historico_exportacoes ([] se não existe).
+    Lança HistoricoIndisponivelError se a leitura falhar.
+    """
+    ids, error = buscar_itens_exportacao(exportacao_id)
+    if error:
+        raise HistoricoIndisponivelError(error)
+    return ids
+
+
+# ===========================
+# PLANILHA XLSX
+# ===========================
+def escrever_xlsx(workbook, registros, categorias_nomes=None, max_linhas=None):
+    """
+    Escreve a 'Planilha de Importação' no workbook (XlsxWriter), linha a linha
+    e em ordem (requisito do modo constant_memory).
+    Retorna a lista de IDs exportados; lança LimiteExportacaoError acima de max_linhas.
+    """
+    worksheet = workbook.add_worksheet("Planilha de Importação")
+
+    # Formatos SEM problemas de caracteres especiais
+    header_format = workbook.add_format({
+        'bold': True,
+        'bg_color': '#4472C4',
+        'font_color': 'white',
+        'border': 1,
+        'align': 'center',
+        'valign': 'vcenter'
+    })
+
+    text_format = workbook.add_format({
+        'border': 1,
+        'align': 'left'
+    })
+
+    # Ajustar largura das colunas
+    for col_num, largura in enumerate(LARGURAS):
+        worksheet.set_column(col_num, col_num, largura)
+
+    # Adicionar cabeçalhos
+    for col_num, header in enumerate(HEADERS):
+        worksheet.write(0, col_num, header, header_format)
+
+    # Adicionar dados
+    ids = []
+    row_num = 1
+    for registro in registros:
+        if max_linhas and row_num > max_linhas:
+            raise LimiteExportacaoError(
+                f"Exportação excede o limite de {max_linhas} linhas; refine os filtros"
+            )
+        linha = linha_exportacao(registro, categorias_nomes)
+
+        # ✅ CORREÇÃO: Escrever dados SEM aspas no começo
+        worksheet.write_number(row_num, 0, linha[0])       # ID como número puro
+        worksheet.write(row_num, 1, linha[1], text_format)  # Data DD/MM/YYYY
+        worksheet.write_number(row_num, 2, linha[2])       # Valor como número
+        for col_num in range(3, len(linha)):
+            worksheet.write(row_num, col_num, linha[col_num])
+
+        ids.append(linha[0])
+        row_num += 1
+
+    return ids
+
+
+def gerar_xlsx(registros, categorias_nomes=None, arquivo=None):
+    """
+    Gera a planilha em modo constant_memory: o XlsxWriter descarrega cada linha
+    em disco à medida que é escrita, e o .xlsx final vai para `arquivo` ou, se
+    não informado, para um temporário (em RAM até spool_max_memory, depois em disco).
+
+    Returns:
+        (arquivo, ids) — arquivo posicionado no início; quem chama deve fechá-lo.
+    """
+    if arquivo is None:
+        arquivo = tempfile.SpooledTemporaryFile(
+            max_size=EXPORT_CONFIG["spool_max_memory"],
+            dir=EXPORT_CONFIG["tmpdir"],
+        )
+    opcoes = {"constant_memory": True}
+    if EXPORT_CONFIG["tmpdir"]:
+        opcoes["tmpdir"] = EXPORT_CONFIG["tmpdir"]
+    workbook = xlsxwriter.Workbook(arquivo, opcoes)
+    try:
+        ids = escrever_xlsx(workbook, registros, categorias_nomes, EXPORT_CONFIG["max_rows"])
+        workbook.close()
+    except Exception:
+        try:
+            workbook.close()
+        except Exception:
+            pass
+        arquivo.close()
+        raise
+    arquivo.seek(0)
+    return arquivo, ids
+
+
+def tamanho_arquivo(arquivo):
+    """Tamanho em bytes de um arquivo aberto (mantém a posição atual)."""
+    posicao = arquivo.tell()
+    arquivo.seek(0, 2)
+    tamanho = arquivo.tell()
+    arquivo.seek(posicao)
+    return tamanho
+
+
+def ler_em_blocos(arquivo, tamanho_bloco=None):
+    """Gera o conteúdo do arquivo em blocos e o fecha ao final (ou se o cliente desconectar)."""
+    tamanho_bloco = tamanho_bloco or EXPORT_CONFIG["chunk_size"]
+    try:
+        while True:
+            bloco = arquivo.read(tamanho_bloco)
+            if not bloco:
+                break
+            yield bloco
+    finally:
+        arquivo.close()
+
+
+# ===========================
+# CSV (streaming)
+# ===========================
+def gerar_csv(registros, categorias_nomes=None, separador=";", bom=False):
+    """
+    Gera o CSV em blocos de bytes (UTF-8), com as mesmas colunas da planilha.
+    Valor sai com vírgula decimal quando o separador é ';' (padrão do Excel pt-BR).
+    """
+    decimal = "," if separador == ";" else "."
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=separador, lineterminator="\r\n")
+    writer.writerow(HEADERS)
+    tamanho_bloco = EXPORT_CONFIG["chunk_size"]
+
+    primeiro = ("\ufeff" if bom else "") + buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    yield primeiro.encode("utf-8")
+
+    for registro in registros:
+        linha = linha_exportacao(registro, categorias_nomes)
+        linha[2] = f"{linha[2]:.2f}".replace(".", decimal)
+        writer.writerow(linha)
+        if buffer.tell() >= tamanho_bloco:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# ===========================
+# PARQUET / ARROW (colunar)
+# ===========================
+def _pyarrow():
+    """Importa pyarrow só quando um formato colunar é pedido (sem ele, só Parquet/Arrow ficam indisponíveis)."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise FormatoIndisponivelError("Exportação Parquet/Arrow requer o pacote pyarrow")
+    return pyarrow
+
+
+def gerar_colunar(registros, categorias_nomes=None, formato="parquet"):
+    """
+    Gera Parquet ou Arrow IPC em lotes de EXPORT_BATCH_SIZE linhas, num
+    arquivo temporário como gerar_xlsx.
+
+    Returns:
+        (arquivo, linhas) — arquivo posicionado no início; quem chama deve fechá-lo.
+    """
+    pa = _pyarrow()
+    schema = pa.schema(
+        [pa.field(HEADERS[0], pa.int64()), pa.field(HEADERS[1], pa.string()), pa.field(HEADERS[2], pa.float64())]
+        + [pa.field(nome, pa.string()) for nome in HEADERS[3:]]
+    )
+    max_linhas = EXPORT_CONFIG["max_rows"]
+
+    arquivo = tempfile.SpooledTemporaryFile(
+        max_size=EXPORT_CONFIG["spool_max_memory"],
+        dir=EXPORT_CONFIG["tmpdir"],
+    )
+    saida = pa.PythonFile(arquivo, mode="w")
+    if formato == "parquet":
+        writer = pa.parquet.ParquetWriter(saida, schema)
+    else:
+        writer = pa.ipc.new_file(saida, schema)
+
+    linhas = 0
+    colunas = [[] for _ in HEADERS]
+
+    def _descarregar():
+        writer.write_table(pa.Table.from_arrays([pa.array(c, type=f.type) for c, f in zip(colunas, schema)], schema=schema))
+        for coluna in colunas:
+            coluna.clear()
+
+    try:
+        for registro in registros:
+            if max_linhas and linhas >= max_linhas:
+                raise LimiteExportacaoError(
+                    f"Exportação excede o limite de {max_linhas} linhas; refine os filtros"
+                )
+            for coluna, valor in zip(colunas, linha_exportacao(registro, categorias_nomes)):
+                coluna.append(valor)
+            linhas += 1
+            if linhas % EXPORT_BATCH_SIZE == 0:
+                _descarregar()
+        if colunas[0]:
+            _descarregar()
+        writer.close()
+    except Exception:
+        arquivo.close()
+        raise
+    arquivo.seek(0)
+    return arquivo, linhas
+
+
+# ===========================
+# EXPORTAÇÃO ASSÍNCRONA (jobs)
+# ===========================
+export_jobs = JobManager(
+    max_workers=EXPORT_CONFIG["job_workers"],
+    retencao=EXPORT_CONFIG["job_retention"],
+    nome="export",
+)
+
+
+def _contando(job, registros):
+    """Repassa os registros atualizando o progresso do job a cada lote."""
+    processados = 0
+    for registro in registros:
+        yield registro
+        processados += 1
+        if processados % EXPORT_BATCH_SIZE == 0:
+            job.atualizar(processados=processados)
+    job.atualizar(processados=processados)
+
+
+def executar_exportacao_job(job, preparar, nome_arquivo, usuario=None):
+    """
+    Corpo do job de exportação: preparar() devolve (registros, categorias_nomes, total);
+    gera o .xlsx num arquivo em disco e registra a exportação no histórico.
+    """
+    job.atualizar(mensagem="Lendo registros")
+    stats = {"consultas": 0}
+    registros, categorias_nomes, total = preparar(stats)
+    job.atualizar(total=total, mensagem="Gerando planilha")
+
+    fd, caminho = tempfile.mkstemp(suffix=".xlsx", prefix="export_", dir=EXPORT_CONFIG["tmpdir"])
+    job.anexar_arquivo(caminho, nome_arquivo, XLSX_MIMETYPE)
+    with os.fdopen(fd, "w+b") as arquivo:
+        _, ids = gerar_xlsx(_contando(job, registros), categorias_nomes, arquivo=arquivo)
+
+    resultado = {"linhas": len(ids), "consultas": stats["consultas"], "exportacao_id": None}
+    if ids:
+        exportacao_id, error = registrar_exportacao(usuario or "", ids)
+        if error:
+            job.atualizar(mensagem=f"Planilha gerada; histórico não registrado: {error}")
+        else:
+            resultado["exportacao_id"] = exportacao_id
+            job.atualizar(mensagem="Planilha gerada")
+    else:
+        job.atualizar(mensagem="Nenhum registro encontrado")
+    return resultado
@@ -0,0 +1,363 @@
+"""
+Consultas de listagem da tabela formulario (filtros e contagem).
+Usado por GET /formulario e por outros pontos que aceitam os mesmos filtros.
+"""
+
+import re
+import sys
+from services.cache_service import TTLCache
+from services.fornecedor_service import normalizar_titular
+
+# Contagens por conjunto de filtros (invalidado em POST/PUT/DELETE de /formulario)
+COUNT_CACHE_TTL = 60
+_count_cache = TTLCache(ttl=COUNT_CACHE_TTL, max_items=512)
+
+COUNT_MODOS = ("exact", "estimate", "none")
+
+
+# ===========================
+# MAPEAMENTO DE ORDENAÇÃO (frontend → SQL)
+# ===========================
+ORDER_MAP = {
+    "id_asc": "id ASC",
+    "id_desc": "id DESC",
+    "valor_asc": "valor ASC",
+    "valor_desc": "valor DESC",
+    "titular_asc": "titular ASC",
+    "titular_desc": "titular DESC",
+    "referente_asc": "referente ASC",
+    "referente_desc": "referente DESC",
+    "dataLancamento_asc": "data_lancamento ASC",
+    "dataLancamento_desc": "data_lancamento DESC",
+    "dataPagamento_asc": "data_pagamento ASC",
+    "dataPagamento_desc": "data_pagamento DESC",
+}
+
+
+def order_parts(ordenacao):
+    """Retorna (coluna, direção) da ordenação pedida (padrão: id DESC)."""
+    coluna, direcao = ORDER_MAP.get(ordenacao, "id DESC").split()
+    return coluna, direcao
+
+
+def order_clause(ordenacao):
+    """ORDER BY com desempate por id, para a ordem ser estável entre páginas."""
+    coluna, direcao = order_parts(ordenacao)
+    if coluna == "id":
+        return f"f.id {direcao}"
+    return f"f.{coluna} {direcao}, f.id {direcao}"
+
+
+# Busca textual: índice FULLTEXT ft_formulario_busca (migrations/add_fulltext_busca.sql)
+FULLTEXT_COLUNAS = "f.titular, f.referente, f.observacao, f.cpf_cnpj"
+FULLTEXT_MIN_TOKEN = 3  # innodb_ft_min_token_size padrão
+# Stopwords padrão do InnoDB (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD): não
+# estão no índice, então como termo obrigatório (+com*) zerariam o resultado
+FULLTEXT_STOPWORDS = frozenset("""
+    a about an are as at be by com de en for from how i in is it la of on or
+    that the this to was what when where who will with und www
+""".split())
+
+
+def _arg(args, nome, padrao=""):
+    valor = args.get(nome, padrao)
+    if valor is None:
+        return padrao
+    return str(valor)
+
+
+def montar_filtros(args, obras_permitidas=None):
+    """
+    Monta o WHERE dinâmico de formulario (alias f) a partir dos parâmetros.
+
+    obras_permitidas limita o resultado às obras do usuário: lançamentos da
+    obra principal (f.obra IN (...), índice idx_formulario_obra_id) ou com a
+    obra entre as adicionais de um múltiplo (formulario_obras, índice
+    idx_formulario_obras_obra); None = sem restrição.
+
+    Returns:
+        (where_parts, params, chave) — chave é a forma normalizada dos filtros,
+        usada como chave de cache.
+    """
+    status = _arg(args, "status")
+    forma_pagamento = _arg(args, "forma_pagamento")
+    data_exata = _arg(args, "data")
+    data_inicio = _arg(args, "data_inicio")
+    data_fim = _arg(args, "data_fim")
+    obra = _arg(args, "obra")
+    titular = _arg(args, "titular")
+    solicitante = _arg(args, "solicitante")
+    referente = _arg(args, "referente")
+    busca = _arg(args, "busca")
+    multiplos = _arg(args, "multiplos", "todos")
+    codigo_barra_status = _arg(args, "codigo_barra_status", "todos")
+    ids_filter = _arg(args, "ids")  # IDs separados por vírgula (histórico)
+
+    where_parts = ["1=1"]
+    params = []
+
+    # Filtro: Status (lancado)
+    if status:
+        status_map = {
+            "PENDENTE": ("f.lancado = %s", "N"),
+            "LANCADO": ("f.lancado IN ('Y', 'S', '1')", None),
+            "NAO_AUTORIZADO": ("f.lancado = %s", "X"),
+            "APROVADO": ("f.lancado = %s", "A"),
+            "PAGO": ("f.lancado = %s", "P"),
+        }
+        if status in status_map:
+            sql_part, param = status_map[status]
+            where_parts.append(sql_part)
+            if param is not None:
+                params.append(param)
+
+    # Filtro: Forma de pagamento
+    if forma_pagamento:
+        where_parts.append("UPPER(TRIM(f.forma_pagamento)) = UPPER(TRIM(%s))")
+        params.append(forma_pagamento)
+
+    # Filtro: Data exata
+    if data_exata:
+        where_parts.append("f.data_pagamento = %s")
+        params.append(data_exata)
+
+    # Filtro: Data intervalo
+    if data_inicio:
+        where_parts.append("f.data_pagamento >= %s")
+        params.append(data_inicio)
+    if data_fim:
+        where_parts.append("f.data_pagamento <= %s")
+        params.append(data_fim)
+
+    # Filtro: Obra
+    if obra:
+        where_parts.append("f.obra = %s")
+        params.append(int(obra))
+
+    # Filtro: Titular (match exato case-insensitive, pela coluna normalizada indexada)
+    if titular:
+        where_parts.append("f.titular_normalizado = %s")
+        params.append(normalizar_titular(titular))
+
+    # Filtro: Solicitante (busca parcial)
+    if solicitante:
+        where_parts.append("UPPER(f.solicitante) LIKE %s")
+        params.append(f"%{solicitante.upper()}%")
+
+    # Filtro: Referente/Descrição (busca parcial)
+    if referente:
+        where_parts.append("UPPER(f.referente) LIKE %s")
+        params.append(f"%{referente.upper()}%")
+
+    # Filtro: Busca mista (valor, titular, referente, observação, CPF/CNPJ)
+    # Padrão: LIKE (substring). busca_modo=indexada usa FULLTEXT (prefixo de palavra).
+    if busca:
+        if _arg(args, "busca_modo") == "indexada":
+            sql_part, busca_params = _busca_indexada(busca)
+        else:
+            sql_part, busca_params = _busca_like(busca)
+        where_parts.append(sql_part)
+        params.extend(busca_params)
+
+    # Filtro: Múltiplos lançamentos (novo: formulario_obras, legado: grupo_id)
+    if multiplos == "sim":
+        where_parts.append("""
+            (f.id IN (SELECT DISTINCT formulario_id FROM formulario_obras)
+             OR f.grupo_id IS NOT NULL)
+        """)
+    elif multiplos == "nao":
+        where_parts.append("""
+            (f.id NOT IN (SELECT DISTINCT formulario_id FROM formulario_obras)
+             AND f.grupo_id IS NULL)
+        """)
+
+    # Filtro: Código de barras (boleto)
+    if codigo_barra_status == "vazio":
+        where_parts.append("""
+            (LOWER(TRIM(f.forma_pagamento)) = 'boleto'
+             AND (f.chave_pix IS NULL OR TRIM(f.chave_pix) = ''))
+        """)
+    elif codigo_barra_status == "preenchido":
+        where_parts.append("""
+            (LOWER(TRIM(f.forma_pagamento)) = 'boleto'
+             AND f.chave_pix IS NOT NULL AND TRIM(f.chave_pix) != '')
+        """)
+
+    # Filtro: IDs específicos (histórico de exportação)
+    if ids_filter:
+        try:
+            id_list = sorted({int(x.strip()) for x in ids_filter.split(",") if x.strip()})
+            if id_list:
+                placeholders = ",".join(["%s"] * len(id_list))
+                where_parts.append(f"f.id IN ({placeholders})")
+                params.extend(id_list)
+        except ValueError:
+            pass
+
+    # Escopo do usuário: só lançamentos das obras vinculadas a ele
+    # (como obra principal ou como obra adicional de um lançamento múltiplo)
+    if obras_permitidas is not None:
+        if obras_permitidas:
+            placeholders = ",".join(["%s"] * len(obras_permitidas))
+            where_parts.append(f"""
+                (f.obra IN ({placeholders})
+                 OR f.id IN (SELECT formulario_id FROM formulario_obras WHERE obra_id IN ({placeholders})))
+            """)
+            params.extend(obras_permitidas)
+            params.extend(obras_permitidas)
+        else:
+            where_parts.append("1=0")
+
+    # Chave normalizada: o próprio SQL + parâmetros (filtros equivalentes → mesma chave)
+    chave = (" AND ".join(where_parts), tuple(params))
+
+    return where_parts, params, chave
+
+
+def tem_filtro(args):
+    """
+    True se os parâmetros restringem a seleção (geram algum predicado além de
+    1=1). Lança ValueError para filtros inválidos, como montar_filtros.
+    """
+    where_parts, _, _ = montar_filtros(args)
+    return len(where_parts) > 1
+
+
+# ===========================
+# BUSCA (?busca=)
+# ===========================
+def _valor_em_centavos(texto):
+    """'R$ 1.234,56' / '1234,56' / '1234' → centavos (int). None se não for número."""
+    limpo = texto.strip().replace("R$", "").replace(" ", "").replace(".", "").replace(",", ".")
+    if not limpo:
+        return None
+    try:
+        return int(round(float(limpo) * 100))
+    except ValueError:
+        return None
+
+
+def interpretar_valor_busca(busca):
+    """
+    Interpreta a busca como valor monetário.
+
+    Returns:
+        ("faixa", minimo, maximo) para '100..200' ou '100 a 200',
+        ("exato", centavos, explicito) para um valor ('R$ ...' → explicito=True),
+        ou None se não for numérico.
+    """
+    texto = busca.strip()
+    partes = re.split(r"\s*\.\.\s*|\s+a\s+", texto, maxsplit=1)
+    if len(partes) == 2:
+        minimo, maximo = _valor_em_centavos(partes[0]), _valor_em_centavos(partes[1])
+        if minimo is not None and maximo is not None:
+            return ("faixa", min(minimo, maximo), max(minimo, maximo))
+    centavos = _valor_em_centavos(texto)
+    if centavos is not None:
+        return ("exato", centavos, "R$" in texto.upper())
+    return None
+
+
+def termos_fulltext(busca):
+    """
+    Termos para MATCH ... IN BOOLEAN MODE: '+palavra*' (todas obrigatórias, por
+    prefixo). Stopwords são ignoradas; None quando a busca precisa do LIKE.
+    """
+    palavras = [p for p in re.findall(r"\w+", busca) if p.lower() not in FULLTEXT_STOPWORDS]
+    if not palavras or any(len(p) < FULLTEXT_MIN_TOKEN for p in palavras):
+        return None  # palavra curta não está no índice: usa LIKE
+    return " ".join(f"+{p}*" for p in palavras)
+
+
+def _busca_like(busca):
+    """Busca legada (LIKE %x%), sem uso de índice."""
+    busca_like = f"%{busca.strip()}%"
+    busca_centavos = _valor_em_centavos(busca)
+    if busca_centavos is not None:
+        return ("""
+            (f.titular LIKE %s OR f.referente LIKE %s
+             OR f.valor = %s OR CAST(f.valor AS CHAR) LIKE %s)
+        """, [busca_like, busca_like, busca_centavos, busca_like])
+    return "(f.titular LIKE %s OR f.referente LIKE %s)", [busca_like, busca_like]
+
+
+def _busca_indexada(busca):
+    """Valor (exato/faixa) pelo índice de valor; texto pelo índice FULLTEXT."""
+    valor = interpretar_valor_busca(busca)
+    termos = termos_fulltext(busca)
+    match_sql = f"MATCH({FULLTEXT_COLUNAS}) AGAINST (%s IN BOOLEAN MODE)"
+
+    if valor is not None and valor[0] == "faixa":
+        return "f.valor BETWEEN %s AND %s", [valor[1], valor[2]]
+
+    if valor is not None:
+        _, centavos, explicito = valor
+        if explicito:
+            return "f.valor = %s", [centavos]
+        if termos is None:
+            # Número curto (ex.: 50): fora do índice FULLTEXT, segue o LIKE (valor ou texto)
+            return _busca_like(busca)
+        # Número "solto" (ex.: 1500): pode ser valor ou parte de referente/documento
+        return f"(f.valor = %s OR {match_sql})", [centavos, termos]
+
+    if termos is None:
+        return _busca_like(busca)
+    return match_sql, [termos]
+
+
+def ordem_relevancia(args):
+    """(sql, params) do ORDER BY por relevância da busca textual, ou None."""
+    busca = _arg(args, "busca").strip()
+    if not busca or _arg(args, "busca_modo") != "indexada" or interpretar_valor_busca(busca):
+        return None
+    termos = termos_fulltext(busca)
+    if termos is None:
+        return None
+    return f"MATCH({FULLTEXT_COLUNAS}) AGAINST (%s IN BOOLEAN MODE) DESC, f.id DESC", [termos]
+
+
+# ===========================
+# CONTAGEM (exata em cache / estimada / nenhuma)
+# ===========================
+def contar_formularios(cursor, where_sql, params, chave, modo="exact"):
+    """
+    Retorna (total, estimado) para o WHERE informado.
+
+    modo:
+        exact    — COUNT(*) exato, guardado em cache por conjunto de filtros
+        estimate — estimativa do otimizador (EXPLAIN), sem varrer a tabela
+        none     — não conta (retorna None)
+    """
+    if modo == "none":
+        return None, False
+
+    if modo == "estimate":
+        total = _estimar_total(cursor, where_sql, params)
+        if total is not None:
+            return total, True
+        # Sem estimativa disponível: cai para a contagem exata
+
+    def _contar():
+        cursor.execute(f"SELECT COUNT(*) as total FROM formulario f WHERE {where_sql}", tuple(params))
+        return cursor.fetchone()["total"]
+
+    return _count_cache.get_or_load(chave, _contar), False
+
+
+def _estimar_total(cursor, where_sql, params):
+    """Estimativa de linhas (rows × filtered) do plano de execução para formulario."""
+    try:
+        cursor.execute(f"EXPLAIN SELECT f.id FROM formulario f WHERE {where_sql}", tuple(params))
+        for row in cursor.fetchall():
+            if row.get("table") == "f":
+                rows = float(row.get("rows") or 0)
+                filtered = float(row.get("filtered") or 100)
+                return int(round(rows * filtered / 100))
+    except Exception as e:
+        print(f"⚠️ Erro ao estimar total de formulários: {e}", file=sys.stderr, flush=True)
+    return None
+
+
+def invalidar_contagens():
+    """Descarta as contagens em cache (chamar após qualquer escrita em formulario)."""
+    _count_cache.invalidate()
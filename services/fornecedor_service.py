@@ -0,0 +1,87 @@
+"""
+Índice em memória dos nomes de fornecedores (titular normalizado).
+
+Consultado por GET /formulario e GET /formulario/<id> para marcar
+`fornecedor_novo` sem ler a tabela fornecedor a cada requisição.
+É invalidado nas rotas de escrita de /fornecedor e recarregado por TTL
+(alterações feitas por outro worker).
+"""
+
+import sys
+import threading
+import time
+from db import get_connection
+
+INDICE_TTL = 300  # segundos
+
+_lock = threading.Lock()
+_nomes = None
+_carregado_em = 0.0
+_versao = 0
+
+
+# Espaços removidos das pontas: os mesmos do [[:space:]] (Unicode White_Space)
+# usado no backfill SQL (migrations/fix_titular_normalizado_espacos.sql).
+# str.strip() sem argumento removeria também \x1c-\x1f, que o SQL mantém.
+ESPACOS_TITULAR = (
+    "\t\n\v\f\r \x85\xa0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+
+
+def normalizar_titular(titular):
+    """Forma usada para comparar titulares: sem espaços nas pontas e minúsculo."""
+    return (titular or "").strip(ESPACOS_TITULAR).lower()
+
+
+def _carregar_nomes():
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # Leitura só do índice idx_fornecedor_titular_normalizado
+        cursor.execute("""
+            SELECT DISTINCT titular_normalizado AS nome
+            FROM fornecedor
+            WHERE titular_normalizado IS NOT NULL AND titular_normalizado != ''
+        """)
+        return frozenset(row["nome"] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def nomes_fornecedores():
+    """Retorna o conjunto (frozenset) de titulares normalizados da tabela fornecedor."""
+    global _nomes, _carregado_em
+
+    nomes = _nomes
+    if nomes is not None and time.monotonic() - _carregado_em < INDICE_TTL:
+        return nomes
+
+    with _lock:
+        # Outra thread pode ter recarregado enquanto esperávamos o lock
+        if _nomes is not None and time.monotonic() - _carregado_em < INDICE_TTL:
+            return _nomes
+        versao = _versao
+        try:
+            novos = _carregar_nomes()
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar índice de fornecedores: {e}", file=sys.stderr, flush=True)
+            return _nomes if _nomes is not None else frozenset()
+        # Só publica se ninguém invalidou o índice durante a carga
+        if versao == _versao:
+            _nomes = novos
+            _carregado_em = time.monotonic()
+        return novos
+
+
+def invalidar_indice_fornecedores():
+    """Força recarga do índice na próxima consulta (chamar após escrita em fornecedor)."""
+    global _nomes, _versao
+    _versao += 1
+    _nomes = None
+
+
+def versao_indice():
+    return _versao
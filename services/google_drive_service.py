@@ -7,9 +7,13 @@ Execute gerar_token.py uma única vez para gerar o token.
 """
 
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.http import MediaIoBaseUpload
 import json
 
@@ -19,28 +23,113 @@ FOLDER_ID = "1dq7j5MgtyXToCTnQ3F6WeSRhRLuH1W7K"
 
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
+UPLOAD_MAX_WORKERS = 4   # Uploads simultâneos por lote
+BATCH_MAX_REQUESTS = 100  # Limite de chamadas por requisição batch da API do Drive
+
+# Renova o token quando faltar menos que isso para expirar
+REFRESH_MARGEM = timedelta(minutes=5)
+
+PERMISSAO_PUBLICA = {
+    'type': 'anyone',
+    'role': 'reader'
+}
+
+
+# Credenciais em memória (compartilhadas) e um cliente da API por thread:
+# o transporte httplib2 do googleapiclient não é thread-safe.
+_creds = None
+_creds_lock = threading.RLock()
+_local = threading.local()
+
+# Documento de discovery do Drive, lido e parseado uma vez por processo
+_discovery = None
+_discovery_lock = threading.Lock()
+
+# Pool de upload do processo: threads reaproveitadas mantêm o cliente da API (_local)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class _CredenciaisCompartilhadas(Credentials):
+    """
+    Credentials com a renovação serializada: além de get_credentials(), o
+    transporte do googleapiclient renova sozinho (ex.: resposta 401), e as
+    threads de upload usam o mesmo objeto.
+    """
+
+    def refresh(self, request):
+        token = self.token
+        with _creds_lock:
+            # Outra thread já renovou enquanto esta esperava
+            if self.token != token:
+                return
+            super().refresh(request)
+
+
+def _precisa_renovar(creds):
+    if not creds.valid:
+        return True
+    return creds.expiry is not None and creds.expiry - datetime.utcnow() < REFRESH_MARGEM
+
 
 def get_credentials():
-    """Carrega credenciais do arquivo token.json"""
-    if not os.path.exists(TOKEN_FILE):
-        raise FileNotFoundError(
-            f"❌ Arquivo {TOKEN_FILE} não encontrado!\n"
-            f"Execute: python gerar_token.py"
-        )
-    
-    creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-    
-    # Refresh se expirado
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-    
-    return creds
+    """
+    Credenciais OAuth do token.json, lidas do disco uma vez por processo
+    e renovadas antes de expirar.
+    """
+    global _creds
+
+    creds = _creds
+    if creds is not None and not _precisa_renovar(creds):
+        return creds
+
+    with _creds_lock:
+        if _creds is None:
+            if not os.path.exists(TOKEN_FILE):
+                raise FileNotFoundError(
+                    f"❌ Arquivo {TOKEN_FILE} não encontrado!\n"
+                    f"Execute: python gerar_token.py"
+                )
+            _creds = _CredenciaisCompartilhadas.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        
+        # Refresh se expirado (ou perto de expirar)
+        if _precisa_renovar(_creds) and _creds.refresh_token:
+            _creds.refresh(Request())
+        
+        return _creds
+
+
+def _documento_discovery():
+    """Discovery do Drive v3 embutido na biblioteca, parseado uma vez só."""
+    global _discovery
+    if _discovery is None:
+        with _discovery_lock:
+            if _discovery is None:
+                _discovery = json.loads(get_static_doc('drive', 'v3'))
+    return _discovery
 
 
 def get_drive_service():
-    """Retorna cliente do Google Drive autenticado com OAuth"""
+    """
+    Retorna cliente do Google Drive autenticado com OAuth.
+    O cliente é criado uma vez por thread, a partir do documento de discovery
+    já parseado (sem requisição nem parse de discovery).
+    """
     credentials = get_credentials()
-    return build('drive', 'v3', credentials=credentials)
+    service = getattr(_local, 'service', None)
+    if service is None or getattr(_local, 'credentials', None) is not credentials:
+        service = build_from_document(_documento_discovery(), credentials=credentials)
+        _local.service = service
+        _local.credentials = credentials
+    return service
+
+
+def reset_drive_service():
+    """Descarta credenciais e clientes em cache (ex.: após gerar um novo token.json)."""
+    global _creds
+    with _creds_lock:
+        _creds = None
+    _local.__dict__.clear()
 
 
 def create_folder(folder_name, parent_id=FOLDER_ID):
@@ -70,7 +159,7 @@ def create_folder(folder_name, parent_id=FOLDER_ID):
     return folder.get('id')
 
 
-def upload_file_to_drive(file_obj, filename, folder_id):
+def upload_file_to_drive(file_obj, filename, folder_id, tornar_publico=True, propriedades=None):
     """
     Faz upload de um arquivo para Google Drive
     
@@ -78,6 +167,9 @@ def upload_file_to_drive(file_obj, filename, folder_id):
         file_obj: Objeto de arquivo (FileStorage do Flask)
         filename: Nome do arquivo
         folder_id: ID da pasta destino
+        tornar_publico: Se False, a permissão pública fica para tornar_publicos()
+                        (uma requisição batch para vários arquivos)
+        propriedades: appProperties gravadas no arquivo (ver buscar_arquivo)
     
     Returns:
         Dict com 'id', 'webViewLink' e 'name'
@@ -88,6 +180,8 @@ def upload_file_to_drive(file_obj, filename, folder_id):
         'name': filename,
         'parents': [folder_id]
     }
+    if propriedades:
+        file_metadata['appProperties'] = propriedades
     
     # Detectar MIME type
     import mimetypes
@@ -112,17 +206,15 @@ def upload_file_to_drive(file_obj, filename, folder_id):
     file_id = file_obj_drive.get('id')
     
     # Tornar público
-    try:
-        service.permissions().create(
-            fileId=file_id,
-            body={
-                'type': 'anyone',
-                'role': 'reader'
-            }
-        ).execute()
-        print(f"[DEBUG] Arquivo {filename} tornado público")
-    except Exception as e:
-        print(f"[AVISO] Não foi possível tornar público: {e}")
+    if tornar_publico:
+        try:
+            service.permissions().create(
+                fileId=file_id,
+                body=PERMISSAO_PUBLICA
+            ).execute()
+            print(f"[DEBUG] Arquivo {filename} tornado público")
+        except Exception as e:
+            print(f"[AVISO] Não foi possível tornar público: {e}")
     
     return {
         'id': file_id,
@@ -131,41 +223,192 @@ def upload_file_to_drive(file_obj, filename, folder_id):
     }
 
 
-def upload_files_batch(files, form_id, obra_id):
+def buscar_arquivo(folder_id, propriedade, valor):
+    """
+    Arquivo da pasta com appProperties[propriedade] == valor, no mesmo formato
+    de upload_file_to_drive (None se não houver). Usado antes de reenviar um
+    arquivo cuja resposta do create se perdeu: ele pode já ter sido criado.
+    """
+    service = get_drive_service()
+    
+    results = service.files().list(
+        q=(
+            f"'{folder_id}' in parents and trashed = false and "
+            f"appProperties has {{ key='{propriedade}' and value='{valor}' }}"
+        ),
+        spaces='drive',
+        fields='files(id, webViewLink, name)',
+        pageSize=1
+    ).execute()
+    
+    files = results.get('files', [])
+    if not files:
+        return None
+    return {
+        'id': files[0].get('id'),
+        'webViewLink': files[0].get('webViewLink'),
+        'name': files[0].get('name')
+    }
+
+
+def tornar_publicos(file_ids):
+    """
+    Concede leitura pública a vários arquivos com a API batch do Drive
+    (até BATCH_MAX_REQUESTS permissões por requisição HTTP).
+
+    Returns:
+        Dict {file_id: erro} dos arquivos que não puderam ser tornados públicos
+    """
+    falhas = {}
+    if not file_ids:
+        return falhas
+
+    service = get_drive_service()
+
+    def _callback(request_id, response, exception):
+        if exception is not None:
+            falhas[request_id] = exception
+
+    for inicio in range(0, len(file_ids), BATCH_MAX_REQUESTS):
+        batch = service.new_batch_http_request(callback=_callback)
+        for file_id in file_ids[inicio:inicio + BATCH_MAX_REQUESTS]:
+            batch.add(
+                service.permissions().create(fileId=file_id, body=PERMISSAO_PUBLICA, fields='id'),
+                request_id=file_id
+            )
+        batch.execute()
+
+    for file_id, erro in falhas.items():
+        print(f"[AVISO] Não foi possível tornar público {file_id}: {erro}")
+    print(f"[DEBUG] {len(file_ids) - len(falhas)} arquivo(s) tornado(s) público(s)")
+    return falhas
+
+
+def apagar_arquivos(file_ids):
+    """
+    Apaga vários arquivos (ou pastas) com a API batch do Drive. Best-effort:
+    falhas só são registradas no log.
+    """
+    if not file_ids:
+        return
+
+    service = get_drive_service()
+
+    def _callback(request_id, response, exception):
+        if exception is not None:
+            print(f"[AVISO] Não foi possível apagar {request_id}: {exception}")
+
+    for inicio in range(0, len(file_ids), BATCH_MAX_REQUESTS):
+        batch = service.new_batch_http_request(callback=_callback)
+        for file_id in file_ids[inicio:inicio + BATCH_MAX_REQUESTS]:
+            batch.add(service.files().delete(fileId=file_id), request_id=file_id)
+        try:
+            batch.execute()
+        except Exception as e:
+            print(f"[AVISO] Falha ao apagar arquivos no Drive: {e}")
+
+
+def _pool_upload():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS, thread_name_prefix="drive-upload")
+    return _pool
+
+
+def executar_em_paralelo(tarefas, max_workers=UPLOAD_MAX_WORKERS):
+    """
+    Executa as tarefas (funções sem argumentos) no pool de upload do processo,
+    com no máximo max_workers delas ao mesmo tempo.
+
+    Returns:
+        Lista de (resultado, erro) na mesma ordem das tarefas
+    """
+    def _executar(tarefa):
+        try:
+            return tarefa(), None
+        except Exception as e:
+            return None, e
+
+    if len(tarefas) <= 1:
+        return [_executar(tarefa) for tarefa in tarefas]
+
+    pool = _pool_upload()
+    pendentes = list(enumerate(tarefas))
+    resultados = [None] * len(tarefas)
+    em_execucao = {}
+    while pendentes or em_execucao:
+        while pendentes and len(em_execucao) < max(1, max_workers):
+            indice, tarefa = pendentes.pop(0)
+            em_execucao[pool.submit(_executar, tarefa)] = indice
+        prontos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+        for futuro in prontos:
+            resultados[em_execucao.pop(futuro)] = futuro.result()
+    return resultados
+
+
+def link_do_arquivo(result):
+    """Formato gravado em formulario.link_anexo para um arquivo enviado."""
+    file_id = result['id']
+    return {
+        'name': result['name'],
+        'link': result['webViewLink'],
+        'download': f"https://drive.google.com/uc?export=download&id={file_id}",
+        'drive_id': file_id
+    }
+
+
+def upload_files_batch(files, form_id, obra_id, max_workers=UPLOAD_MAX_WORKERS, folder_id=None):
     """
     Realiza upload de múltiplos arquivos para Google Drive
     
+    Os arquivos são enviados em paralelo (até max_workers por vez) e as
+    permissões públicas vão numa única requisição batch no final.
+    
     Args:
         files: Lista de objetos FileStorage
         form_id: ID do formulário
         obra_id: ID da obra
+        max_workers: Uploads simultâneos (1 = sequencial)
+        folder_id: Pasta já existente do lançamento (None = criar uma)
     
     Returns:
         Lista de dicts com links dos arquivos
+    
+    Se algum upload falhar, os arquivos já enviados (e a pasta, se foi criada
+    aqui) são apagados do Drive antes de relançar o erro: nada fica órfão.
     """
+    pasta_criada = folder_id is None
     try:
-        # Criar pasta para o lançamento
-        folder_name = f"Lançamento_{form_id}_Obra_{obra_id}"
-        print(f"[DEBUG] Criando pasta: {folder_name}")
-        folder_id = create_folder(folder_name)
-        print(f"[DEBUG] Pasta criada com ID: {folder_id}")
+        # Criar pasta para o lançamento (se ainda não houver)
+        if folder_id is None:
+            folder_name = f"Lançamento_{form_id}_Obra_{obra_id}"
+            print(f"[DEBUG] Criando pasta: {folder_name}")
+            folder_id = create_folder(folder_name)
+            print(f"[DEBUG] Pasta criada com ID: {folder_id}")
+        
+        # Upload dos arquivos (cada thread usa o próprio cliente do Drive)
+        files = [file for file in files if file and file.filename]
+        print(f"[DEBUG] Fazendo upload de {len(files)} arquivo(s), até {max_workers} por vez")
+        tarefas = [
+            (lambda file=file: upload_file_to_drive(file, file.filename, folder_id, tornar_publico=False))
+            for file in files
+        ]
+        resultados = executar_em_paralelo(tarefas, max_workers)
+        
+        enviados = [result for result, erro in resultados if erro is None]
+        
+        for file, (_, erro) in zip(files, resultados):
+            if erro is not None:
+                print(f"[ERRO] Falha no upload de {file.filename}: {erro}")
+                # A pasta criada aqui leva junto o que foi enviado para ela
+                apagar_arquivos([folder_id] if pasta_criada else [result['id'] for result in enviados])
+                raise erro
         
-        # Upload de cada arquivo
-        upload_links = []
-        for idx, file in enumerate(files):
-            if file and file.filename:
-                print(f"[DEBUG] Fazendo upload do arquivo {idx + 1}: {file.filename}")
-                result = upload_file_to_drive(file, file.filename, folder_id)
-                file_id = result['id']
-                
-                upload_links.append({
-                    'name': result['name'],
-                    'link': result['webViewLink'],
-                    'download': f"https://drive.google.com/uc?export=download&id={file_id}",
-                    'drive_id': file_id
-                })
-                print(f"[DEBUG] Arquivo {idx + 1} upado com sucesso")
+        tornar_publicos([result['id'] for result in enviados])
         
+        upload_links = [link_do_arquivo(result) for result in enviados]
         print(f"[DEBUG] Total de arquivos upados: {len(upload_links)}")
         return upload_links
     
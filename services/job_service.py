@@ -0,0 +1,172 @@
+"""
+Tarefas em segundo plano (exportações, uploads) com acompanhamento de progresso.
+
+Os jobs rodam num ThreadPoolExecutor do próprio processo e ficam registrados
+em memória até `retencao` segundos depois de terminar; arquivos gerados por
+eles são apagados junto. Como o registro é por processo, com vários workers
+o cliente precisa consultar o mesmo worker que recebeu o job (sticky session
+ou um único worker para estas rotas).
+"""
+
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+
+
+class Job:
+    """Estado de uma tarefa. Atualizado pela própria tarefa via atualizar()/avancar()."""
+
+    def __init__(self, tipo, dono=None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.dono = dono
+        self.status = PENDENTE
+        self.processados = 0
+        self.total = None
+        self.mensagem = None
+        self.resultado = {}
+        self.erro = None
+        self.arquivo = None          # caminho do arquivo gerado (download)
+        self.nome_arquivo = None
+        self.mimetype = None
+        self.criado_em = time.time()
+        self.iniciado_em = None
+        self.concluido_em = None
+        self._lock = threading.Lock()
+
+    def atualizar(self, processados=None, total=None, mensagem=None):
+        with self._lock:
+            if processados is not None:
+                self.processados = processados
+            if total is not None:
+                self.total = total
+            if mensagem is not None:
+                self.mensagem = mensagem
+
+    def avancar(self, quantidade=1):
+        """Soma ao contador de processados (seguro para várias threads do mesmo job)."""
+        with self._lock:
+            self.processados += quantidade
+
+    def anexar_arquivo(self, caminho, nome_arquivo, mimetype):
+        with self._lock:
+            self.arquivo = caminho
+            self.nome_arquivo = nome_arquivo
+            self.mimetype = mimetype
+
+    @property
+    def progresso(self):
+        """Percentual concluído (None se o total não é conhecido)."""
+        if self.status == CONCLUIDO:
+            return 100
+        if not self.total:
+            return None
+        return min(99, int(self.processados * 100 / self.total))
+
+    @property
+    def terminado(self):
+        return self.status in (CONCLUIDO, ERRO)
+
+    def acessivel_por(self, user_id):
+        """Só o dono vê o job; jobs sem dono (criados sem login) valem para quem tem o id."""
+        return self.dono is None or self.dono == user_id
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "tipo": self.tipo,
+                "status": self.status,
+                "progresso": self.progresso,
+                "processados": self.processados,
+                "total": self.total,
+                "mensagem": self.mensagem,
+                "resultado": dict(self.resultado),
+                "erro": self.erro,
+                "arquivo_disponivel": self.status == CONCLUIDO and self.arquivo is not None,
+                "criado_em": _iso(self.criado_em),
+                "iniciado_em": _iso(self.iniciado_em),
+                "concluido_em": _iso(self.concluido_em),
+            }
+
+
+def _iso(ts):
+    if ts is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts))
+
+
+class JobManager:
+    """Fila de jobs: submit() agenda a função e get() consulta o estado."""
+
+    def __init__(self, max_workers=2, retencao=3600, nome="jobs"):
+        self.retencao = retencao
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=nome)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, tipo, funcao, *args, dono=None, **kwargs):
+        """
+        Agenda funcao(job, *args, **kwargs). O retorno (dict) vira job.resultado;
+        exceções marcam o job como erro.
+        """
+        self._purgar()
+        job = Job(tipo, dono=dono)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._executar, job, funcao, args, kwargs)
+        return job
+
+    def _executar(self, job, funcao, args, kwargs):
+        job.status = EXECUTANDO
+        job.iniciado_em = time.time()
+        try:
+            resultado = funcao(job, *args, **kwargs)
+            with job._lock:
+                if resultado:
+                    job.resultado.update(resultado)
+                job.status = CONCLUIDO
+        except Exception as e:
+            print(f"❌ Job {job.tipo} {job.id} falhou: {e}", file=sys.stderr, flush=True)
+            traceback.print_exc(file=sys.stderr)
+            with job._lock:
+                job.erro = str(e)
+                job.status = ERRO
+            _apagar_arquivo(job)
+        finally:
+            job.concluido_em = time.time()
+
+    def get(self, job_id):
+        self._purgar()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _purgar(self):
+        """Remove jobs terminados há mais de `retencao` segundos (e seus arquivos)."""
+        limite = time.time() - self.retencao
+        with self._lock:
+            vencidos = [
+                job for job in self._jobs.values()
+                if job.terminado and job.concluido_em is not None and job.concluido_em < limite
+            ]
+            for job in vencidos:
+                del self._jobs[job.id]
+        for job in vencidos:
+            _apagar_arquivo(job)
+
+
+def _apagar_arquivo(job):
+    if job.arquivo and os.path.exists(job.arquivo):
+        try:
+            os.remove(job.arquivo)
+        except OSError as e:
+            print(f"⚠️ Erro ao apagar arquivo do job {job.id}: {e}", file=sys.stderr, flush=True)
@@ -1,5 +1,16 @@
 from db import get_connection
 from flask import jsonify # Adicionado para garantir que jsonify está disponível se necessário, embora não seja estritamente necessário aqui.
+from services.cache_service import TTLCache
+
+# Catálogo de obras com os usuários vinculados, carregado numa única consulta e
+# compartilhado por listar_obras, listar_obras_por_usuario, buscar_obra_por_id e
+# pelo escopo de GET /formulario. Invalidado ao alterar obras, usuários ou
+# vínculos; o TTL é só uma rede de segurança.
+CATALOGO_TTL = 300
+_catalogo = TTLCache(ttl=CATALOGO_TTL, max_items=1)
+
+# Perfis que enxergam os lançamentos de todas as obras
+PERFIS_SEM_ESCOPO = ("admin", "financeiro")
 
 def criar_obra(nome, user_id, quem_paga, banco_id=None, user_ids=None):
     conn = get_connection()
@@ -34,6 +45,7 @@ def criar_obra(nome, user_id, quem_paga, banco_id=None, user_ids=None):
         except Exception as e:
             print(f"Aviso: Obra criada, mas falha ao vincular usuário {uid}: {e}")
     conn.commit()
+    invalidar_catalogo_obras()
 
     cursor.close()
     conn.close()
@@ -41,26 +53,8 @@ def criar_obra(nome, user_id, quem_paga, banco_id=None, user_ids=None):
     return {"id": obra_id, "nome": nome, "quem_paga": quem_paga, "banco_id": banco_id}, None
 
 def listar_obras():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM obras")
-    obras = cursor.fetchall()
-
-    # Busca vínculos de usuários com nome para cada obra
-    for obra in obras:
-        cursor.execute("""
-            SELECT u.id, u.nome, u.username 
-            FROM users u 
-            JOIN users_obras uo ON u.id = uo.user_id 
-            WHERE uo.obra_id = %s
-        """, (obra['id'],))
-        users = cursor.fetchall()
-        obra['user_ids'] = [u['id'] for u in users]
-        obra['users'] = users
-
-    cursor.close()
-    conn.close()
-    return obras
+    # Cópias: quem chama pode alterar as obras sem afetar o catálogo em cache
+    return [_copiar_obra(obra) for obra in _carregar_catalogo()["obras"]]
 
 def atualizar_obra(obra_id, novo_nome, novo_quem_paga, banco_id=None, user_ids=None):
     conn = get_connection()
@@ -92,6 +86,7 @@ def atualizar_obra(obra_id, novo_nome, novo_quem_paga, banco_id=None, user_ids=N
                 print(f"Aviso: Falha ao vincular usuário {uid} à obra {obra_id}: {e}")
 
     conn.commit()
+    invalidar_catalogo_obras()
 
     # 4. Retorna atualizado
     cursor.execute("SELECT * FROM obras WHERE id = %s", (obra_id,))
@@ -103,18 +98,12 @@ def atualizar_obra(obra_id, novo_nome, novo_quem_paga, banco_id=None, user_ids=N
 
 # === ADICIONE ESTA FUNÇÃO NO FINAL ===
 def buscar_obra_por_id(obra_id):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT id, nome, quem_paga, banco_id FROM obras WHERE id = %s", (obra_id,))
-        obra = cursor.fetchone()
-        return obra
+        obra = _carregar_catalogo()["por_id"].get(int(obra_id))
+        return _resumo_obra(obra) if obra else None
     except Exception as e:
         print(f"Erro ao buscar obra por ID: {e}")
         return None
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
 def deletar_obra(obra_id):
     conn = get_connection()
@@ -132,6 +121,7 @@ def deletar_obra(obra_id):
         # 3. Deleta a obra
         cursor.execute("DELETE FROM obras WHERE id = %s", (obra_id,))
         conn.commit()
+        invalidar_catalogo_obras()
 
         return {"message": "Obra deletada com sucesso"}, None
     except Exception as e:
@@ -142,23 +132,88 @@ def deletar_obra(obra_id):
 
 # --- NOVA FUNÇÃO NECESSÁRIA ---
 def listar_obras_por_usuario(user_id):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        # Este SQL faz a mágica: une a tabela de obras com a tabela de permissões
-        query = """
-            SELECT o.id, o.nome, o.quem_paga, o.banco_id
-            FROM obras o
-            JOIN users_obras uo ON o.id = uo.obra_id
-            WHERE uo.user_id = %s
-        """
-        cursor.execute(query, (user_id,))
-        obras = cursor.fetchall()
-        return obras
+        catalogo = _carregar_catalogo()
+        obra_ids = catalogo["por_usuario"].get(int(user_id), ())
+        return [_resumo_obra(catalogo["por_id"][oid]) for oid in obra_ids]
     except Exception as e:
         print(f"Erro ao listar obras por usuário: {e}")
         return []
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
\ No newline at end of file
+
+
+# ===========================
+# CATÁLOGO EM CACHE
+# ===========================
+def _carregar_catalogo():
+    """
+    Obras + usuários vinculados numa só consulta (LEFT JOIN agrupado aqui):
+        obras       — lista na ordem de id, cada uma com user_ids e users
+        por_id      — obra_id -> obra
+        por_usuario — user_id -> tuple (ordenada) de obra ids
+    """
+    def _carregar():
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT o.*, u.id AS vinculo_user_id, u.nome AS vinculo_nome, u.username AS vinculo_username
+                FROM obras o
+                LEFT JOIN users_obras uo ON uo.obra_id = o.id
+                LEFT JOIN users u ON u.id = uo.user_id
+                ORDER BY o.id, u.id
+            """)
+            por_id = {}
+            por_usuario = {}
+            for row in cursor.fetchall():
+                uid = row.pop("vinculo_user_id")
+                nome = row.pop("vinculo_nome")
+                username = row.pop("vinculo_username")
+                obra = por_id.get(row["id"])
+                if obra is None:
+                    obra = por_id[row["id"]] = dict(row, user_ids=[], users=[])
+                if uid is not None and uid not in obra["user_ids"]:
+                    obra["user_ids"].append(uid)
+                    obra["users"].append({"id": uid, "nome": nome, "username": username})
+                    por_usuario.setdefault(uid, []).append(obra["id"])
+        finally:
+            cursor.close()
+            conn.close()
+        return {
+            "obras": list(por_id.values()),
+            "por_id": por_id,
+            "por_usuario": {uid: tuple(ids) for uid, ids in por_usuario.items()},
+        }
+
+    return _catalogo.get_or_load("catalogo", _carregar)
+
+
+def _copiar_obra(obra):
+    return dict(obra, user_ids=list(obra["user_ids"]), users=[dict(u) for u in obra["users"]])
+
+
+def _resumo_obra(obra):
+    return {"id": obra["id"], "nome": obra["nome"], "quem_paga": obra["quem_paga"], "banco_id": obra["banco_id"]}
+
+
+def invalidar_catalogo_obras():
+    """Descarta o catálogo (obras, usuários ou vínculos alterados)."""
+    _catalogo.invalidate()
+
+
+# ===========================
+# ESCOPO DE OBRAS POR USUÁRIO
+# ===========================
+def obras_do_usuario(user_id):
+    """IDs (ordenados) das obras vinculadas ao usuário, a partir do catálogo."""
+    return _carregar_catalogo()["por_usuario"].get(user_id, ())
+
+
+def obras_visiveis(user):
+    """
+    Obras cujos lançamentos o usuário pode ver: None = todas (admin,
+    financeiro ou requisição sem usuário autenticado), senão tuple de IDs.
+    """
+    if not user or user.get("role") in PERFIS_SEM_ESCOPO:
+        return None
+    return obras_do_usuario(user["id"])
+
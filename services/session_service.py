@@ -0,0 +1,205 @@
+"""
+Sessões de login (token -> usuário) com expiração, renovação deslizante e revogação.
+
+Backends (SESSION_CONFIG["backend"]):
+    mysql  — tabela user_sessions, compartilhada entre workers, com um cache
+             LRU por processo na frente (revogações feitas em outro worker
+             valem em até SESSION_CONFIG["local_ttl"] segundos)
+    memory — dicionário do próprio processo (um único worker / testes)
+
+A validade é renovada enquanto o token é usado: quando passa da metade do
+TTL, o prazo volta a ser o TTL inteiro (uma escrita a cada ttl/2 por token).
+"""
+
+import hashlib
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from config import SESSION_CONFIG
+from db import get_connection
+from services.cache_service import TTLCache
+
+LIMPEZA_INTERVALO = 3600  # segundos entre limpezas de sessões expiradas
+
+
+def gerar_token():
+    return secrets.token_hex(32)
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class MemorySessionStore:
+    """Sessões no próprio processo."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._sessoes = {}  # token -> [user_id, expira_em]
+        self._lock = threading.Lock()
+
+    def criar(self, user_id):
+        token = gerar_token()
+        with self._lock:
+            self._sessoes[token] = [user_id, time.time() + self.ttl]
+        return token
+
+    def obter(self, token):
+        """user_id do token (renovando o prazo) ou None se inválido/expirado."""
+        agora = time.time()
+        with self._lock:
+            sessao = self._sessoes.get(token)
+            if sessao is None:
+                return None
+            if sessao[1] <= agora:
+                del self._sessoes[token]
+                return None
+            sessao[1] = agora + self.ttl
+            return sessao[0]
+
+    def revogar(self, token):
+        with self._lock:
+            self._sessoes.pop(token, None)
+
+    def revogar_usuario(self, user_id):
+        with self._lock:
+            for token in [t for t, (uid, _) in self._sessoes.items() if uid == user_id]:
+                del self._sessoes[token]
+
+
+class MySQLSessionStore:
+    """Sessões na tabela user_sessions, com cache LRU local dos tokens validados."""
+
+    def __init__(self, ttl, local_ttl, local_max_items):
+        self.ttl = ttl
+        self._local = TTLCache(ttl=local_ttl, max_items=local_max_items)  # hash -> (user_id, expira_em)
+        self._limpo_em = 0.0
+
+    def criar(self, user_id):
+        token = gerar_token()
+        agora = datetime.utcnow()
+        expira_em = agora + timedelta(seconds=self.ttl)
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                INSERT INTO user_sessions (token_hash, user_id, created_at, expires_at)
+                VALUES (%s, %s, %s, %s)
+            """, (_hash(token), user_id, agora, expira_em))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        self._local.set(_hash(token), (user_id, expira_em))
+        self._limpar_expiradas()
+        return token
+
+    def obter(self, token):
+        """user_id do token (renovando o prazo) ou None se inválido/expirado/revogado."""
+        chave = _hash(token)
+        agora = datetime.utcnow()
+
+        sessao = self._local.get(chave)
+        do_banco = sessao is None
+        if do_banco:
+            sessao = self._buscar(chave, agora)
+            if sessao is None:
+                return None
+        user_id, expira_em = sessao
+        if expira_em <= agora:
+            self._local.invalidate(chave)
+            return None
+
+        # Renovação deslizante: só grava quando já passou da metade do prazo
+        renovada = expira_em - agora < timedelta(seconds=self.ttl / 2)
+        if renovada:
+            expira_em = self._renovar(chave, agora)
+        # Acertos no cache não reiniciam o local_ttl: a sessão é reconferida
+        # no banco periodicamente (revogação feita por outro worker)
+        if do_banco or renovada:
+            self._local.set(chave, (user_id, expira_em))
+        return user_id
+
+    def _buscar(self, chave, agora):
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT user_id, expires_at FROM user_sessions
+                WHERE token_hash = %s AND expires_at > %s
+            """, (chave, agora))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+        if not row:
+            return None
+        return row["user_id"], row["expires_at"]
+
+    def _renovar(self, chave, agora):
+        expira_em = agora + timedelta(seconds=self.ttl)
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE user_sessions SET expires_at = %s WHERE token_hash = %s",
+                (expira_em, chave)
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        return expira_em
+
+    def revogar(self, token):
+        chave = _hash(token)
+        self._local.invalidate(chave)
+        self._executar("DELETE FROM user_sessions WHERE token_hash = %s", (chave,))
+
+    def revogar_usuario(self, user_id):
+        # O cache local não é indexado por usuário: descarta tudo
+        self._local.invalidate()
+        self._executar("DELETE FROM user_sessions WHERE user_id = %s", (user_id,))
+
+    def _executar(self, sql, params):
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _limpar_expiradas(self):
+        """Apaga sessões vencidas (no máximo uma vez por LIMPEZA_INTERVALO por processo)."""
+        if time.monotonic() - self._limpo_em < LIMPEZA_INTERVALO:
+            return
+        self._limpo_em = time.monotonic()
+        try:
+            self._executar("DELETE FROM user_sessions WHERE expires_at <= %s", (datetime.utcnow(),))
+        except Exception as e:
+            print(f"⚠️ Erro ao limpar sessões expiradas: {e}", file=sys.stderr, flush=True)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Store configurado em SESSION_CONFIG (um por processo)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if SESSION_CONFIG["backend"] == "memory":
+                    _store = MemorySessionStore(SESSION_CONFIG["ttl"])
+                else:
+                    _store = MySQLSessionStore(
+                        SESSION_CONFIG["ttl"],
+                        SESSION_CONFIG["local_ttl"],
+                        SESSION_CONFIG["local_max_items"],
+                    )
+    return _store
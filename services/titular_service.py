@@ -0,0 +1,362 @@
+"""
+Titulares em memória: autocomplete (tabela fornecedor) e catálogo de nomes.
+
+Autocomplete:
+Índice carregado uma vez por processo e atualizado incrementalmente pelas
+rotas de /fornecedor. Busca por nome (sem acento, sem caixa) e por CPF/CNPJ
+(só dígitos), com ranking:
+    0 — nome (ou CPF/CNPJ) começa com o termo
+    1 — alguma palavra do nome começa com o termo
+    2 — o termo aparece no meio do nome (ou do CPF/CNPJ)
+Dentro de cada faixa, ordem alfabética. Termos de 1-2 caracteres (sem
+trigramas) buscam só as faixas 0 e 1, por listas ordenadas, sem varrer o
+índice a cada tecla; na faixa 1 a ordem é pela palavra que casou.
+
+Catálogo (GET /titulares/list): nomes distintos de fornecedor + formulario,
+mantido nas escritas e servido já serializado, com ETag do conteúdo.
+"""
+
+import bisect
+import hashlib
+import heapq
+import json
+import sys
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from db import get_connection
+
+RECARGA_TTL = 600  # segundos — recarga completa (alterações de outros workers)
+TERMO_CURTO = 2    # até este tamanho a busca é só por prefixo (nome e palavras)
+
+
+def dobrar_texto(texto):
+    """Minúsculo, sem acentos e com espaços simples: 'José  Ávila ' → 'jose avila'."""
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+
+def somente_digitos(texto):
+    return "".join(c for c in str(texto or "") if c.isdigit())
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceTitulares:
+    """Índice de fornecedores por prefixo (lista ordenada) e por trigramas."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._carga_lock = threading.Lock()
+        self._carregado_em = None
+        self._pendentes = None  # escritas recebidas durante uma carga: [(id, row ou None)]
+        self._limpar()
+
+    def _limpar(self):
+        self._por_id = {}                        # id -> {id, titular, cpf_cnpj, chave, digitos}
+        self._nomes = []                         # [(chave, id)] ordenada
+        self._cpfs = []                          # [(digitos, id)] ordenada
+        self._palavras = []                      # [(palavra, chave, id)] ordenada (exceto a 1ª palavra)
+        self._tri_nome = defaultdict(set)        # trigrama -> {ids}
+        self._tri_cpf = defaultdict(set)
+
+    # -------------------------------------------
+    # Carga e manutenção
+    # -------------------------------------------
+    def carregar(self):
+        """
+        (Re)carrega todo o índice a partir da tabela fornecedor. Escritas que
+        chegam enquanto o banco é lido são guardadas e reaplicadas no fim, pois
+        a leitura pode não tê-las visto.
+        """
+        with self._lock:
+            self._pendentes = []
+        try:
+            conn = get_connection()
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("SELECT id, titular, cpf_cnpj FROM fornecedor")
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+        except Exception:
+            with self._lock:
+                self._pendentes = None
+            raise
+
+        with self._lock:
+            self._limpar()
+            for row in rows:
+                self._inserir(row, ordenar=False)
+            self._nomes.sort()
+            self._cpfs.sort()
+            self._palavras.sort()
+            pendentes, self._pendentes = self._pendentes, None
+            for fid, row in pendentes:
+                self._retirar(fid)
+                if row is not None:
+                    self._inserir(row)
+            self._carregado_em = time.monotonic()
+
+    def _garantir_carregado(self):
+        if self._carregado_em is not None and time.monotonic() - self._carregado_em < RECARGA_TTL:
+            return
+        # Lock só de carga: buscas seguem usando o índice atual enquanto o banco é lido
+        with self._carga_lock:
+            if self._carregado_em is not None and time.monotonic() - self._carregado_em < RECARGA_TTL:
+                return
+            try:
+                self.carregar()
+            except Exception as e:
+                print(f"⚠️ Erro ao carregar índice de titulares: {e}", file=sys.stderr, flush=True)
+                if self._carregado_em is None:
+                    raise
+
+    def _inserir(self, row, ordenar=True):
+        entrada = {
+            "id": row["id"],
+            "titular": row.get("titular"),
+            "cpf_cnpj": row.get("cpf_cnpj"),
+            "chave": dobrar_texto(row.get("titular")),
+            "digitos": somente_digitos(row.get("cpf_cnpj")),
+        }
+        fid = entrada["id"]
+        self._por_id[fid] = entrada
+        inserir = bisect.insort if ordenar else list.append
+        inserir(self._nomes, (entrada["chave"], fid))
+        if entrada["digitos"]:
+            inserir(self._cpfs, (entrada["digitos"], fid))
+        for palavra in set(entrada["chave"].split()[1:]):
+            inserir(self._palavras, (palavra, entrada["chave"], fid))
+        for t in _trigramas(entrada["chave"]):
+            self._tri_nome[t].add(fid)
+        for t in _trigramas(entrada["digitos"]):
+            self._tri_cpf[t].add(fid)
+
+    def _retirar(self, fid):
+        entrada = self._por_id.pop(fid, None)
+        if entrada is None:
+            return
+        itens = [(self._nomes, (entrada["chave"], fid)), (self._cpfs, (entrada["digitos"], fid))]
+        for palavra in set(entrada["chave"].split()[1:]):
+            itens.append((self._palavras, (palavra, entrada["chave"], fid)))
+        for lista, item in itens:
+            pos = bisect.bisect_left(lista, item)
+            if pos < len(lista) and lista[pos] == item:
+                del lista[pos]
+        for indice, texto in ((self._tri_nome, entrada["chave"]), (self._tri_cpf, entrada["digitos"])):
+            for t in _trigramas(texto):
+                ids = indice.get(t)
+                if ids is not None:
+                    ids.discard(fid)
+                    if not ids:
+                        del indice[t]
+
+    def adicionar(self, row):
+        """Inclui/atualiza um fornecedor já conhecido (dict com id, titular, cpf_cnpj)."""
+        with self._lock:
+            if self._pendentes is not None:
+                self._pendentes.append((row["id"], row))
+            if self._carregado_em is None:
+                return  # Primeira carga em andamento (ou ainda não iniciada)
+            self._retirar(row["id"])
+            self._inserir(row)
+
+    def atualizar(self, fornecedor_id):
+        """Relê um fornecedor do banco e atualiza o índice."""
+        if self._carregado_em is None and self._pendentes is None:
+            return
+        try:
+            conn = get_connection()
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("SELECT id, titular, cpf_cnpj FROM fornecedor WHERE id = %s", (fornecedor_id,))
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+                conn.close()
+        except Exception as e:
+            # Best-effort: a recarga por TTL corrige o índice
+            print(f"⚠️ Erro ao atualizar índice de titulares ({fornecedor_id}): {e}", file=sys.stderr, flush=True)
+            return
+        if row:
+            self.adicionar(row)
+        else:
+            self.remover(fornecedor_id)
+
+    def remover(self, fornecedor_id):
+        with self._lock:
+            if self._pendentes is not None:
+                self._pendentes.append((fornecedor_id, None))
+            self._retirar(fornecedor_id)
+
+    # -------------------------------------------
+    # Busca
+    # -------------------------------------------
+    def buscar(self, termo, limite=10):
+        """Retorna até `limite` fornecedores [{id, titular, cpf_cnpj}] ranqueados."""
+        self._garantir_carregado()
+
+        chave = dobrar_texto(termo)
+        digitos = somente_digitos(termo)
+        # Termo com cara de documento (só dígitos e pontuação): busca também por CPF/CNPJ
+        busca_cpf = bool(digitos) and not any(c.isalpha() for c in chave)
+
+        with self._lock:
+            escolhidos = []
+            vistos = set()
+
+            # Faixa 0: prefixo (lista ordenada → já vem em ordem alfabética)
+            if chave:
+                self._coletar_prefixo(self._nomes, chave, escolhidos, vistos, limite)
+            if busca_cpf:
+                self._coletar_prefixo(self._cpfs, digitos, escolhidos, vistos, limite)
+
+            faltam = limite - len(escolhidos)
+            if faltam > 0 and chave and len(chave) <= TERMO_CURTO:
+                # Termo curto: faixa 1 pela lista de palavras, sem faixa 2
+                self._coletar_prefixo(self._palavras, chave, escolhidos, vistos, limite)
+            elif faltam > 0:
+                candidatos = []
+                if chave:
+                    for fid in self._candidatos(self._tri_nome, chave):
+                        if fid in vistos:
+                            continue
+                        nome = self._por_id[fid]["chave"]
+                        if chave not in nome:
+                            continue
+                        vistos.add(fid)
+                        faixa = 1 if (" " + chave) in (" " + nome) else 2
+                        candidatos.append((faixa, nome, fid))
+                if busca_cpf and len(digitos) > TERMO_CURTO:
+                    for fid in self._candidatos(self._tri_cpf, digitos):
+                        if fid in vistos or digitos not in self._por_id[fid]["digitos"]:
+                            continue
+                        vistos.add(fid)
+                        candidatos.append((2, self._por_id[fid]["chave"], fid))
+                for _, _, fid in heapq.nsmallest(faltam, candidatos):
+                    escolhidos.append(fid)
+
+            return [
+                {
+                    "id": self._por_id[fid]["id"],
+                    "titular": self._por_id[fid]["titular"],
+                    "cpf_cnpj": self._por_id[fid]["cpf_cnpj"],
+                }
+                for fid in escolhidos
+            ]
+
+    def _coletar_prefixo(self, lista, prefixo, escolhidos, vistos, limite):
+        pos = bisect.bisect_left(lista, (prefixo,))
+        while pos < len(lista) and len(escolhidos) < limite:
+            chave, fid = lista[pos][0], lista[pos][-1]
+            if not chave.startswith(prefixo):
+                break
+            if fid not in vistos:
+                vistos.add(fid)
+                escolhidos.append(fid)
+            pos += 1
+
+    def _candidatos(self, indice, termo):
+        """Ids que contêm todos os trigramas do termo (termos curtos não passam por aqui)."""
+        grams = _trigramas(termo)
+        if not grams:
+            return set()
+        conjuntos = sorted((indice.get(t, set()) for t in grams), key=len)
+        resultado = set(conjuntos[0])
+        for ids in conjuntos[1:]:
+            resultado &= ids
+            if not resultado:
+                break
+        return resultado
+
+
+class CatalogoTitulares:
+    """Lista distinta e ordenada de titulares, com o JSON e o ETag já calculados."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nomes = None       # chave dobrada -> titular (primeira grafia vista)
+        self._carregado_em = None
+        self._corpo = None       # JSON serializado (None = precisa recalcular)
+        self._etag = None
+
+    def _carregar(self):
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("""
+                SELECT DISTINCT titular
+                FROM (
+                    SELECT TRIM(titular) AS titular FROM fornecedor WHERE TRIM(titular) != ''
+                    UNION
+                    SELECT TRIM(titular) AS titular FROM formulario WHERE titular IS NOT NULL AND TRIM(titular) != ''
+                ) AS todos
+            """)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        nomes = {}
+        for row in rows:
+            nomes.setdefault(dobrar_texto(row["titular"]), row["titular"])
+        return nomes
+
+    def snapshot(self):
+        """Retorna (corpo_json, etag) da lista atual, recarregando se necessário."""
+        with self._lock:
+            vencido = self._carregado_em is None or time.monotonic() - self._carregado_em >= RECARGA_TTL
+            if self._nomes is None or vencido:
+                self._nomes = self._carregar()
+                self._carregado_em = time.monotonic()
+                self._corpo = None
+            if self._corpo is None:
+                ordenados = sorted(self._nomes.items())
+                # Formato da resposta: { id: NOME, nome: NOME }
+                self._corpo = json.dumps(
+                    [{"id": nome, "nome": nome} for _, nome in ordenados],
+                    ensure_ascii=False,
+                ).encode("utf-8")
+                self._etag = hashlib.sha1(self._corpo).hexdigest()
+            return self._corpo, self._etag
+
+    def adicionar(self, titular):
+        """Inclui um titular recém-gravado (formulario ou fornecedor)."""
+        titular = (titular or "").strip()
+        if not titular:
+            return
+        with self._lock:
+            if self._nomes is None:
+                return
+            chave = dobrar_texto(titular)
+            if chave not in self._nomes:
+                self._nomes[chave] = titular
+                self._corpo = None
+
+    def invalidar(self):
+        """Recarrega na próxima leitura (ex.: após exclusões, que podem remover nomes)."""
+        with self._lock:
+            self._nomes = None
+            self._corpo = None
+
+
+indice_titulares = IndiceTitulares()
+catalogo_titulares = CatalogoTitulares()
+
+
+def aquecer_indice_titulares():
+    """Carrega o índice em segundo plano (chamado na inicialização do app)."""
+    def _carregar():
+        try:
+            # Mesmo caminho das buscas: se uma busca já começou a carga, não carrega de novo
+            indice_titulares._garantir_carregado()
+        except Exception as e:
+            print(f"⚠️ Índice de titulares não carregado na inicialização: {e}", file=sys.stderr, flush=True)
+
+    threading.Thread(target=_carregar, name="indice-titulares", daemon=True).start()
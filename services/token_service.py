@@ -0,0 +1,208 @@
+"""
+Tokens assinados (HMAC-SHA256) com os dados do usuário embutidos.
+
+Formato: "v1.<payload base64url>.<assinatura base64url>", com payload
+{uid, usr, role, nome, ver, exp, jti}. A verificação é feita no próprio
+processo, sem consultar o banco a cada requisição:
+
+    - assinatura e expiração (exp)
+    - revogação (logout): lista revoked_tokens, relida a cada revogados_ttl segundos
+    - versão do usuário: users.token_version em cache por versao_ttl segundos;
+      alterar ou remover o usuário incrementa a versão e invalida os tokens antigos
+
+A chave vem só de TOKEN_SECRET (sem valor padrão). Sem ela, config.py usa o
+formato "sessao", nenhum token v1. é aceito e emitir_token lança
+SegredoAusenteError.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime
+from config import TOKEN_CONFIG
+from db import get_connection
+from services.cache_service import TTLCache
+
+PREFIXO = "v1."
+
+_versoes = TTLCache(ttl=TOKEN_CONFIG["versao_ttl"], max_items=10000)  # uid -> token_version (None = removido)
+_revogados = frozenset()
+_revogados_em = 0.0
+_revogados_lock = threading.Lock()
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode("ascii")
+
+
+def _unb64(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+class SegredoAusenteError(RuntimeError):
+    """TOKEN_SECRET não configurado: tokens assinados não podem ser emitidos."""
+
+
+def _assinar(conteudo):
+    segredo = TOKEN_CONFIG["secret"]
+    if not segredo:
+        raise SegredoAusenteError("TOKEN_SECRET não configurado")
+    return hmac.new(segredo.encode("utf-8"), conteudo.encode("ascii"), hashlib.sha256).digest()
+
+
+def eh_token_assinado(token):
+    return bool(token) and token.startswith(PREFIXO)
+
+
+def emitir_token(user, versao=None):
+    """Token assinado para o usuário (dict com id, username, role, nome)."""
+    if versao is None:
+        versao = versao_usuario(user["id"]) or 0
+    payload = {
+        "uid": user["id"],
+        "usr": user["username"],
+        "role": user["role"],
+        "nome": user.get("nome") or "",
+        "ver": versao,
+        "exp": int(time.time()) + TOKEN_CONFIG["ttl"],
+        "jti": secrets.token_hex(16),
+    }
+    corpo = PREFIXO + _b64(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return corpo + "." + _b64(_assinar(corpo))
+
+
+def decodificar_token(token):
+    """Payload se a assinatura confere e o token não expirou; senão None (sem checar revogação/versão)."""
+    # Sem segredo nenhum token assinado é aceito
+    if not eh_token_assinado(token) or not TOKEN_CONFIG["secret"]:
+        return None
+    corpo, _, assinatura = token.rpartition(".")
+    try:
+        if not hmac.compare_digest(_unb64(assinatura), _assinar(corpo)):
+            return None
+        payload = json.loads(_unb64(corpo[len(PREFIXO):]))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get("exp", 0) <= time.time():
+        return None
+    return payload
+
+
+def verificar_token(token):
+    """
+    Retorna o usuário {id, username, role, nome} do token, ou None se for
+    inválido, expirado, revogado ou de uma versão anterior do usuário.
+    """
+    payload = decodificar_token(token)
+    if payload is None:
+        return None
+    if payload.get("jti") in tokens_revogados():
+        return None
+    if payload.get("ver") != versao_usuario(payload.get("uid")):
+        return None
+    return {
+        "id": payload["uid"],
+        "username": payload["usr"],
+        "role": payload["role"],
+        "nome": payload.get("nome", ""),
+    }
+
+
+# ===========================
+# VERSÃO DO USUÁRIO
+# ===========================
+def versao_usuario(user_id):
+    """users.token_version (em cache); None se o usuário não existe."""
+    def _carregar():
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT token_version FROM users WHERE id = %s", (user_id,))
+            row = cursor.fetchone()
+            return row["token_version"] if row else None
+        finally:
+            cursor.close()
+            conn.close()
+
+    return _versoes.get_or_load(user_id, _carregar)
+
+
+def incrementar_versao(user_id, cursor=None):
+    """
+    Invalida todos os tokens do usuário. Com `cursor`, roda na transação de
+    quem chama (o commit fica com ele).
+    """
+    sql = "UPDATE users SET token_version = token_version + 1 WHERE id = %s"
+    if cursor is not None:
+        cursor.execute(sql, (user_id,))
+    else:
+        conn = get_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, (user_id,))
+            conn.commit()
+        finally:
+            cur.close()
+            conn.close()
+    _versoes.invalidate(user_id)
+
+
+def esquecer_versao(user_id):
+    """Descarta a versão em cache (ex.: usuário removido)."""
+    _versoes.invalidate(user_id)
+
+
+# ===========================
+# REVOGAÇÃO (logout)
+# ===========================
+def tokens_revogados():
+    """jtis revogados e ainda não expirados (relidos a cada revogados_ttl segundos)."""
+    global _revogados, _revogados_em
+
+    if time.monotonic() - _revogados_em < TOKEN_CONFIG["revogados_ttl"]:
+        return _revogados
+
+    with _revogados_lock:
+        if time.monotonic() - _revogados_em < TOKEN_CONFIG["revogados_ttl"]:
+            return _revogados
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT jti FROM revoked_tokens WHERE expires_at > %s", (datetime.utcnow(),))
+                _revogados = frozenset(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.close()
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar tokens revogados: {e}", file=sys.stderr, flush=True)
+        _revogados_em = time.monotonic()
+        return _revogados
+
+
+def revogar_token(token):
+    """Revoga um token assinado até a sua expiração."""
+    global _revogados
+
+    payload = decodificar_token(token)
+    if payload is None:
+        return
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM revoked_tokens WHERE expires_at <= %s", (datetime.utcnow(),))
+        cursor.execute(
+            "INSERT IGNORE INTO revoked_tokens (jti, expires_at) VALUES (%s, %s)",
+            (payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    with _revogados_lock:
+        _revogados = _revogados | {payload["jti"]}
@@ -0,0 +1,480 @@
+"""
+Fila de uploads de anexos para o Google Drive.
+
+POST /formulario/<id>/upload-anexos só grava os arquivos recebidos em disco
+(staging) e agenda um job; o envio ao Drive, com novas tentativas e backoff
+exponencial para erros temporários, roda em segundo plano. Ao terminar, o job
+acrescenta os novos arquivos à lista de formulario.link_anexo e apaga o staging.
+
+Cada lançamento tem uma única pasta no Drive (tabela formulario_drive_pastas),
+criada no primeiro upload e reaproveitada nos seguintes.
+
+O job sobrevive a um restart: cada diretório de staging tem um manifesto
+(job.json) e uma trava de arquivo mantida pelo processo que está enviando.
+Na subida, recuperar_uploads_pendentes() reagenda os diretórios cuja trava
+ficou livre (processo morreu). Cada arquivo leva no Drive uma chave própria
+(appProperties), então o que já tinha sido enviado não é criado de novo.
+"""
+
+import json
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+from config import UPLOAD_CONFIG
+from db import get_connection
+from services.google_drive_service import (
+    create_folder,
+    upload_file_to_drive,
+    buscar_arquivo,
+    link_do_arquivo,
+    executar_em_paralelo,
+    tornar_publicos,
+)
+from services.cache_service import TTLCache
+from services.job_service import JobManager
+
+# Status HTTP do Drive que valem nova tentativa
+STATUS_TEMPORARIOS = (408, 429, 500, 502, 503, 504)
+
+# Staging: manifesto do job, trava do processo que envia e appProperty do arquivo no Drive
+MANIFESTO = "job.json"
+TRAVA = ".trava"
+PROPRIEDADE_UPLOAD = "gerenciaobra_upload"
+# Diretórios sem manifesto (requisição que falhou no meio) mais velhos que isso são apagados
+STAGING_ABANDONADO = 24 * 3600
+
+# formulario_id -> folder_id (na frente da tabela formulario_drive_pastas)
+_pastas_cache = TTLCache(ttl=3600, max_items=4096)
+_pastas_lock = threading.Lock()
+
+upload_jobs = JobManager(
+    max_workers=UPLOAD_CONFIG["workers"],
+    retencao=UPLOAD_CONFIG["job_retention"],
+    nome="upload",
+)
+
+
+def _staging_dir():
+    return UPLOAD_CONFIG["staging_dir"] or os.path.join(tempfile.gettempdir(), "gerenciaobra_uploads")
+
+
+# ===========================
+# STAGING EM DISCO
+# ===========================
+def preparar_arquivos(files, form_id):
+    """
+    Grava os arquivos da requisição (FileStorage) num diretório próprio do job.
+
+    Returns:
+        (diretorio, [{"caminho", "nome", "mimetype", "chave"}])
+    """
+    nome_diretorio = f"{form_id}_{uuid.uuid4().hex}"
+    diretorio = os.path.join(_staging_dir(), nome_diretorio)
+    os.makedirs(diretorio, exist_ok=True)
+    arquivos = []
+    try:
+        for idx, file in enumerate(files):
+            if not file or not file.filename:
+                continue
+            # Prefixo com o índice: dois arquivos com o mesmo nome não se sobrescrevem
+            caminho = os.path.join(diretorio, f"{idx:03d}_{secure_filename(file.filename) or 'arquivo'}")
+            file.save(caminho)
+            arquivos.append({
+                "caminho": caminho,
+                "nome": file.filename,
+                "mimetype": file.mimetype,
+                # Identifica o arquivo no Drive (ver _enviar_com_retentativas)
+                "chave": f"{nome_diretorio}_{idx}",
+            })
+    except Exception:
+        shutil.rmtree(diretorio, ignore_errors=True)
+        raise
+    return diretorio, arquivos
+
+
+def _travar(diretorio):
+    """
+    Trava exclusiva (não bloqueante) do diretório de staging. Retorna o arquivo
+    da trava, que a mantém enquanto estiver aberto — o sistema a libera se o
+    processo morrer —, ou None se outro processo já a tem.
+    """
+    try:
+        trava = open(os.path.join(diretorio, TRAVA), "a+b")
+    except OSError:
+        return None
+    try:
+        if fcntl is not None:
+            fcntl.flock(trava.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            trava.seek(0)
+            msvcrt.locking(trava.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        trava.close()
+        return None
+    return trava
+
+
+def _gravar_manifesto(diretorio, form_id, obra_id, arquivos):
+    dados = {
+        "form_id": form_id,
+        "obra_id": obra_id,
+        "arquivos": [
+            {"arquivo": os.path.basename(a["caminho"]), "nome": a["nome"], "mimetype": a["mimetype"], "chave": a["chave"]}
+            for a in arquivos
+        ],
+    }
+    temporario = os.path.join(diretorio, MANIFESTO + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f)
+    os.replace(temporario, os.path.join(diretorio, MANIFESTO))
+
+
+def _ler_manifesto(diretorio):
+    """(form_id, obra_id, arquivos) do manifesto, ou None se não existe mais."""
+    try:
+        with open(os.path.join(diretorio, MANIFESTO), encoding="utf-8") as f:
+            dados = json.load(f)
+    except FileNotFoundError:
+        return None
+    arquivos = [
+        {"caminho": os.path.join(diretorio, a["arquivo"]), "nome": a["nome"], "mimetype": a["mimetype"], "chave": a["chave"]}
+        for a in dados["arquivos"]
+    ]
+    return dados["form_id"], dados["obra_id"], arquivos
+
+
+def _encerrar_staging(diretorio, trava):
+    """Apaga o staging do job. O manifesto sai antes de soltar a trava: nenhum
+    outro processo chega a reagendar um job já terminado."""
+    try:
+        os.remove(os.path.join(diretorio, MANIFESTO))
+    except OSError:
+        pass
+    if trava is not None:
+        trava.close()
+    shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def _abrir(arquivo):
+    """FileStorage sobre o arquivo em staging (mesma interface do upload via request)."""
+    return FileStorage(
+        stream=open(arquivo["caminho"], "rb"),
+        filename=arquivo["nome"],
+        content_type=arquivo["mimetype"],
+    )
+
+
+# ===========================
+# NOVAS TENTATIVAS
+# ===========================
+def erro_temporario(erro):
+    """True para falhas de rede e respostas 408/429/5xx do Drive."""
+    status = getattr(getattr(erro, "resp", None), "status", None)
+    if status is not None:
+        return int(status) in STATUS_TEMPORARIOS
+    return isinstance(erro, (ConnectionError, TimeoutError, socket.timeout))
+
+
+def com_retentativas(operacao, descricao, job=None):
+    """Executa operacao() com backoff exponencial (com jitter) em erros temporários."""
+    tentativas = UPLOAD_CONFIG["max_tentativas"]
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return operacao()
+        except Exception as e:
+            if tentativa == tentativas or not erro_temporario(e):
+                raise
+            espera = min(UPLOAD_CONFIG["backoff_max"], UPLOAD_CONFIG["backoff_base"] * 2 ** (tentativa - 1))
+            espera *= random.uniform(0.5, 1.0)
+            print(
+                f"⚠️ {descricao}: tentativa {tentativa}/{tentativas} falhou ({e}); nova tentativa em {espera:.1f}s",
+                file=sys.stderr, flush=True,
+            )
+            if job is not None:
+                job.atualizar(mensagem=f"{descricao}: nova tentativa em {espera:.0f}s")
+            time.sleep(espera)
+
+
+# ===========================
+# PASTA DO LANÇAMENTO NO DRIVE
+# ===========================
+def _buscar_pasta(form_id):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT folder_id FROM formulario_drive_pastas WHERE formulario_id = %s", (form_id,))
+        row = cursor.fetchone()
+        return row["folder_id"] if row else None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _gravar_pasta(form_id, obra_id, folder_id):
+    """Grava a pasta se ainda não houver uma; retorna a que ficou registrada."""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            INSERT IGNORE INTO formulario_drive_pastas (formulario_id, obra_id, folder_id)
+            VALUES (%s, %s, %s)
+        """, (form_id, obra_id if isinstance(obra_id, int) else None, folder_id))
+        conn.commit()
+        cursor.execute("SELECT folder_id FROM formulario_drive_pastas WHERE formulario_id = %s", (form_id,))
+        row = cursor.fetchone()
+        return row["folder_id"] if row else folder_id
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def pasta_do_formulario(form_id, obra_id, job=None):
+    """
+    Retorna (folder_id, reaproveitada): a pasta já registrada do lançamento
+    ou uma nova, criada no Drive e registrada em formulario_drive_pastas.
+    """
+    folder_id = _pastas_cache.get(form_id)
+    if folder_id:
+        return folder_id, True
+
+    # Um lock por processo evita duas pastas para o mesmo lançamento em uploads simultâneos
+    with _pastas_lock:
+        folder_id = _buscar_pasta(form_id)
+        if folder_id:
+            _pastas_cache.set(form_id, folder_id)
+            return folder_id, True
+
+        folder_name = f"Lançamento_{form_id}_Obra_{obra_id}"
+        criada = com_retentativas(lambda: create_folder(folder_name), "Criar pasta", job)
+        folder_id = _gravar_pasta(form_id, obra_id, criada)
+        _pastas_cache.set(form_id, folder_id)
+        return folder_id, False
+
+
+def esquecer_pasta(form_id):
+    """Remove o registro da pasta (ex.: pasta apagada no Drive)."""
+    _pastas_cache.invalidate(form_id)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM formulario_drive_pastas WHERE formulario_id = %s", (form_id,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _pasta_inexistente(erro):
+    return getattr(getattr(erro, "resp", None), "status", None) in (404, "404")
+
+
+# ===========================
+# JOB DE UPLOAD
+# ===========================
+def _enviar_arquivo(arquivo, folder_id):
+    file = _abrir(arquivo)
+    try:
+        return upload_file_to_drive(
+            file, arquivo["nome"], folder_id, tornar_publico=False,
+            propriedades={PROPRIEDADE_UPLOAD: arquivo["chave"]},
+        )
+    finally:
+        file.close()
+
+
+def _enviar_com_retentativas(job, arquivo, folder_id, verificar=False):
+    """
+    Envia um arquivo com novas tentativas. Depois de uma falha (ou num job
+    recuperado, verificar=True) procura antes o arquivo pela chave na pasta:
+    a resposta do create pode ter se perdido com o arquivo já criado.
+    """
+    tentativas = []
+
+    def _operacao():
+        if verificar or tentativas:
+            existente = buscar_arquivo(folder_id, PROPRIEDADE_UPLOAD, arquivo["chave"])
+            if existente:
+                return existente
+        tentativas.append(arquivo["chave"])
+        return _enviar_arquivo(arquivo, folder_id)
+
+    return com_retentativas(_operacao, f"Upload de {arquivo['nome']}", job)
+
+
+def _enviar_todos(job, arquivos, folder_id, verificar=False):
+    """Envia os arquivos em paralelo, cada um com as próprias novas tentativas."""
+    def _tarefa(arquivo):
+        resultado = _enviar_com_retentativas(job, arquivo, folder_id, verificar)
+        job.avancar()
+        return resultado
+
+    return executar_em_paralelo([lambda a=arquivo: _tarefa(a) for arquivo in arquivos])
+
+
+def executar_upload(job, form_id, obra_id, diretorio, arquivos, trava=None, recuperado=False):
+    """
+    Corpo do job: obtém a pasta, envia os arquivos e atualiza formulario.link_anexo.
+    recuperado=True (job reagendado após um restart) confere no Drive o que já
+    tinha sido enviado antes de enviar.
+    """
+    try:
+        job.atualizar(processados=0, total=len(arquivos), mensagem="Obtendo pasta no Drive")
+        folder_id, reaproveitada = pasta_do_formulario(form_id, obra_id, job)
+
+        job.atualizar(mensagem=f"Enviando {len(arquivos)} arquivo(s)")
+        resultados = _enviar_todos(job, arquivos, folder_id, verificar=recuperado)
+
+        # Pasta registrada mas apagada no Drive: cria outra e reenvia o que falhou
+        if reaproveitada and any(_pasta_inexistente(erro) for _, erro in resultados):
+            print(f"⚠️ Pasta {folder_id} do formulário {form_id} não existe mais; criando outra",
+                  file=sys.stderr, flush=True)
+            esquecer_pasta(form_id)
+            folder_id, _ = pasta_do_formulario(form_id, obra_id, job)
+            pendentes = [i for i, (_, erro) in enumerate(resultados) if erro is not None]
+            novos = _enviar_todos(job, [arquivos[i] for i in pendentes], folder_id)
+            for i, resultado in zip(pendentes, novos):
+                resultados[i] = resultado
+
+        enviados = [resultado for resultado, erro in resultados if erro is None]
+        falhas = [(arquivo["nome"], erro) for arquivo, (_, erro) in zip(arquivos, resultados) if erro is not None]
+
+        # Permissões públicas numa requisição batch
+        com_retentativas(lambda: tornar_publicos([r["id"] for r in enviados]), "Tornar públicos", job)
+
+        novos_links = [link_do_arquivo(resultado) for resultado in enviados]
+        upload_links = salvar_links(form_id, novos_links) if novos_links else []
+        if falhas:
+            # O que foi enviado já está salvo; o job fica marcado com erro
+            nomes = ", ".join(f"{nome} ({erro})" for nome, erro in falhas)
+            raise RuntimeError(f"Falha no upload de {len(falhas)} arquivo(s): {nomes}")
+
+        job.atualizar(mensagem="Upload concluído")
+        return {"form_id": form_id, "folder_id": folder_id, "files": novos_links, "anexos": upload_links}
+    finally:
+        _encerrar_staging(diretorio, trava)
+
+
+def _anexos_existentes(valor):
+    """Lista atual de formulario.link_anexo (JSON; links legados em texto viram um item)."""
+    if not valor:
+        return []
+    try:
+        anexos = json.loads(valor)
+    except (TypeError, ValueError):
+        return [{"name": "Anexo", "link": valor, "download": valor, "drive_id": None}]
+    if isinstance(anexos, dict):
+        return [anexos]
+    return anexos if isinstance(anexos, list) else []
+
+
+def salvar_links(form_id, novos_links):
+    """
+    Acrescenta os novos arquivos à lista de formulario.link_anexo (sem repetir
+    drive_id) e retorna a lista completa gravada.
+    """
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # FOR UPDATE: dois uploads do mesmo lançamento não perdem os links um do outro
+        cursor.execute("SELECT link_anexo FROM formulario WHERE id = %s FOR UPDATE", (form_id,))
+        row = cursor.fetchone()
+        anexos = _anexos_existentes(row["link_anexo"] if row else None)
+
+        vistos = {anexo.get("drive_id") for anexo in anexos if isinstance(anexo, dict) and anexo.get("drive_id")}
+        for link in novos_links:
+            if link["drive_id"] not in vistos:
+                vistos.add(link["drive_id"])
+                anexos.append(link)
+
+        cursor.execute(
+            "UPDATE formulario SET link_anexo = %s WHERE id = %s",
+            (json.dumps(anexos), form_id)
+        )
+        conn.commit()
+        return anexos
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def agendar_upload(form_id, obra_id, files):
+    """Grava os arquivos em staging e agenda o envio. Retorna o Job (ou None se não houver arquivos)."""
+    diretorio, arquivos = preparar_arquivos(files, form_id)
+    if not arquivos:
+        shutil.rmtree(diretorio, ignore_errors=True)
+        return None
+    # Trava antes do manifesto: um diretório com manifesto e trava livre é órfão
+    trava = _travar(diretorio)
+    try:
+        _gravar_manifesto(diretorio, form_id, obra_id, arquivos)
+    except Exception:
+        _encerrar_staging(diretorio, trava)
+        raise
+    return upload_jobs.submit("upload_anexos", executar_upload, form_id, obra_id, diretorio, arquivos, trava)
+
+
+def recuperar_uploads_pendentes():
+    """
+    Reagenda os uploads que ficaram no staging quando o processo que os
+    enviava parou (ex.: restart do pm2 com a fila cheia). Diretórios com a
+    trava em uso são de outro processo e ficam como estão. Retorna os jobs.
+    """
+    base = _staging_dir()
+    try:
+        nomes = sorted(os.listdir(base))
+    except OSError:
+        return []
+
+    jobs = []
+    for nome in nomes:
+        diretorio = os.path.join(base, nome)
+        if not os.path.isdir(diretorio):
+            continue
+        if not os.path.exists(os.path.join(diretorio, MANIFESTO)):
+            _apagar_se_abandonado(diretorio)
+            continue
+        trava = _travar(diretorio)
+        if trava is None:
+            continue
+        try:
+            manifesto = _ler_manifesto(diretorio)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Manifesto de upload ilegível em {diretorio}: {e}", file=sys.stderr, flush=True)
+            trava.close()
+            continue
+        if manifesto is None:
+            # Terminou entre o listdir e a trava
+            trava.close()
+            continue
+        form_id, obra_id, arquivos = manifesto
+        print(f"🔁 Reagendando upload de {len(arquivos)} arquivo(s) do formulário {form_id}",
+              file=sys.stderr, flush=True)
+        jobs.append(upload_jobs.submit(
+            "upload_anexos", executar_upload, form_id, obra_id, diretorio, arquivos, trava, True
+        ))
+    return jobs
+
+
+def _apagar_se_abandonado(diretorio):
+    """Staging sem manifesto: requisição que falhou antes de agendar o job."""
+    try:
+        if time.time() - os.path.getmtime(diretorio) > STAGING_ABANDONADO:
+            shutil.rmtree(diretorio, ignore_errors=True)
+    except OSError:
+        pass
@@ -1,14 +1,28 @@
 import uuid
+from config import TOKEN_CONFIG
 from db import get_connection
-
-# Armazenamento simples de tokens em memória (para produção, usar Redis ou Banco)
-active_tokens = {}
+from services.session_service import get_session_store
+from services.obra_service import invalidar_catalogo_obras
+from services.token_service import (
+    eh_token_assinado,
+    emitir_token,
+    verificar_token,
+    revogar_token,
+    incrementar_versao,
+    esquecer_versao,
+)
 
 # ======================================================
 # TOKEN GENERATOR
 # ======================================================
-def generate_token():
-    return uuid.uuid4().hex
+def generate_token(user, versao=None):
+    """
+    Token de acesso do usuário: assinado (TOKEN_CONFIG) ou, no formato
+    "sessao", uma sessão do store (SESSION_CONFIG).
+    """
+    if TOKEN_CONFIG["formato"] == "assinado":
+        return emitir_token(user, versao)
+    return get_session_store().criar(user["id"])
 
 # ======================================================
 # REGISTER USER (Criação)
@@ -57,19 +71,7 @@ def register_user(username, password, role="user", obras_names=[], nome=None):
                 cursor.execute("INSERT INTO users_obras (user_id, obra_id) VALUES (%s, %s)", (user_id, obra['id']))
 
         conn.commit()
-
-        # Gera token e loga automaticamente
-        token = generate_token()
-        active_tokens[token] = user_id
-
-        return {
-            "id": user_id,
-            "username": username,
-            "nome": nome or "",
-            "role": role,
-            "token": token,
-            "obras": obras_names
-        }, None
+        invalidar_catalogo_obras()
 
     except Exception as e:
         conn.rollback() # Desfaz tudo se der erro
@@ -79,6 +81,26 @@ def register_user(username, password, role="user", obras_names=[], nome=None):
         cursor.close()
         conn.close()
 
+    # Gera token e loga automaticamente. Fora do try acima: o usuário já está
+    # gravado, e uma falha aqui (ex.: sessão no MySQL) só fica sem login automático
+    try:
+        token = generate_token(
+            {"id": user_id, "username": username, "role": role, "nome": nome or ""},
+            versao=0,
+        )
+    except Exception as e:
+        print("Erro ao gerar token no register_user:", e)
+        token = None
+
+    return {
+        "id": user_id,
+        "username": username,
+        "nome": nome or "",
+        "role": role,
+        "token": token,
+        "obras": obras_names
+    }, None
+
 # ======================================================
 # UPDATE USER (Edição)
 # ======================================================
@@ -90,6 +112,11 @@ def update_user_service(user_id, username, role, obras_names, password=None, nom
     username = username.upper() if username else username
 
     try:
+        # Tokens carregam username/role/nome: se mudarem, os tokens antigos deixam de valer
+        cursor.execute("SELECT username, role, nome FROM users WHERE id = %s", (user_id,))
+        atual = cursor.fetchone()
+        muda_token = bool(password) or atual is None or tuple(atual) != (username, role, nome or "")
+
         # 1. Atualiza dados básicos (Senha é opcional)
         if password:
             cursor.execute("UPDATE users SET username=%s, role=%s, password_hash=%s, nome=%s WHERE id=%s", (username, role, password, nome or "", user_id))
@@ -108,7 +135,13 @@ def update_user_service(user_id, username, role, obras_names, password=None, nom
             for oid in obras_ids:
                 cursor.execute("INSERT INTO users_obras (user_id, obra_id) VALUES (%s, %s)", (user_id, oid))
         
+        if muda_token:
+            incrementar_versao(user_id, cursor)
+
         conn.commit()
+        invalidar_catalogo_obras()
+        if muda_token:
+            esquecer_versao(user_id)
         return True, None
 
     except Exception as e:
@@ -130,7 +163,7 @@ def authenticate(username, password):
     username = username.upper()
 
     cursor.execute("""
-        SELECT id, username, password_hash, role, nome
+        SELECT id, username, password_hash, role, nome, token_version
         FROM users
         WHERE username = %s
     """, (username,))
@@ -145,15 +178,19 @@ def authenticate(username, password):
     if password != user["password_hash"]:
         return None, "Senha incorreta"
 
-    token = generate_token()
-    active_tokens[token] = user["id"]
+    token = generate_token(user, versao=user.pop("token_version"))
     
     # Injeta o token no objeto de retorno
     user["token"] = token
     return user, None
 
 def get_user_by_token(token):
-    user_id = active_tokens.get(token)
+    # Token assinado: validado no próprio processo, sem consulta por requisição
+    if eh_token_assinado(token):
+        return verificar_token(token)
+
+    # Token opaco (sessão / legado)
+    user_id = get_session_store().obter(token)
     if not user_id:
         return None
     
@@ -163,4 +200,19 @@ def get_user_by_token(token):
     user = cursor.fetchone()
     cursor.close()
     conn.close()
-    return user
\ No newline at end of file
+    return user
+
+def logout(token):
+    """Revoga o token (encerra a sessão)."""
+    if eh_token_assinado(token):
+        revogar_token(token)
+    else:
+        get_session_store().revogar(token)
+
+
+def revoke_user_sessions(user_id):
+    """Encerra todas as sessões do usuário (ex.: usuário removido)."""
+    get_session_store().revogar_usuario(user_id)
+    # Usuário removido não tem versão: tokens assinados dele passam a ser recusados
+    esquecer_versao(user_id)
+    invalidar_catalogo_obras()
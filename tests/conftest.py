@@ -0,0 +1,7 @@
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for caminho in (RAIZ, os.path.dirname(os.path.abspath(__file__))):
+    if caminho not in sys.path:
+        sys.path.insert(0, caminho)
@@ -0,0 +1,71 @@
+"""
+Conexão/cursor falsos para testar services sem MySQL.
+
+FakeConnection responde às consultas com `respostas`: lista de pares
+(trecho_do_sql, linhas). A primeira entrada cujo trecho aparece no SQL
+executado define o resultado; tudo que foi executado fica em `executados`.
+"""
+
+
+class FakeCursor:
+    def __init__(self, conn, dictionary=False):
+        self.conn = conn
+        self.dictionary = dictionary
+        self._linhas = []
+        self.lastrowid = None
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.conn.executados.append((sql, params))
+        if self.conn.erro is not None:
+            raise self.conn.erro
+        self._linhas = []
+        for trecho, linhas in self.conn.respostas:
+            if trecho in sql:
+                self._linhas = [dict(l) for l in (linhas(params) if callable(linhas) else linhas)]
+                break
+        self.rowcount = len(self._linhas)
+
+    def _formatar(self, linha):
+        return linha if self.dictionary else tuple(linha.values())
+
+    def fetchall(self):
+        linhas, self._linhas = self._linhas, []
+        return [self._formatar(l) for l in linhas]
+
+    def fetchone(self):
+        if not self._linhas:
+            return None
+        return self._formatar(self._linhas.pop(0))
+
+    def fetchmany(self, tamanho):
+        lote, self._linhas = self._linhas[:tamanho], self._linhas[tamanho:]
+        return [self._formatar(l) for l in lote]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, respostas=None, erro=None):
+        self.respostas = list(respostas or [])
+        self.erro = erro
+        self.executados = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.fechada = False
+
+    def cursor(self, dictionary=False, **kwargs):
+        return FakeCursor(self, dictionary)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.fechada = True
+
+    def sqls(self):
+        return [sql for sql, _ in self.executados]
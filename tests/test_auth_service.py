@@ -0,0 +1,92 @@
+"""Middleware de autenticação e decorators requires_auth / requires_role."""
+import pytest
+from flask import Flask, jsonify
+
+from services import auth_service
+
+USUARIOS = {
+    "token-admin": {"id": 1, "username": "ADMIN", "role": "admin", "nome": "Admin"},
+    "token-user": {"id": 2, "username": "ANA", "role": "user", "nome": "Ana"},
+}
+
+
+@pytest.fixture
+def estado(monkeypatch):
+    estado = {"fora_do_ar": False, "consultas": 0}
+
+    def _get_user_by_token(token):
+        estado["consultas"] += 1
+        if estado["fora_do_ar"]:
+            raise ConnectionError("MySQL fora do ar")
+        return USUARIOS.get(token)
+
+    monkeypatch.setattr(auth_service, "get_user_by_token", _get_user_by_token)
+    auth_service.invalidar_usuarios()
+    return estado
+
+
+@pytest.fixture
+def client(estado):
+    app = Flask(__name__)
+    auth_service.init_auth(app)
+
+    @app.route("/logado", methods=["GET", "OPTIONS"])
+    @auth_service.requires_auth
+    def logado():
+        return jsonify(auth_service.usuario_atual()), 200
+
+    @app.route("/admin", methods=["GET", "OPTIONS"])
+    @auth_service.requires_role("admin")
+    def admin():
+        return jsonify({"ok": True}), 200
+
+    @app.route("/publica")
+    def publica():
+        return jsonify({"user": auth_service.usuario_atual()}), 200
+
+    return app.test_client()
+
+
+def _get(client, rota, token=None, metodo="GET"):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return client.open(rota, method=metodo, headers=headers)
+
+
+def test_sem_token_e_token_invalido_sao_401(client):
+    assert _get(client, "/logado").get_json()["error"] == "Token faltando"
+    resposta = _get(client, "/admin", "token-falso")
+    assert resposta.status_code == 401
+    assert resposta.get_json()["error"] == "Token inválido"
+
+
+def test_perfil_sem_permissao_e_403(client):
+    assert _get(client, "/admin", "token-user").status_code == 403
+    assert _get(client, "/admin", "token-admin").status_code == 200
+    assert _get(client, "/logado", "token-user").get_json()["username"] == "ANA"
+
+
+def test_preflight_passa_sem_token(client):
+    assert _get(client, "/admin", metodo="OPTIONS").status_code == 200
+
+
+def test_falha_ao_validar_e_503_e_nao_401(client, estado):
+    estado["fora_do_ar"] = True
+
+    assert _get(client, "/logado", "token-user").status_code == 503
+    assert _get(client, "/admin", "token-admin").status_code == 503
+    # Rotas sem login continuam respondendo
+    assert _get(client, "/publica", "token-user").get_json() == {"user": None}
+
+    # A falha não fica em cache: o banco voltou, o login volta
+    estado["fora_do_ar"] = False
+    assert _get(client, "/logado", "token-user").status_code == 200
+
+
+def test_usuario_em_cache_ate_invalidar(client, estado):
+    _get(client, "/logado", "token-user")
+    _get(client, "/logado", "token-user")
+    assert estado["consultas"] == 1
+
+    auth_service.invalidar_usuarios("token-user")
+    _get(client, "/logado", "token-user")
+    assert estado["consultas"] == 2
@@ -0,0 +1,52 @@
+import pytest
+
+import backfill_formulario_obras as backfill
+from fakes import FakeConnection
+
+
+def _registro(id_, obra, valor, **campos):
+    base = {campo: None for campo in backfill.CAMPOS_DO_LANCAMENTO}
+    base.update(referente="Material", lancado="N", data_pagamento="2025-01-10")
+    base.update(campos)
+    return dict(base, id=id_, obra=obra, valor=valor, grupo_id=7)
+
+
+def _conn(vinculos=0, obras=0, historico=()):
+    return FakeConnection([
+        ("FROM formulario_vinculos", [{"total": vinculos}]),
+        ("FROM formulario_obras", [{"total": obras}]),
+        ("SELECT DISTINCT exportacao_id", list(historico)),
+    ])
+
+
+def test_grupo_com_campos_diferentes_nao_e_convertido():
+    registros = [_registro(1, 10, 100), _registro(2, 20, 50, lancado="P", referente="Frete")]
+    conn = _conn()
+    cursor = conn.cursor(dictionary=True)
+
+    assert backfill.motivo_para_manter(cursor, registros) == "registros diferem em referente, lancado"
+    with pytest.raises(ValueError):
+        backfill.converter_grupo(cursor, registros)
+    assert not any(sql.lstrip().startswith(("DELETE", "INSERT", "UPDATE")) for sql in conn.sqls())
+
+
+def test_irmao_com_vinculos_nao_e_convertido():
+    registros = [_registro(1, 10, 100), _registro(2, 20, 50)]
+    cursor = _conn(vinculos=1).cursor(dictionary=True)
+    assert "formulario_vinculos" in backfill.motivo_para_manter(cursor, registros)
+
+
+def test_converte_e_move_historico_sem_duplicar():
+    registros = [_registro(1, 10, 100), _registro(2, 20, 50), _registro(3, 30, 25)]
+    conn = _conn(historico=[
+        {"exportacao_id": 100, "do_principal": 1},  # principal e irmão na mesma exportação
+        {"exportacao_id": 100, "do_principal": 0},
+        {"exportacao_id": 200, "do_principal": 0},  # só irmãos
+    ])
+    assert backfill.converter_grupo(conn.cursor(dictionary=True), registros) == 2
+
+    inseridos = [p for sql, p in conn.executados if "INSERT INTO historico_exportacoes_itens" in sql]
+    assert inseridos == [(200, 1)]
+    obras = [p for sql, p in conn.executados if "INSERT INTO formulario_obras" in sql]
+    assert obras == [(1, 20, 50), (1, 30, 25)]
+    assert ("DELETE FROM formulario WHERE id IN (%s,%s)", (2, 3)) in conn.executados
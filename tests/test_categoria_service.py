@@ -0,0 +1,25 @@
+import pytest
+
+from fakes import FakeConnection
+from services import categoria_service
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection([("FROM categoria", [{"id": 1, "nome": "Material"}, {"id": 2, "nome": "Frete"}])])
+    monkeypatch.setattr(categoria_service, "get_connection", lambda: conn)
+    return conn
+
+
+def test_uma_consulta_para_todos_os_ids(conn):
+    stats = {"consultas": 0}
+    assert categoria_service.buscar_nomes_categorias(["1", 2, 2], stats) == {1: "Material", 2: "Frete"}
+    assert len(conn.executados) == 1
+    assert stats["consultas"] == 1
+
+
+def test_ids_invalidos_nao_consultam_nem_contam(conn):
+    stats = {"consultas": 0}
+    assert categoria_service.buscar_nomes_categorias(["abc", None], stats) == {}
+    assert conn.executados == []
+    assert stats["consultas"] == 0
@@ -0,0 +1,79 @@
+import mysql.connector
+import pytest
+
+import db
+
+
+class RawFalsa:
+    def __init__(self):
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.fechada = False
+
+    def consume_results(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.fechada = True
+
+    def cursor(self, **kwargs):
+        return "cursor"
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    criadas = []
+
+    def _connect():
+        raw = RawFalsa()
+        criadas.append(raw)
+        return raw
+
+    monkeypatch.setattr(db, "_connect", _connect)
+    p = db.ConnectionPool(size=2, timeout=0.05)
+    p.criadas = criadas
+    return p
+
+
+def test_close_devolve_e_reaproveita_a_conexao(pool):
+    conn = pool.get()
+    raw = conn._raw
+    conn.close()
+
+    outra = pool.get()
+    assert outra._raw is raw
+    assert len(pool.criadas) == 1
+    assert pool.stats()["reused"] == 1
+
+
+def test_devolucao_encerra_transacao_aberta(pool):
+    conn = pool.get()
+    conn._raw.in_transaction = True
+    conn.close()
+    assert pool.criadas[0].rollbacks == 1
+
+
+def test_uso_apos_close_nao_alcanca_a_conexao_real(pool):
+    conn = pool.get()
+    conn.close()
+    outra = pool.get()  # mesma conexão real, agora com outra "requisição"
+
+    with pytest.raises(mysql.connector.errors.InterfaceError):
+        conn.cursor()
+    conn.rollback()  # no-op: não pode desfazer a transação de `outra`
+    assert outra._raw.rollbacks == 0
+
+
+def test_timeout_com_pool_esgotado(pool):
+    em_uso = [pool.get(), pool.get()]  # referências mantidas: __del__ liberaria a vaga
+    with pytest.raises(db.PoolTimeoutError):
+        pool.get()
+    assert pool.stats()["timeouts"] == 1
+    assert len(em_uso) == 2
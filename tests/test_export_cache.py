@@ -0,0 +1,114 @@
+"""Cache em disco das exportações (X-Export-Cache), com banco falso e cache em tmp_path."""
+import io
+import os
+
+import pytest
+from flask import Flask
+
+from fakes import FakeConnection
+from routes import export_routes
+from services import export_service
+from services.export_cache_service import CacheArquivos
+from test_export_routes import _linha
+
+
+@pytest.fixture
+def assinatura():
+    return {"linhas": 2, "assinatura": 123456789}
+
+
+@pytest.fixture
+def banco(monkeypatch, assinatura):
+    conn = FakeConnection([
+        ("BIT_XOR", lambda params: [dict(assinatura)]),
+        ("FROM formulario f", [_linha(1), _linha(2)]),
+    ])
+    monkeypatch.setattr(export_service, "get_connection", lambda: conn)
+    return conn
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_routes, "export_cache", CacheArquivos(str(tmp_path), 10 ** 8))
+    app = Flask(__name__)
+    app.register_blueprint(export_routes.export_bp)
+    return app.test_client()
+
+
+def _leituras(banco):
+    """Consultas que leram os registros (não a assinatura)."""
+    return [sql for sql, _ in banco.executados if "BIT_XOR" not in sql]
+
+
+def test_registros_do_frontend_miss_e_depois_hit(client, banco):
+    registros = [{"id": 1, "titular": "Fornecedor 1", "valor": 10}, {"id": 2, "titular": "Fornecedor 2", "valor": 20}]
+
+    primeira = client.post("/api/export/xls", json={"registros": registros})
+    assert primeira.status_code == 200
+    assert primeira.headers["X-Export-Cache"] == "MISS"
+
+    segunda = client.post("/api/export/xls", json={"registros": registros})
+    assert segunda.status_code == 200
+    assert segunda.headers["X-Export-Cache"] == "HIT"
+    assert segunda.headers["X-Export-Rows"] == "2"
+    assert segunda.data == primeira.data
+
+    registros[0]["valor"] = 11
+    assert client.post("/api/export/xls", json={"registros": registros}).headers["X-Export-Cache"] == "MISS"
+
+
+def test_hit_por_ids_nao_le_os_registros(client, banco, assinatura):
+    pytest.importorskip("pyarrow")
+    pedido = {"filtros": {"ids": "1,2"}}
+
+    primeira = client.post("/api/export/parquet", json=pedido)
+    assert primeira.status_code == 200
+    assert primeira.headers["X-Export-Cache"] == "MISS"
+    assert len(_leituras(banco)) == 1
+
+    segunda = client.post("/api/export/parquet", json=pedido)
+    assert segunda.headers["X-Export-Cache"] == "HIT"
+    assert segunda.headers["X-Export-Queries"] == "1"
+    assert len(_leituras(banco)) == 1  # só a assinatura foi consultada
+
+    assinatura["assinatura"] = 987654321  # algum lançamento mudou
+    terceira = client.post("/api/export/parquet", json=pedido)
+    assert terceira.headers["X-Export-Cache"] == "MISS"
+    assert len(_leituras(banco)) == 2
+
+
+def test_reexportacao_do_historico_usa_o_cache(client, banco, monkeypatch):
+    monkeypatch.setattr(export_service, "buscar_itens_exportacao", lambda _id: ([1, 2], None))
+
+    primeira = client.post("/api/export/xls", json={"exportacao_id": 7})
+    assert primeira.status_code == 200
+    assert primeira.headers["X-Export-Cache"] == "MISS"
+
+    segunda = client.post("/api/export/xls", json={"exportacao_id": 7})
+    assert segunda.headers["X-Export-Cache"] == "HIT"
+    assert segunda.data == primeira.data
+    assert len(_leituras(banco)) == 1
+
+
+def test_arquivo_descartado_depois_do_get_continua_legivel(tmp_path):
+    cache = CacheArquivos(str(tmp_path), 10 ** 8)
+    cache.put("abc", "xlsx", io.BytesIO(b"planilha"))
+
+    arquivo = cache.get("abc", "xlsx")
+    os.remove(tmp_path / "abc.xlsx")  # descarte LRU de outro processo
+
+    assert arquivo.read() == b"planilha"
+    arquivo.close()
+    assert cache.get("abc", "xlsx") is None
+
+
+def test_gravacao_falha_nao_deixa_tmp(tmp_path, monkeypatch):
+    cache = CacheArquivos(str(tmp_path), 10 ** 8)
+
+    def _falhar(origem, destino):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(os, "replace", _falhar)
+    cache.put("abc", "xlsx", io.BytesIO(b"planilha"))
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,65 @@
+"""Exportação em CSV (streaming) e Parquet/Arrow."""
+import csv
+import io
+import sys
+
+import pytest
+
+from services import export_service
+from services.export_service import HEADERS, FormatoIndisponivelError, gerar_colunar, gerar_csv
+
+REGISTROS = [
+    {"id": i, "titular": f"Fornecedor {i}", "valor": i * 1050, "dataPagamento": "2025-01-10"}
+    for i in range(1, 6)
+]
+
+
+def _ler_csv(blocos, separador):
+    texto = b"".join(blocos).decode("utf-8")
+    return list(csv.reader(io.StringIO(texto.lstrip("\ufeff")), delimiter=separador)), texto
+
+
+def test_csv_padrao_excel_pt_br():
+    linhas, texto = _ler_csv(gerar_csv(REGISTROS, bom=True), ";")
+
+    assert texto.startswith("\ufeff")
+    assert linhas[0] == HEADERS
+    assert len(linhas) == 6
+    assert linhas[1][2] == "10,50"
+
+
+def test_csv_com_virgula_usa_ponto_decimal_e_sai_em_blocos(monkeypatch):
+    monkeypatch.setitem(export_service.EXPORT_CONFIG, "chunk_size", 64)
+    blocos = list(gerar_csv(REGISTROS, separador=","))
+    linhas, texto = _ler_csv(blocos, ",")
+
+    assert not texto.startswith("\ufeff")
+    assert linhas[5][2] == "52.50"
+    assert len(blocos) > 2
+
+
+@pytest.mark.parametrize("formato", ["parquet", "arrow"])
+def test_colunar_em_lotes(monkeypatch, formato):
+    pa = pytest.importorskip("pyarrow")
+    ipc = pytest.importorskip("pyarrow.ipc")
+    parquet = pytest.importorskip("pyarrow.parquet")
+
+    monkeypatch.setattr(export_service, "EXPORT_BATCH_SIZE", 2)
+    arquivo, linhas = gerar_colunar(REGISTROS, formato=formato)
+
+    dados = arquivo.read()
+    if formato == "parquet":
+        tabela = parquet.read_table(pa.BufferReader(dados))
+    else:
+        tabela = ipc.open_file(pa.BufferReader(dados)).read_all()
+    assert linhas == 5
+    assert tabela.column_names == HEADERS
+    assert tabela.column(HEADERS[0]).to_pylist() == [1, 2, 3, 4, 5]
+    assert tabela.column(HEADERS[2]).to_pylist() == [10.5, 21.0, 31.5, 42.0, 52.5]
+
+
+def test_sem_pyarrow_formato_indisponivel(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+    with pytest.raises(FormatoIndisponivelError):
+        gerar_colunar(REGISTROS)
@@ -0,0 +1,75 @@
+import time
+from datetime import date
+
+import pytest
+from flask import Flask
+
+from fakes import FakeConnection
+from routes.export_routes import export_bp
+from services import auth_service, export_service
+from services.export_service import export_jobs
+
+USUARIOS = {
+    "token-ana": {"id": 1, "username": "ANA", "role": "user", "nome": "Ana"},
+    "token-bia": {"id": 2, "username": "BIA", "role": "user", "nome": "Bia"},
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    linha = {
+        "id": 1, "data_pagamento": date(2025, 1, 10), "valor": 1500, "forma_pagamento": "PIX",
+        "titular": "Fornecedor", "cpf_cnpj": None, "chave_pix": None, "categoria": None,
+        "lancado": "N", "observacao": None, "obra_nome": "Obra A", "categoria_nome": "",
+    }
+    conn = FakeConnection([("COUNT(*)", [{"total": 1}]), ("FROM formulario f", [linha])])
+    monkeypatch.setattr(export_service, "get_connection", lambda: conn)
+    monkeypatch.setattr(export_service, "registrar_exportacao", lambda usuario, ids: (99, None))
+    monkeypatch.setattr(auth_service, "get_user_by_token", USUARIOS.get)
+    auth_service.invalidar_usuarios()
+
+    app = Flask(__name__)
+    auth_service.init_auth(app)
+    app.register_blueprint(export_bp)
+    return app.test_client()
+
+
+def _esperar(job_id):
+    limite = time.monotonic() + 5
+    while not export_jobs.get(job_id).terminado:
+        assert time.monotonic() < limite
+        time.sleep(0.01)
+
+
+def _criar_job(client, token, **filtros):
+    resposta = client.post(
+        "/api/export/xls", json={"async": True, "filtros": filtros or {"status": "PENDENTE"}},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert resposta.status_code == 202
+    job_id = resposta.get_json()["job_id"]
+    _esperar(job_id)
+    return job_id
+
+
+def test_download_do_job_pelo_dono(client):
+    job_id = _criar_job(client, "token-ana")
+    resposta = client.get(f"/api/export/jobs/{job_id}/download", headers={"Authorization": "token-ana"})
+    assert resposta.status_code == 200
+    assert resposta.headers["X-Export-Rows"] == "1"
+    assert resposta.headers["X-Exportacao-Id"] == "99"
+
+
+def test_outro_usuario_nao_ve_o_job(client):
+    job_id = _criar_job(client, "token-ana")
+    for url in (f"/api/export/jobs/{job_id}", f"/api/export/jobs/{job_id}/download"):
+        assert client.get(url, headers={"Authorization": "token-bia"}).status_code == 404
+        assert client.get(url).status_code == 404
+
+
+def test_job_com_erro(client, monkeypatch):
+    monkeypatch.setattr(export_service, "gerar_xlsx", lambda *a, **k: 1 / 0)
+    job_id = _criar_job(client, "token-ana")
+    resposta = client.get(f"/api/export/jobs/{job_id}/download", headers={"Authorization": "token-ana"})
+    assert resposta.status_code == 500
+    assert resposta.get_json()["error"]
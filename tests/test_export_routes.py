@@ -0,0 +1,66 @@
+"""Rotas de /api/export com o banco substituído por uma conexão falsa."""
+from datetime import date
+
+import pytest
+from flask import Flask
+
+from fakes import FakeConnection
+from routes.export_routes import export_bp
+from services import export_service
+
+
+def _linha(id_):
+    return {
+        "id": id_, "data_pagamento": date(2025, 1, 10), "valor": 1500, "forma_pagamento": "PIX",
+        "titular": f"Fornecedor {id_}", "cpf_cnpj": None, "chave_pix": None, "categoria": None,
+        "lancado": "N", "observacao": None, "obra_nome": "Obra A", "categoria_nome": "",
+    }
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    conn = FakeConnection([("FROM formulario f", [_linha(1), _linha(2)])])
+    monkeypatch.setattr(export_service, "get_connection", lambda: conn)
+    return conn
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(export_bp)
+    return app.test_client()
+
+
+def test_sem_filtro_nao_exporta_a_tabela_inteira(client, banco):
+    resposta = client.get("/api/export/xls")
+    assert resposta.status_code == 400
+    assert "todos=1" in resposta.get_json()["error"]
+
+    resposta = client.post("/api/export/csv", json={"filtros": {}})
+    assert resposta.status_code == 400
+    assert banco.executados == []
+
+
+def test_filtro_invalido_e_400(client, banco):
+    resposta = client.get("/api/export/xls?obra=abc")
+    assert resposta.status_code == 400
+    assert resposta.get_json()["error"] == "Filtros inválidos"
+
+
+def test_exporta_por_filtro_e_com_todos(client, banco):
+    resposta = client.get("/api/export/xls?status=PENDENTE")
+    assert resposta.status_code == 200
+    assert resposta.headers["X-Export-Rows"] == "2"
+    assert resposta.data[:2] == b"PK"  # .xlsx é um zip
+    assert "f.lancado = %s" in banco.executados[-1][0]
+
+    resposta = client.get("/api/export/csv?todos=1")
+    assert resposta.status_code == 200
+    assert resposta.data.decode("utf-8").count("Fornecedor") == 2
+
+
+def test_erro_de_banco_no_historico_e_500(client, banco, monkeypatch):
+    monkeypatch.setattr(export_service, "buscar_itens_exportacao", lambda _id: (None, "MySQL fora do ar"))
+    resposta = client.post("/api/export/csv", json={"exportacao_id": 5})
+    assert resposta.status_code == 500
+    assert resposta.get_json()["error"] == "MySQL fora do ar"
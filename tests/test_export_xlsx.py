@@ -0,0 +1,56 @@
+"""Planilha XLSX gerada em constant_memory, com limite de linhas e leitura em blocos."""
+import re
+import zipfile
+
+import pytest
+
+from services import export_service
+from services.export_service import LimiteExportacaoError, gerar_xlsx, ler_em_blocos, tamanho_arquivo
+
+
+def _registros(quantidade, lidos):
+    for i in range(1, quantidade + 1):
+        lidos.append(i)
+        yield {"id": i, "titular": f"Fornecedor {i}", "valor": i * 100, "dataPagamento": "2025-01-10"}
+
+
+def _linhas_da_planilha(arquivo):
+    with zipfile.ZipFile(arquivo) as xlsx:
+        xml = xlsx.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    return re.findall(r'<row r="(\d+)"', xml), xml
+
+
+def test_planilha_com_cabecalho_e_uma_linha_por_registro():
+    lidos = []
+    arquivo, ids = gerar_xlsx(_registros(3, lidos))
+
+    linhas, xml = _linhas_da_planilha(arquivo)
+    assert ids == [1, 2, 3]
+    assert linhas == ["1", "2", "3", "4"]
+    # constant_memory grava strings inline (sem tabela de strings compartilhadas)
+    assert "Fornecedor 3" in xml
+    arquivo.close()
+
+
+def test_limite_de_linhas_interrompe_a_leitura(monkeypatch):
+    monkeypatch.setitem(export_service.EXPORT_CONFIG, "max_rows", 2)
+    lidos = []
+
+    with pytest.raises(LimiteExportacaoError):
+        gerar_xlsx(_registros(1000, lidos))
+
+    # Parou no primeiro registro acima do limite, sem ler o resto
+    assert lidos == [1, 2, 3]
+
+
+def test_arquivo_grande_vai_para_disco_e_sai_em_blocos(monkeypatch):
+    monkeypatch.setitem(export_service.EXPORT_CONFIG, "spool_max_memory", 1024)
+    arquivo, _ = gerar_xlsx(_registros(200, []))
+    tamanho = tamanho_arquivo(arquivo)
+
+    assert arquivo._rolled  # passou de spool_max_memory: está em disco
+    blocos = list(ler_em_blocos(arquivo, tamanho_bloco=4096))
+
+    assert sum(len(bloco) for bloco in blocos) == tamanho
+    assert max(len(bloco) for bloco in blocos) == 4096
+    assert arquivo.closed
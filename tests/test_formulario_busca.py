@@ -0,0 +1,37 @@
+from services.formulario_service import montar_filtros, ordem_relevancia, termos_fulltext
+
+
+def _busca(**args):
+    where, params, _ = montar_filtros(args)
+    return where[-1], params
+
+
+def test_padrao_continua_like_por_substring():
+    sql, params = _busca(busca="ilva")
+    assert "LIKE" in sql and "MATCH" not in sql
+    assert params == ["%ilva%", "%ilva%"]
+    assert ordem_relevancia({"busca": "silva", "ordenacao": "relevancia"}) is None
+
+
+def test_indexada_usa_fulltext_e_valor():
+    sql, params = _busca(busca="cimento silva", busca_modo="indexada")
+    assert "MATCH" in sql and params == ["+cimento* +silva*"]
+
+    sql, params = _busca(busca="R$ 1.234,56", busca_modo="indexada")
+    assert (sql, params) == ("f.valor = %s", [123456])
+
+    sql, params = _busca(busca="100..200", busca_modo="indexada")
+    assert (sql, params) == ("f.valor BETWEEN %s AND %s", [10000, 20000])
+
+
+def test_indexada_numero_curto_ainda_casa_texto():
+    sql, params = _busca(busca="50", busca_modo="indexada")
+    assert "f.titular LIKE" in sql and "f.valor = %s" in sql
+    assert 5000 in params and "%50%" in params
+
+
+def test_stopwords_nao_viram_termo_obrigatorio():
+    assert termos_fulltext("cimento com areia") == "+cimento* +areia*"
+    assert termos_fulltext("the") is None  # só stopwords: cai no LIKE
+    sql, _ = _busca(busca="with", busca_modo="indexada")
+    assert "LIKE" in sql
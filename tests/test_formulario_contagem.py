@@ -0,0 +1,55 @@
+import pytest
+
+from fakes import FakeConnection
+from services import formulario_service
+from services.formulario_service import contar_formularios, invalidar_contagens
+
+
+@pytest.fixture(autouse=True)
+def cache_limpo():
+    invalidar_contagens()
+    yield
+    invalidar_contagens()
+
+
+def _cursor(total=42, explain=None):
+    conn = FakeConnection([
+        ("EXPLAIN", explain or []),
+        ("COUNT(*)", [{"total": total}]),
+    ])
+    return conn, conn.cursor(dictionary=True)
+
+
+def test_contagem_exata_fica_em_cache_ate_invalidar():
+    conn, cursor = _cursor()
+    chave = ("1=1", ())
+    assert contar_formularios(cursor, "1=1", [], chave) == (42, False)
+    assert contar_formularios(cursor, "1=1", [], chave) == (42, False)
+    assert len(conn.executados) == 1
+
+    invalidar_contagens()
+    contar_formularios(cursor, "1=1", [], chave)
+    assert len(conn.executados) == 2
+
+
+def test_filtros_diferentes_nao_compartilham_contagem():
+    conn, cursor = _cursor()
+    where, params, chave = formulario_service.montar_filtros({"status": "PAGO"})
+    contar_formularios(cursor, " AND ".join(where), params, chave)
+    where, params, chave = formulario_service.montar_filtros({"status": "PENDENTE"})
+    contar_formularios(cursor, " AND ".join(where), params, chave)
+    assert len(conn.executados) == 2
+
+
+def test_modo_none_nao_consulta():
+    conn, cursor = _cursor()
+    assert contar_formularios(cursor, "1=1", [], ("1=1", ()), "none") == (None, False)
+    assert conn.executados == []
+
+
+def test_modo_estimate_usa_o_plano_e_cai_para_exato_sem_ele():
+    conn, cursor = _cursor(explain=[{"table": "f", "rows": 1000, "filtered": 10.0}])
+    assert contar_formularios(cursor, "1=1", [], ("1=1", ()), "estimate") == (100, True)
+
+    conn, cursor = _cursor(explain=[])
+    assert contar_formularios(cursor, "1=1", [], ("x", ()), "estimate") == (42, False)
@@ -0,0 +1,69 @@
+"""Escopo de obras em GET /formulario: quem vê o quê, incluindo lançamentos múltiplos."""
+import sqlite3
+
+import pytest
+
+from fakes import FakeConnection
+from services import obra_service
+from services.formulario_service import montar_filtros
+
+# id, obra principal
+FORMULARIOS = [(1, 10), (2, 20), (3, 30), (4, 20)]
+# Múltiplos: obras adicionais em formulario_obras
+ADICIONAIS = [(3, 10), (3, 20), (4, 30)]
+
+CATALOGO = [
+    {"id": 10, "nome": "Obra A", "quem_paga": "Empresa", "banco_id": None,
+     "vinculo_user_id": 2, "vinculo_nome": "Ana", "vinculo_username": "ANA"},
+    {"id": 20, "nome": "Obra B", "quem_paga": "Empresa", "banco_id": None,
+     "vinculo_user_id": None, "vinculo_nome": None, "vinculo_username": None},
+    {"id": 30, "nome": "Obra C", "quem_paga": "Cliente", "banco_id": None,
+     "vinculo_user_id": 3, "vinculo_nome": "Bia", "vinculo_username": "BIA"},
+]
+
+
+@pytest.fixture
+def banco():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE formulario (id INTEGER PRIMARY KEY, obra INTEGER)")
+    conn.execute("CREATE TABLE formulario_obras (formulario_id INTEGER, obra_id INTEGER)")
+    conn.executemany("INSERT INTO formulario VALUES (?, ?)", FORMULARIOS)
+    conn.executemany("INSERT INTO formulario_obras VALUES (?, ?)", ADICIONAIS)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def catalogo(monkeypatch):
+    conn = FakeConnection([("FROM obras o", CATALOGO)])
+    monkeypatch.setattr(obra_service, "get_connection", lambda: conn)
+    obra_service.invalidar_catalogo_obras()
+    yield conn
+    obra_service.invalidar_catalogo_obras()
+
+
+def _visiveis(banco, obras_permitidas):
+    where_parts, params, _ = montar_filtros({}, obras_permitidas)
+    sql = f"SELECT f.id FROM formulario f WHERE {' AND '.join(where_parts)} ORDER BY f.id"
+    return [row[0] for row in banco.execute(sql.replace("%s", "?"), params)]
+
+
+def test_escopo_inclui_multiplos_com_a_obra_entre_as_adicionais(banco):
+    assert _visiveis(banco, (10,)) == [1, 3]
+    assert _visiveis(banco, (30,)) == [3, 4]
+    assert _visiveis(banco, (20, 30)) == [2, 3, 4]
+
+
+def test_sem_obras_nao_ve_nada_e_sem_escopo_ve_tudo(banco):
+    assert _visiveis(banco, ()) == []
+    assert _visiveis(banco, None) == [1, 2, 3, 4]
+
+
+def test_obras_visiveis_pelo_perfil(catalogo):
+    assert obra_service.obras_visiveis({"id": 1, "role": "admin"}) is None
+    assert obra_service.obras_visiveis({"id": 1, "role": "financeiro"}) is None
+    assert obra_service.obras_visiveis(None) is None
+    assert obra_service.obras_visiveis({"id": 2, "role": "user"}) == (10,)
+    assert obra_service.obras_visiveis({"id": 9, "role": "user"}) == ()
+    # Catálogo lido uma vez só
+    assert len(catalogo.executados) == 1
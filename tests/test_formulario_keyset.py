@@ -0,0 +1,82 @@
+"""Paginação por cursor: percorrer todas as páginas tem de dar a mesma ordem do ORDER BY."""
+import sqlite3
+from datetime import date
+
+import pytest
+from flask import Flask
+
+from fakes import FakeConnection
+from routes import formulario_routes
+from routes.formulario_routes import _decode_cursor, _encode_cursor, _keyset_condition
+from services.formulario_service import order_clause
+
+LINHAS = [
+    (1, 100, "B"), (2, None, "A"), (3, 100, None), (4, 50, "C"),
+    (5, None, "B"), (6, 300, "A"), (7, 50, None), (8, 100, "C"),
+]
+
+
+@pytest.fixture
+def banco():
+    # SQLite ordena NULL como o MySQL: primeiro em ASC, por último em DESC
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE formulario (id INTEGER PRIMARY KEY, valor INTEGER, titular TEXT)")
+    conn.executemany("INSERT INTO formulario VALUES (?, ?, ?)", LINHAS)
+    yield conn
+    conn.close()
+
+
+def _paginar(banco, ordenacao, por_pagina=3):
+    vistos, after = [], None
+    while True:
+        where, params = "1=1", []
+        if after:
+            o, valor, ultimo_id = _decode_cursor(after)
+            assert o == ordenacao
+            where, params = _keyset_condition(ordenacao, valor, ultimo_id)
+        sql = f"SELECT * FROM formulario f WHERE {where} ORDER BY {order_clause(ordenacao)} LIMIT ?"
+        pagina = [dict(r) for r in banco.execute(sql.replace("%s", "?"), params + [por_pagina])]
+        if not pagina:
+            return vistos
+        vistos.extend(r["id"] for r in pagina)
+        after = _encode_cursor(ordenacao, pagina[-1])
+
+
+@pytest.mark.parametrize("ordenacao", [
+    "id_asc", "id_desc", "valor_asc", "valor_desc", "titular_asc", "titular_desc",
+])
+def test_paginas_cobrem_tudo_na_ordem(banco, ordenacao):
+    esperado = [r["id"] for r in banco.execute(
+        f"SELECT id FROM formulario f ORDER BY {order_clause(ordenacao)}"
+    )]
+    assert _paginar(banco, ordenacao) == esperado
+
+
+def test_cursor_invalido():
+    with pytest.raises(ValueError):
+        _decode_cursor("nao-e-um-cursor")
+
+
+@pytest.mark.parametrize("per_page", [0, -5])
+def test_per_page_menor_que_um_vira_um(monkeypatch, per_page):
+    linhas = [
+        {"id": i, "obra": 10, "valor": 100, "titular": "Ana", "titular_normalizado": "ana",
+         "data_pagamento": date(2025, 3, i), "carimbo": None, "grupo_id": None,
+         "obras_relacionadas_json": None}
+        for i in (3, 2, 1)
+    ]
+    conn = FakeConnection([("FROM formulario f", linhas)])
+    monkeypatch.setattr(formulario_routes, "get_connection", lambda: conn)
+    monkeypatch.setattr(formulario_routes, "nomes_fornecedores", lambda: set())
+    app = Flask(__name__)
+    app.register_blueprint(formulario_routes.formulario_bp)
+
+    resposta = app.test_client().get(f"/formulario?after=&per_page={per_page}")
+
+    corpo = resposta.get_json()
+    assert resposta.status_code == 200
+    assert corpo["per_page"] == 1
+    assert [f["id"] for f in corpo["data"]] == [3]
+    assert corpo["next_cursor"]
+    assert conn.executados[-1][1][-1] == 2  # LIMIT per_page + 1
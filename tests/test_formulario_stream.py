@@ -0,0 +1,57 @@
+"""GET /formulario?stream=json|ndjson: mesmo conteúdo da listagem sem paginação, em lotes."""
+import json
+from datetime import date
+
+import pytest
+from flask import Flask
+
+from fakes import FakeConnection
+from routes import formulario_routes
+
+
+def _linha(id_, titular):
+    return {
+        "id": id_, "obra": 10, "valor": 100 + id_, "titular": titular, "titular_normalizado": titular.lower(),
+        "data_pagamento": date(2025, 3, id_), "carimbo": None, "grupo_id": None,
+        "obras_relacionadas_json": None,
+    }
+
+
+LINHAS = [_linha(i, nome) for i, nome in enumerate(["Ana", "Bia", "Caio", "Duda", "Eva"], start=1)]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(
+        formulario_routes, "get_connection",
+        lambda: FakeConnection([("FROM formulario f", LINHAS)]),
+    )
+    monkeypatch.setattr(formulario_routes, "nomes_fornecedores", lambda: {"ana", "caio"})
+    monkeypatch.setattr(formulario_routes, "STREAM_BATCH_SIZE", 2)
+    app = Flask(__name__)
+    app.register_blueprint(formulario_routes.formulario_bp)
+    return app.test_client()
+
+
+def test_stream_json_igual_a_listagem_completa(client):
+    completa = client.get("/formulario").get_json()
+    resposta = client.get("/formulario?stream=json")
+
+    assert resposta.mimetype == "application/json"
+    assert json.loads(resposta.data) == completa
+    assert [f["id"] for f in completa] == [1, 2, 3, 4, 5]
+    assert [f["fornecedor_novo"] for f in completa] == [False, True, False, True, True]
+
+
+def test_stream_ndjson_um_lancamento_por_linha(client):
+    resposta = client.get("/formulario?stream=ndjson")
+
+    assert resposta.mimetype == "application/x-ndjson"
+    linhas = resposta.data.decode("utf-8").splitlines()
+    assert [json.loads(linha)["id"] for linha in linhas] == [1, 2, 3, 4, 5]
+    assert json.loads(linhas[0])["data_pagamento"] == "2025-03-01"
+
+
+def test_stream_invalido_e_400(client):
+    resposta = client.get("/formulario?stream=xml")
+    assert resposta.status_code == 400
@@ -0,0 +1,52 @@
+"""Índice em memória dos nomes de fornecedores (nomes_fornecedores)."""
+import pytest
+
+from fakes import FakeConnection
+from services import fornecedor_service
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    estado = {"nomes": ["ana", "bia"], "cargas": 0, "durante_carga": None}
+
+    def _linhas(params):
+        estado["cargas"] += 1
+        if estado["durante_carga"]:
+            estado.pop("durante_carga")()
+        return [{"nome": nome} for nome in estado["nomes"]]
+
+    conn = FakeConnection([("FROM fornecedor", _linhas)])
+    monkeypatch.setattr(fornecedor_service, "get_connection", lambda: conn)
+    monkeypatch.setattr(fornecedor_service, "_nomes", None)
+    monkeypatch.setattr(fornecedor_service, "_carregado_em", 0.0)
+    estado["conn"] = conn
+    return estado
+
+
+def test_carrega_uma_vez_e_recarrega_apos_invalidar(banco):
+    assert fornecedor_service.nomes_fornecedores() == {"ana", "bia"}
+    assert fornecedor_service.nomes_fornecedores() == {"ana", "bia"}
+    assert banco["cargas"] == 1
+
+    banco["nomes"].append("caio")
+    fornecedor_service.invalidar_indice_fornecedores()
+
+    assert fornecedor_service.nomes_fornecedores() == {"ana", "bia", "caio"}
+    assert banco["cargas"] == 2
+
+
+def test_invalidacao_durante_a_carga_nao_publica_indice_antigo(banco):
+    banco["durante_carga"] = fornecedor_service.invalidar_indice_fornecedores
+
+    fornecedor_service.nomes_fornecedores()
+    fornecedor_service.nomes_fornecedores()
+
+    assert banco["cargas"] == 2
+
+
+def test_erro_no_banco_mantem_o_indice_anterior(banco):
+    fornecedor_service.nomes_fornecedores()
+    fornecedor_service._carregado_em = -fornecedor_service.INDICE_TTL  # TTL vencido
+    banco["conn"].erro = ConnectionError("MySQL fora do ar")
+
+    assert fornecedor_service.nomes_fornecedores() == {"ana", "bia"}
@@ -0,0 +1,23 @@
+import pytest
+
+from services.fornecedor_service import ESPACOS_TITULAR, normalizar_titular
+
+# Unicode White_Space, o conjunto do [[:space:]] do MySQL 8 (ICU)
+WHITE_SPACE = [0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x20, 0x85, 0xA0, 0x1680,
+               *range(0x2000, 0x200B), 0x2028, 0x2029, 0x202F, 0x205F, 0x3000]
+
+
+def test_mesmo_conjunto_de_espacos_do_backfill_sql():
+    assert sorted(map(ord, ESPACOS_TITULAR)) == WHITE_SPACE
+
+
+@pytest.mark.parametrize("bruto", ["Fulano", " Fulano ", "\tFULANO\n", "\xa0fulano\r\n", "　Fulano"])
+def test_espacos_das_pontas_e_caixa(bruto):
+    assert normalizar_titular(bruto) == "fulano"
+
+
+def test_preserva_o_que_o_sql_nao_remove():
+    # [[:space:]] não inclui os separadores \x1c-\x1f (str.strip() removeria)
+    assert normalizar_titular("\x1cFulano") == "\x1cfulano"
+    assert normalizar_titular("Maria  da Silva") == "maria  da silva"
+    assert normalizar_titular(None) == ""
@@ -0,0 +1,116 @@
+"""Serviço do Drive sem rede: upload em lote, cliente por thread e pool de upload."""
+import io
+import threading
+import time
+
+import pytest
+from google.oauth2.credentials import Credentials
+from werkzeug.datastructures import FileStorage
+
+from services import google_drive_service
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    estado = {"apagados": [], "publicos": [], "falhar": set()}
+
+    def _upload(file, nome, folder_id, tornar_publico=True, propriedades=None):
+        if nome in estado["falhar"]:
+            raise RuntimeError(f"falha em {nome}")
+        return {"id": f"id-{nome}", "webViewLink": f"https://drive/{nome}", "name": nome}
+
+    monkeypatch.setattr(google_drive_service, "create_folder", lambda nome: "pasta-nova")
+    monkeypatch.setattr(google_drive_service, "upload_file_to_drive", _upload)
+    monkeypatch.setattr(google_drive_service, "tornar_publicos", lambda ids: estado["publicos"].extend(ids) or {})
+    monkeypatch.setattr(google_drive_service, "apagar_arquivos", lambda ids: estado["apagados"].extend(ids))
+    return estado
+
+
+def _arquivos(*nomes):
+    return [FileStorage(stream=io.BytesIO(b"x"), filename=nome) for nome in nomes]
+
+
+def test_envia_e_torna_publicos(drive):
+    links = google_drive_service.upload_files_batch(_arquivos("a.pdf", "b.pdf"), 1, 2, folder_id="pasta")
+
+    assert [link["drive_id"] for link in links] == ["id-a.pdf", "id-b.pdf"]
+    assert drive["publicos"] == ["id-a.pdf", "id-b.pdf"]
+    assert drive["apagados"] == []
+
+
+def test_falha_apaga_os_arquivos_ja_enviados(drive):
+    drive["falhar"].add("b.pdf")
+
+    with pytest.raises(RuntimeError):
+        google_drive_service.upload_files_batch(_arquivos("a.pdf", "b.pdf", "c.pdf"), 1, 2, folder_id="pasta")
+
+    assert sorted(drive["apagados"]) == ["id-a.pdf", "id-c.pdf"]
+    assert drive["publicos"] == []
+
+
+def test_falha_apaga_a_pasta_criada_no_lote(drive):
+    drive["falhar"].add("a.pdf")
+
+    with pytest.raises(RuntimeError):
+        google_drive_service.upload_files_batch(_arquivos("a.pdf", "b.pdf"), 1, 2)
+
+    assert drive["apagados"] == ["pasta-nova"]
+
+
+def test_discovery_parseado_uma_vez_para_todas_as_threads(monkeypatch):
+    leituras = []
+    documento = google_drive_service.get_static_doc("drive", "v3")
+    credenciais = Credentials(token="token")
+    monkeypatch.setattr(google_drive_service, "_discovery", None)
+    monkeypatch.setattr(google_drive_service, "get_static_doc", lambda *args: leituras.append(args) or documento)
+    monkeypatch.setattr(google_drive_service, "get_credentials", lambda: credenciais)
+
+    clientes = google_drive_service.executar_em_paralelo(
+        [google_drive_service.get_drive_service for _ in range(8)], max_workers=4
+    )
+
+    assert all(erro is None for _, erro in clientes)
+    assert len(leituras) == 1
+
+
+def test_pool_de_upload_reaproveita_threads_e_respeita_o_limite():
+    estado = {"ativas": 0, "pico": 0, "threads": set()}
+    lock = threading.Lock()
+
+    def _tarefa(i):
+        with lock:
+            estado["ativas"] += 1
+            estado["pico"] = max(estado["pico"], estado["ativas"])
+            estado["threads"].add(threading.get_ident())
+        time.sleep(0.01)
+        with lock:
+            estado["ativas"] -= 1
+        return i
+
+    for _ in range(3):
+        resultados = google_drive_service.executar_em_paralelo([lambda i=i: _tarefa(i) for i in range(10)], max_workers=2)
+        assert resultados == [(i, None) for i in range(10)]
+
+    assert estado["pico"] <= 2
+    assert len(estado["threads"]) <= google_drive_service.UPLOAD_MAX_WORKERS
+
+
+def test_renovacao_das_credenciais_e_serializada(monkeypatch):
+    renovacoes = []
+
+    def _refresh(self, request):
+        renovacoes.append(threading.get_ident())
+        time.sleep(0.05)
+        self.token = f"novo-{len(renovacoes)}"
+
+    monkeypatch.setattr(Credentials, "refresh", _refresh)
+    credenciais = google_drive_service._CredenciaisCompartilhadas(token="expirado")
+
+    threads = [threading.Thread(target=credenciais.refresh, args=(None,)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(renovacoes) == 1
+    assert credenciais.token == "novo-1"
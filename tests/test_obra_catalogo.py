@@ -0,0 +1,66 @@
+"""Catálogo de obras: uma consulta agregada, cópias para quem chama e invalidação nas escritas."""
+import pytest
+
+from fakes import FakeConnection
+from services import obra_service
+
+
+def _vinculo(obra_id, nome, user_id=None, user_nome=None):
+    return {
+        "id": obra_id, "nome": nome, "quem_paga": "Empresa", "banco_id": None,
+        "vinculo_user_id": user_id, "vinculo_nome": user_nome,
+        "vinculo_username": user_nome.upper() if user_nome else None,
+    }
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    linhas = [
+        _vinculo(1, "Obra A", 7, "Ana"),
+        _vinculo(1, "Obra A", 8, "Bia"),
+        _vinculo(2, "Obra B"),
+        _vinculo(3, "Obra C", 7, "Ana"),
+    ]
+    conn = FakeConnection([
+        ("FROM obras o", lambda params: linhas),
+        ("SELECT * FROM obras WHERE id", lambda params: [{"id": params[0], "nome": "Obra A2"}]),
+    ])
+    monkeypatch.setattr(obra_service, "get_connection", lambda: conn)
+    obra_service.invalidar_catalogo_obras()
+    conn.linhas = linhas
+    yield conn
+    obra_service.invalidar_catalogo_obras()
+
+
+def _consultas_do_catalogo(conn):
+    return [sql for sql in conn.sqls() if "FROM obras o" in sql]
+
+
+def test_obras_com_usuarios_numa_consulta(banco):
+    obras = obra_service.listar_obras()
+
+    assert [o["id"] for o in obras] == [1, 2, 3]
+    assert obras[0]["user_ids"] == [7, 8]
+    assert obras[0]["users"] == [{"id": 7, "nome": "Ana", "username": "ANA"}, {"id": 8, "nome": "Bia", "username": "BIA"}]
+    assert obras[1]["users"] == []
+    assert [o["id"] for o in obra_service.listar_obras_por_usuario(7)] == [1, 3]
+    assert len(_consultas_do_catalogo(banco)) == 1
+
+
+def test_alterar_a_lista_devolvida_nao_afeta_o_cache(banco):
+    obra_service.listar_obras()[0]["users"].append({"id": 99})
+    obra_service.listar_obras()[0]["nome"] = "Alterado"
+
+    obra = obra_service.listar_obras()[0]
+    assert obra["nome"] == "Obra A"
+    assert obra["user_ids"] == [7, 8] and len(obra["users"]) == 2
+
+
+def test_escrita_invalida_o_catalogo(banco):
+    obra_service.listar_obras()
+    banco.linhas[0] = _vinculo(1, "Obra A2", 7, "Ana")
+
+    obra_service.atualizar_obra(1, "Obra A2", "Empresa")
+
+    assert obra_service.listar_obras()[0]["nome"] == "Obra A2"
+    assert len(_consultas_do_catalogo(banco)) == 2
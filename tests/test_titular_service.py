@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from fakes import FakeConnection
+from services import titular_service
+from services.titular_service import IndiceTitulares
+
+FORNECEDORES = [
+    {"id": 1, "titular": "José Ávila", "cpf_cnpj": "123.456.789-00"},
+    {"id": 2, "titular": "Maria Joana", "cpf_cnpj": None},
+    {"id": 3, "titular": "Construtora Jota", "cpf_cnpj": "98765432000110"},
+    {"id": 4, "titular": "Ana Maria", "cpf_cnpj": None},
+]
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    linhas = list(FORNECEDORES)
+    conn = FakeConnection([("FROM fornecedor", lambda params: linhas)])
+    monkeypatch.setattr(titular_service, "get_connection", lambda: conn)
+    conn.linhas = linhas
+    return conn
+
+
+def _nomes(resultado):
+    return [r["titular"] for r in resultado]
+
+
+def test_ranking_prefixo_palavra_e_meio(banco):
+    indice = IndiceTitulares()
+    assert _nomes(indice.buscar("jo")) == ["José Ávila", "Maria Joana", "Construtora Jota"]
+    assert _nomes(indice.buscar("aria")) == ["Ana Maria", "Maria Joana"]
+    assert _nomes(indice.buscar("456")) == ["José Ávila"]
+
+
+def test_termo_curto_nao_varre_o_indice(banco, monkeypatch):
+    indice = IndiceTitulares()
+    indice.buscar("x")
+    monkeypatch.setattr(indice, "_candidatos", lambda *a, **k: pytest.fail("varreu candidatos"))
+    assert _nomes(indice.buscar("ma")) == ["Maria Joana", "Ana Maria"]
+    assert _nomes(indice.buscar("j")) == ["José Ávila", "Maria Joana", "Construtora Jota"]
+
+
+def test_escrita_durante_a_carga_nao_se_perde(banco, monkeypatch):
+    indice = IndiceTitulares()
+    lendo, liberar = threading.Event(), threading.Event()
+    conexao_real = titular_service.get_connection
+
+    def conexao_lenta():
+        lendo.set()
+        liberar.wait(2)
+        return conexao_real()
+
+    monkeypatch.setattr(titular_service, "get_connection", conexao_lenta)
+    carga = threading.Thread(target=indice.carregar)
+    carga.start()
+    lendo.wait(2)
+    # Gravado depois da leitura do banco começar (a carga não vai vê-lo)
+    indice.adicionar({"id": 5, "titular": "Novo Fornecedor", "cpf_cnpj": None})
+    indice.remover(4)
+    liberar.set()
+    carga.join(2)
+
+    monkeypatch.setattr(titular_service, "get_connection", conexao_real)
+    assert _nomes(indice.buscar("novo")) == ["Novo Fornecedor"]
+    assert indice.buscar("ana maria") == []
+
+
+def test_atualizar_e_remover(banco):
+    indice = IndiceTitulares()
+    indice.buscar("x")
+    indice.adicionar({"id": 2, "titular": "Mariana Souza", "cpf_cnpj": None})
+    assert _nomes(indice.buscar("joana")) == []
+    assert _nomes(indice.buscar("souza")) == ["Mariana Souza"]
+    indice.remover(2)
+    assert indice.buscar("souza") == []
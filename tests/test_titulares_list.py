@@ -0,0 +1,67 @@
+"""GET /titulares/list: catálogo em memória servido com ETag."""
+import pytest
+from flask import Flask
+
+from fakes import FakeConnection
+from routes import formulario_routes
+from services import titular_service
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    titulares = [{"titular": "Maria"}, {"titular": "ana"}, {"titular": "MARIA"}, {"titular": "Ávila"}]
+    conn = FakeConnection([("SELECT DISTINCT titular", lambda params: titulares)])
+    monkeypatch.setattr(titular_service, "get_connection", lambda: conn)
+    conn.titulares = titulares
+    return conn
+
+
+@pytest.fixture
+def catalogo(monkeypatch, banco):
+    catalogo = titular_service.CatalogoTitulares()
+    monkeypatch.setattr(formulario_routes, "catalogo_titulares", catalogo)
+    return catalogo
+
+
+@pytest.fixture
+def client(catalogo):
+    app = Flask(__name__)
+    app.register_blueprint(formulario_routes.formulario_bp)
+    return app.test_client()
+
+
+def _nomes(resposta):
+    return [item["nome"] for item in resposta.get_json()]
+
+
+def test_lista_distinta_ordenada_sem_acento_e_caixa(client, banco):
+    resposta = client.get("/titulares/list")
+
+    assert resposta.status_code == 200
+    assert _nomes(resposta) == ["ana", "Ávila", "Maria"]
+    client.get("/titulares/list")
+    assert len(banco.executados) == 1
+
+
+def test_etag_igual_responde_304(client):
+    etag = client.get("/titulares/list").headers["ETag"]
+
+    resposta = client.get("/titulares/list", headers={"If-None-Match": etag})
+
+    assert resposta.status_code == 304
+    assert resposta.data == b""
+
+
+def test_escrita_muda_o_etag(client, catalogo, banco):
+    etag = client.get("/titulares/list").headers["ETag"]
+
+    catalogo.adicionar("  Bruno ")
+    resposta = client.get("/titulares/list", headers={"If-None-Match": etag})
+    assert resposta.status_code == 200
+    assert _nomes(resposta) == ["ana", "Ávila", "Bruno", "Maria"]
+    assert len(banco.executados) == 1  # inclusão sem reler o banco
+
+    banco.titulares.pop()
+    catalogo.invalidar()
+    assert _nomes(client.get("/titulares/list")) == ["ana", "Maria"]
+    assert len(banco.executados) == 2
@@ -0,0 +1,97 @@
+"""Tokens assinados: emissão, verificação, revogação, versão do usuário e segredo obrigatório."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fakes import FakeConnection
+from services import token_service
+from services.cache_service import TTLCache
+
+USUARIO = {"id": 7, "username": "MARIA", "role": "user", "nome": "Maria"}
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    estado = {"versao": 0, "revogados": []}
+    conn = FakeConnection([
+        ("SELECT token_version", lambda params: [{"token_version": estado["versao"]}]),
+        ("SELECT jti FROM revoked_tokens", lambda params: [{"jti": jti} for jti in estado["revogados"]]),
+        ("INSERT IGNORE INTO revoked_tokens", lambda params: estado["revogados"].append(params[0]) or []),
+    ])
+    monkeypatch.setattr(token_service, "get_connection", lambda: conn)
+    monkeypatch.setattr(token_service, "_versoes", TTLCache(ttl=30))
+    monkeypatch.setattr(token_service, "_revogados", frozenset())
+    monkeypatch.setattr(token_service, "_revogados_em", 0.0)
+    monkeypatch.setitem(token_service.TOKEN_CONFIG, "secret", "segredo-de-teste")
+    return estado
+
+
+def test_token_emitido_e_verificado(banco):
+    token = token_service.emitir_token(USUARIO)
+
+    assert token.startswith(token_service.PREFIXO)
+    assert token_service.verificar_token(token) == USUARIO
+
+
+def test_token_adulterado_ou_de_outra_chave_e_recusado(banco, monkeypatch):
+    token = token_service.emitir_token(USUARIO)
+    assinatura = token.rpartition(".")[2]
+    payload = token_service.decodificar_token(token)
+    payload["role"] = "admin"
+    adulterado = token_service.PREFIXO + token_service._b64(
+        token_service.json.dumps(payload).encode("utf-8")
+    ) + "." + assinatura
+
+    assert token_service.verificar_token(adulterado) is None
+
+    monkeypatch.setitem(token_service.TOKEN_CONFIG, "secret", "outra-chave")
+    assert token_service.verificar_token(token) is None
+
+
+def test_sem_segredo_nao_emite_nem_aceita_tokens(banco, monkeypatch):
+    token = token_service.emitir_token(USUARIO)
+    monkeypatch.setitem(token_service.TOKEN_CONFIG, "secret", None)
+
+    with pytest.raises(token_service.SegredoAusenteError):
+        token_service.emitir_token(USUARIO)
+    assert token_service.verificar_token(token) is None
+
+
+def test_nova_versao_do_usuario_invalida_tokens_antigos(banco):
+    token = token_service.emitir_token(USUARIO)
+
+    banco["versao"] = 1
+    token_service.incrementar_versao(USUARIO["id"])
+
+    assert token_service.verificar_token(token) is None
+    assert token_service.verificar_token(token_service.emitir_token(USUARIO)) == USUARIO
+
+
+def test_token_revogado_e_recusado(banco):
+    token = token_service.emitir_token(USUARIO)
+    outro = token_service.emitir_token(USUARIO)
+
+    token_service.revogar_token(token)
+
+    assert token_service.verificar_token(token) is None
+    # Outro processo (cache local vazio) relê a lista do banco
+    token_service._revogados = frozenset()
+    token_service._revogados_em = 0.0
+    assert token_service.verificar_token(token) is None
+    assert token_service.verificar_token(outro) == USUARIO
+
+
+@pytest.mark.parametrize("segredo, formato", [(None, "sessao"), ("s3gr3do", "assinado")])
+def test_formato_depende_de_token_secret(segredo, formato):
+    ambiente = {k: v for k, v in os.environ.items() if k != "TOKEN_SECRET"}
+    if segredo:
+        ambiente["TOKEN_SECRET"] = segredo
+    saida = subprocess.run(
+        [sys.executable, "-c", "import config; print(config.TOKEN_CONFIG['formato'], config.TOKEN_CONFIG['secret'])"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=ambiente, capture_output=True, text=True, check=True,
+    ).stdout.split()
+
+    assert saida == [formato, str(segredo)]
@@ -0,0 +1,101 @@
+"""Pasta do Drive por lançamento (formulario_drive_pastas) e anexos acumulados em link_anexo."""
+import json
+
+import pytest
+
+from fakes import FakeConnection
+from services import upload_service
+from services.cache_service import TTLCache
+from services.job_service import Job
+
+
+@pytest.fixture
+def pastas(monkeypatch):
+    """Tabela formulario_drive_pastas em memória, atrás de uma conexão falsa."""
+    tabela = {}
+
+    def _inserir(params):
+        tabela.setdefault(params[0], params[2])  # INSERT IGNORE
+        return []
+
+    def _apagar(params):
+        tabela.pop(params[0], None)
+        return []
+
+    def _selecionar(params):
+        return [{"folder_id": tabela[params[0]]}] if params[0] in tabela else []
+
+    conn = FakeConnection([
+        ("INSERT IGNORE INTO formulario_drive_pastas", _inserir),
+        ("SELECT folder_id FROM formulario_drive_pastas", _selecionar),
+        ("DELETE FROM formulario_drive_pastas", _apagar),
+    ])
+    criadas = []
+    monkeypatch.setattr(upload_service, "get_connection", lambda: conn)
+    monkeypatch.setattr(upload_service, "_pastas_cache", TTLCache(ttl=3600))
+    monkeypatch.setattr(upload_service, "create_folder", lambda nome: criadas.append(nome) or f"pasta-{len(criadas)}")
+    tabela["criadas"] = criadas
+    return tabela
+
+
+def test_pasta_criada_uma_vez_e_reaproveitada(pastas):
+    assert upload_service.pasta_do_formulario(5, 10) == ("pasta-1", False)
+    assert upload_service.pasta_do_formulario(5, 10) == ("pasta-1", True)
+
+    # Outro processo (cache vazio) acha a pasta na tabela
+    upload_service._pastas_cache.invalidate()
+    assert upload_service.pasta_do_formulario(5, 10) == ("pasta-1", True)
+    assert pastas["criadas"] == ["Lançamento_5_Obra_10"]
+
+
+def test_pasta_registrada_por_outro_processo_vence(pastas, monkeypatch):
+    # Corrida: outro processo grava a pasta entre a busca e o INSERT IGNORE
+    monkeypatch.setattr(upload_service, "_buscar_pasta", lambda form_id: pastas.setdefault(form_id, "pasta-outro") and None)
+
+    assert upload_service.pasta_do_formulario(5, 10) == ("pasta-outro", False)
+
+
+def test_pasta_apagada_no_drive_e_recriada(pastas, monkeypatch):
+    class _Resp:
+        status = 404
+
+    class _PastaInexistente(Exception):
+        resp = _Resp()
+
+    upload_service.pasta_do_formulario(5, 10)
+    enviados = []
+
+    def _enviar(job, arquivos, folder_id, verificar=False):
+        if folder_id == "pasta-1":
+            return [(None, _PastaInexistente()) for _ in arquivos]
+        enviados.append(folder_id)
+        return [({"id": f"id-{a['nome']}", "webViewLink": "https://drive/x", "name": a["nome"]}, None) for a in arquivos]
+
+    monkeypatch.setattr(upload_service, "_enviar_todos", _enviar)
+    monkeypatch.setattr(upload_service, "tornar_publicos", lambda ids: {})
+    monkeypatch.setattr(upload_service, "salvar_links", lambda form_id, links: links)
+
+    resultado = upload_service.executar_upload(Job("upload"), 5, 10, "/nao/existe", [{"nome": "a.pdf"}])
+
+    assert resultado["folder_id"] == "pasta-2"
+    assert enviados == ["pasta-2"]
+    assert pastas[5] == "pasta-2"
+
+
+def test_salvar_links_acumula_sem_repetir(monkeypatch):
+    legado = "https://drive.google.com/antigo"
+    gravado = {}
+    conn = FakeConnection([
+        ("SELECT link_anexo FROM formulario", [{"link_anexo": legado}]),
+        ("UPDATE formulario SET link_anexo", lambda params: gravado.setdefault("json", params[0]) and []),
+    ])
+    monkeypatch.setattr(upload_service, "get_connection", lambda: conn)
+    novo = {"name": "a.pdf", "link": "l", "download": "d", "drive_id": "id-a"}
+
+    anexos = upload_service.salvar_links(5, [novo, dict(novo)])
+
+    assert [a["drive_id"] for a in anexos] == [None, "id-a"]
+    assert anexos[0]["link"] == legado
+    assert json.loads(gravado["json"]) == anexos
+    assert "FOR UPDATE" in conn.executados[0][0]
+    assert conn.commits == 1
@@ -0,0 +1,110 @@
+"""Fila de uploads: staging em disco, recuperação após restart e novas tentativas sem duplicar."""
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from services import upload_service
+from services.job_service import Job
+
+
+@pytest.fixture
+def staging(monkeypatch, tmp_path):
+    monkeypatch.setitem(upload_service.UPLOAD_CONFIG, "staging_dir", str(tmp_path))
+    monkeypatch.setattr(upload_service.time, "sleep", lambda segundos: None)
+    return tmp_path
+
+
+@pytest.fixture
+def agendados(monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(upload_service.upload_jobs, "submit", lambda *args: chamadas.append(args) or args)
+    return chamadas
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    """Drive falso: enviados por chave, falhas programadas por chamada."""
+    estado = {"enviados": {}, "creates": 0, "falhas": []}
+
+    def _upload(file, nome, folder_id, tornar_publico=True, propriedades=None):
+        estado["creates"] += 1
+        chave = propriedades[upload_service.PROPRIEDADE_UPLOAD]
+        resultado = {"id": f"drive-{chave}", "webViewLink": f"https://drive/{chave}", "name": nome}
+        estado["enviados"][chave] = resultado
+        if estado["falhas"]:
+            raise estado["falhas"].pop(0)  # criado, mas a resposta se perdeu
+        return resultado
+
+    def _buscar(folder_id, propriedade, valor):
+        return estado["enviados"].get(valor)
+
+    monkeypatch.setattr(upload_service, "upload_file_to_drive", _upload)
+    monkeypatch.setattr(upload_service, "buscar_arquivo", _buscar)
+    monkeypatch.setattr(upload_service, "tornar_publicos", lambda ids: {})
+    monkeypatch.setattr(upload_service, "pasta_do_formulario", lambda form_id, obra_id, job=None: ("pasta", True))
+    monkeypatch.setattr(upload_service, "salvar_links", lambda form_id, links: links)
+    return estado
+
+
+def _arquivos(*nomes):
+    return [FileStorage(stream=io.BytesIO(b"conteudo"), filename=nome, content_type="application/pdf") for nome in nomes]
+
+
+def test_agendar_grava_manifesto_e_mantem_a_trava(staging, agendados):
+    upload_service.agendar_upload(10, 3, _arquivos("a.pdf", "b.pdf"))
+
+    _, _, form_id, obra_id, diretorio, arquivos, trava = agendados[0]
+    assert (form_id, obra_id) == (10, 3)
+    assert upload_service._ler_manifesto(diretorio) == (10, 3, arquivos)
+    # Outro processo (aqui, outra abertura do arquivo) não consegue a trava
+    assert upload_service._travar(diretorio) is None
+    assert upload_service.recuperar_uploads_pendentes() == []
+    trava.close()
+
+
+def test_recupera_staging_de_processo_que_parou(staging, agendados):
+    diretorio, arquivos = upload_service.preparar_arquivos(_arquivos("a.pdf"), 10)
+    upload_service._gravar_manifesto(diretorio, 10, 3, arquivos)  # trava já solta: processo morreu
+
+    jobs = upload_service.recuperar_uploads_pendentes()
+
+    assert len(jobs) == 1
+    _, _, form_id, obra_id, dir_job, arquivos_job, trava, recuperado = jobs[0]
+    assert (form_id, obra_id, dir_job, arquivos_job, recuperado) == (10, 3, diretorio, arquivos, True)
+    assert upload_service._travar(diretorio) is None
+    trava.close()
+
+
+def test_staging_sem_manifesto_antigo_e_apagado(staging, agendados):
+    recente = staging / "10_recente"
+    antigo = staging / "10_antigo"
+    recente.mkdir()
+    antigo.mkdir()
+    os.utime(antigo, (0, 0))
+
+    assert upload_service.recuperar_uploads_pendentes() == []
+    assert recente.exists() and not antigo.exists()
+
+
+def test_nova_tentativa_nao_duplica_arquivo_criado(staging, drive):
+    drive["falhas"].append(ConnectionError("conexão caiu"))
+    diretorio, arquivos = upload_service.preparar_arquivos(_arquivos("a.pdf"), 10)
+
+    resultado = upload_service._enviar_com_retentativas(Job("upload"), arquivos[0], "pasta")
+
+    assert drive["creates"] == 1
+    assert resultado["id"] == f"drive-{arquivos[0]['chave']}"
+
+
+def test_job_recuperado_envia_so_o_que_falta(staging, drive):
+    diretorio, arquivos = upload_service.preparar_arquivos(_arquivos("a.pdf", "b.pdf"), 10)
+    upload_service._gravar_manifesto(diretorio, 10, 3, arquivos)
+    drive["enviados"][arquivos[0]["chave"]] = {"id": "ja-enviado", "webViewLink": "https://drive/x", "name": "a.pdf"}
+
+    resultado = upload_service.executar_upload(Job("upload"), 10, 3, diretorio, arquivos, recuperado=True)
+
+    assert drive["creates"] == 1
+    assert [link["drive_id"] for link in resultado["files"]] == ["ja-enviado", f"drive-{arquivos[1]['chave']}"]
+    assert not os.path.exists(diretorio)
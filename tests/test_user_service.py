@@ -0,0 +1,37 @@
+"""Cadastro de usuários com banco falso."""
+import pytest
+
+from fakes import FakeConnection
+from services import user_service
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    conn = FakeConnection([("SELECT id FROM users", [])])
+    monkeypatch.setattr(user_service, "get_connection", lambda: conn)
+    monkeypatch.setattr(user_service, "invalidar_catalogo_obras", lambda: None)
+    return conn
+
+
+def test_cadastro_gera_token(banco, monkeypatch):
+    monkeypatch.setattr(user_service, "generate_token", lambda user, versao=None: "token-novo")
+
+    usuario, erro = user_service.register_user("maria", "hash", "user", [], "Maria")
+
+    assert erro is None
+    assert usuario["username"] == "MARIA"
+    assert usuario["token"] == "token-novo"
+    assert banco.commits == 1
+
+
+def test_falha_no_token_nao_desfaz_o_usuario_gravado(banco, monkeypatch):
+    def _falha(user, versao=None):
+        raise RuntimeError("sessões indisponíveis")
+
+    monkeypatch.setattr(user_service, "generate_token", _falha)
+
+    usuario, erro = user_service.register_user("maria", "hash")
+
+    assert erro is None
+    assert usuario["token"] is None
+    assert (banco.commits, banco.rollbacks) == (1, 0)